@@ -11,9 +11,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 SESSIONS_DIR = DATA_DIR / "sessions"
 TEMP_DIR = DATA_DIR / "temp"
+LOGS_DIR = DATA_DIR / "logs"
+IPC_DIR = DATA_DIR / "ipc"  # sockets Unix entre coordinador, workers y servicios
+HEARTBEAT_DIR = DATA_DIR / "heartbeats"
 
 SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
+LOGS_DIR.mkdir(parents=True, exist_ok=True)
+IPC_DIR.mkdir(parents=True, exist_ok=True)
+HEARTBEAT_DIR.mkdir(parents=True, exist_ok=True)
 
 CLAUDE_PROJECTS_DIR = Path(os.getenv("CLAUDE_PROJECTS_DIR", str(Path.home() / "ClaudeProjects")))
 CLAUDE_SKILLS_DIR = Path(os.getenv("CLAUDE_SKILLS_DIR", str(Path.home() / ".claude" / "skills")))
@@ -24,16 +30,156 @@ STANDALONE_PROJECTS: dict[str, str] = {
 
 CLAUDE_MAX_TURNS = 0  # 0 = sin límite de turnos
 CLAUDE_TIMEOUT = 1800  # 30 minutos (solo subprocess fallback)
+CLAUDE_MAX_CONCURRENT = int(os.getenv("CLAUDE_MAX_CONCURRENT", "4"))  # ejecuciones simultáneas por proceso
 CLAUDE_PERMISSION_MODE = "bypassPermissions"
 
-WHISPER_MODEL = "small"
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")
 WHISPER_LANGUAGE = "es"
 
+# Inferencia de Whisper (ver `python -m bot.whisper_bench` para elegir valores por máquina)
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))  # 0 = lo decide ctranslate2
+WHISPER_NUM_WORKERS = int(os.getenv("WHISPER_NUM_WORKERS", "0"))  # 0 = uno por transcripción simultánea
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "5"))
+WHISPER_VAD_MIN_SILENCE_MS = int(os.getenv("WHISPER_VAD_MIN_SILENCE_MS", "2000"))
+WHISPER_VAD_THRESHOLD = float(os.getenv("WHISPER_VAD_THRESHOLD", "0.5"))
+# Pipeline por lotes para audios largos (segmentos de voz decodificados en paralelo)
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))  # 0 = nunca por lotes
+WHISPER_BATCH_MIN_DURATION = 120  # segundos de audio a partir de los que se usa el pipeline por lotes
+# Audios largos troceados en los silencios y transcritos en paralelo (tiene prioridad sobre los lotes)
+WHISPER_CHUNK_WORKERS = int(os.getenv("WHISPER_CHUNK_WORKERS", "0"))  # 0/1 = desactivado
+WHISPER_CHUNK_SECONDS = 60  # duración máxima de cada tramo
+WHISPER_CHUNK_MIN_DURATION = 180  # segundos de audio a partir de los que se trocea
+WHISPER_MAX_WORKERS = int(os.getenv("WHISPER_MAX_WORKERS", "1"))  # transcripciones simultáneas
+# Precarga del modelo al arrancar (coordinador / workers). Los workers por defecto no precargan
+# y cargan el modelo solo si les llega audio.
+WHISPER_PRELOAD = os.getenv("WHISPER_PRELOAD", "1") == "1"
+WHISPER_WORKER_PRELOAD = os.getenv("WHISPER_WORKER_PRELOAD", "0") == "1"
+WHISPER_PARTIAL_INTERVAL = 2  # segundos entre actualizaciones de la transcripción parcial
+# Lanzar Claude en cuanto la transcripción es final. Con 0 solo se muestra la transcripción.
+VOICE_AUTORUN = os.getenv("VOICE_AUTORUN", "1") == "1"
+
+# Servicio de transcripción compartido (un único modelo para coordinador y workers).
+# Solo disponible con sockets Unix; si no está en marcha se transcribe en el propio proceso.
+WHISPER_DAEMON = os.getenv("WHISPER_DAEMON", "1") == "1"
+WHISPER_DAEMON_REPLICAS = int(os.getenv("WHISPER_DAEMON_REPLICAS", "1"))  # decodificaciones en paralelo
+WHISPER_DAEMON_SOCKET = IPC_DIR / "whisper.sock"
+
 TELEGRAM_MAX_MESSAGE_LENGTH = 4096
 
+# Descargas: audios hasta este tamaño se decodifican desde memoria; los mayores se escriben por bloques
+VOICE_MEMORY_MAX_BYTES = int(os.getenv("VOICE_MEMORY_MAX_BYTES", str(8 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Vídeos y notas de vídeo: siempre en memoria (la Bot API no descarga más de 20 MB).
+# Fotogramas clave que se analizan como imágenes junto a la transcripción (0 = solo audio).
+VIDEO_MAX_BYTES = 20 * 1024 * 1024
+VIDEO_KEYFRAMES = int(os.getenv("VIDEO_KEYFRAMES", "0"))
+
+# Caché de transcripciones (por file_unique_id + modelo + idioma), con expulsión LRU
+TRANSCRIPT_CACHE_FILE = DATA_DIR / "transcript_cache.json"
+TRANSCRIPT_CACHE_MAX_ENTRIES = 2000
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Álbumes: espera tras la última foto recibida (se reinicia con cada llegada) y espera máxima
+MEDIA_GROUP_IDLE = float(os.getenv("MEDIA_GROUP_IDLE", "1.0"))
+MEDIA_GROUP_MAX_WAIT = float(os.getenv("MEDIA_GROUP_MAX_WAIT", "3"))
+IMAGE_DOWNLOAD_CONCURRENCY = int(os.getenv("IMAGE_DOWNLOAD_CONCURRENCY", "4"))
+
+# Álbumes con al menos este número de imágenes se analizan imagen a imagen en paralelo
+# (sin sesión) y una última ejecución con sesión combina los resultados. 0 = desactivado.
+ALBUM_FANOUT_MIN_IMAGES = int(os.getenv("ALBUM_FANOUT_MIN_IMAGES", "5"))
+RUN_STATS_FILE = DATA_DIR / "run_stats.json"
+
+# Preprocesado de imágenes para Claude (lado mayor en px, calidad JPEG)
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1568"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# Retención de archivos: cuotas de TEMP_DIR y de <proyecto>/.claude-bot-images.
+# Se borran primero los archivos usados hace más tiempo; nunca los de menos de
+# STORAGE_MIN_AGE segundos ni los referenciados por una sesión activa.
+IMAGES_DIRNAME = ".claude-bot-images"
+STORAGE_REFS_FILE = DATA_DIR / "storage_refs.json"
+TEMP_DIR_MAX_BYTES = int(os.getenv("TEMP_DIR_MAX_BYTES", str(500 * 1024 * 1024)))
+TEMP_DIR_MAX_AGE_DAYS = float(os.getenv("TEMP_DIR_MAX_AGE_DAYS", "7"))
+IMAGES_DIR_MAX_BYTES = int(os.getenv("IMAGES_DIR_MAX_BYTES", str(200 * 1024 * 1024)))
+IMAGES_DIR_MAX_AGE_DAYS = float(os.getenv("IMAGES_DIR_MAX_AGE_DAYS", "30"))
+# Los documentos subidos son del proyecto: sin cuota salvo que se configure (0 = sin límite)
+UPLOADS_DIR_MAX_BYTES = int(os.getenv("UPLOADS_DIR_MAX_BYTES", "0"))
+UPLOADS_DIR_MAX_AGE_DAYS = float(os.getenv("UPLOADS_DIR_MAX_AGE_DAYS", "0"))
+STORAGE_MIN_AGE = 3600
+STORAGE_JANITOR_INTERVAL = int(os.getenv("STORAGE_JANITOR_INTERVAL", "3600"))
+
+# Documentos: se guardan en <proyecto>/.claude-bot-uploads; los comprimidos se extraen
+# con límites de archivos y bytes descomprimidos (la Bot API no descarga más de 20 MB)
+UPLOADS_DIRNAME = ".claude-bot-uploads"
+DOCUMENT_MAX_BYTES = int(os.getenv("DOCUMENT_MAX_BYTES", str(20 * 1024 * 1024)))
+ARCHIVE_MAX_TOTAL_BYTES = int(os.getenv("ARCHIVE_MAX_TOTAL_BYTES", str(200 * 1024 * 1024)))
+ARCHIVE_MAX_FILES = 2000
+DOCUMENT_SUMMARY_LINES = 20
+
+# Artefactos que Claude menciona por ruta y se envían como documento: extensiones y
+# nombres de carpeta (se envían comprimidas). La Bot API no acepta subidas de más de 50 MB.
+ARTIFACT_EXTENSIONS = {
+    e.strip().lower() if e.strip().startswith(".") else "." + e.strip().lower()
+    for e in os.getenv("ARTIFACT_EXTENSIONS", ".pdf,.csv,.xlsx,.docx,.pptx,.zip,.apk,.mp4,.mp3").split(",")
+    if e.strip()
+}
+ARTIFACT_DIRS = {
+    d.strip().lower() for d in os.getenv("ARTIFACT_DIRS", "dist,output,results,reports").split(",") if d.strip()
+}
+ARTIFACT_MAX_BYTES = 50 * 1024 * 1024
+ARTIFACT_CACHE_FILE = DATA_DIR / "artifact_cache.json"
+
 # Multi-bot: pool de tokens y estado de workers
 TOKEN_POOL_FILE = DATA_DIR / "token_pool.json"
 WORKERS_STATE_FILE = DATA_DIR / "workers_state.json"
+# Cada token en uso tiene una concesión de TOKEN_LEASE_TTL segundos que renuevan los heartbeats
+# de su worker; si vence, el token se recupera. Los tokens del pool se validan con getMe cada
+# TOKEN_VALIDATE_INTERVAL segundos (0 = nunca) y se reparten primero los más sanos.
+TOKEN_LEASE_TTL = int(os.getenv("TOKEN_LEASE_TTL", "300"))
+TOKEN_VALIDATE_INTERVAL = int(os.getenv("TOKEN_VALIDATE_INTERVAL", "900"))
+
+# Supervisor de workers: heartbeats y reinicio con backoff exponencial
+WORKER_HEARTBEAT_INTERVAL = int(os.getenv("WORKER_HEARTBEAT_INTERVAL", "10"))
+WORKER_HEARTBEAT_TIMEOUT = int(os.getenv("WORKER_HEARTBEAT_TIMEOUT", "60"))  # sin heartbeat → colgado
+WORKER_RESTART_BACKOFF_BASE = float(os.getenv("WORKER_RESTART_BACKOFF_BASE", "2"))
+WORKER_RESTART_BACKOFF_MAX = float(os.getenv("WORKER_RESTART_BACKOFF_MAX", "60"))
+WORKER_CRASH_LOOP_MAX = int(os.getenv("WORKER_CRASH_LOOP_MAX", "5"))  # caídas dentro de la ventana
+WORKER_CRASH_LOOP_WINDOW = int(os.getenv("WORKER_CRASH_LOOP_WINDOW", "300"))
+# Apagado: plazo global para que todos los workers terminen tras SIGTERM antes de SIGKILL.
+# Mientras existe SHUTDOWN_MARKER los workers no envían su propio aviso (va en el resumen)
+WORKER_SHUTDOWN_TIMEOUT = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "10"))
+SHUTDOWN_MARKER = HEARTBEAT_DIR / "shutdown.flag"
+# Plazo para que un worker nuevo confirme que recibe mensajes (si no, se libera su token)
+WORKER_READY_TIMEOUT = float(os.getenv("WORKER_READY_TIMEOUT", "45"))
+
+# Autoescalado: los workers sin actividad en WORKER_IDLE_TTL segundos se aparcan (sesión
+# conservada, token de vuelta al pool) y se relanzan bajo demanda (0 = nunca). Máximo de
+# workers por proyecto (0 = sin límite) y orden de prioridad para los tokens:
+# "proyecto" o "proyecto/rol" separados por comas, de más a menos prioritario.
+WORKER_IDLE_TTL = int(os.getenv("WORKER_IDLE_TTL", "3600"))
+WORKER_MAX_PER_PROJECT = int(os.getenv("WORKER_MAX_PER_PROJECT", "0"))
+WORKER_PRIORITY = [p.strip() for p in os.getenv("WORKER_PRIORITY", "").split(",") if p.strip()]
+PARKED_WORKERS_FILE = DATA_DIR / "parked_workers.json"
+
+# Modo de los workers: "process" (un proceso por worker) o "inprocess" (una Application por
+# worker en el event loop del coordinador)
+WORKER_MODE = os.getenv("WORKER_MODE", "process")
+
+# Webhooks: un servidor HTTP local para el coordinador y todos los workers (vacío = polling).
+# WEBHOOK_URL es la URL HTTPS pública que un proxy/túnel lleva a WEBHOOK_LISTEN:WEBHOOK_PORT
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+WEBHOOK_SECRET_FILE = DATA_DIR / "webhook_secret"
+
+# Zygote: plantilla precargada que crea los workers por fork (solo Linux/macOS)
+WORKER_ZYGOTE = os.getenv("WORKER_ZYGOTE", "1") == "1"
+ZYGOTE_SOCKET = IPC_DIR / "zygote.sock"
+SPAWN_STATS_FILE = DATA_DIR / "spawn_stats.json"
 
 DANGEROUS_COMMANDS = [
     "rm -rf /",
@@ -26,6 +26,10 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await _handle_spawn_project(query, context)
         return
 
+    if data.startswith("wake:"):
+        await _handle_wake(query)
+        return
+
     if data.startswith("kill_confirm:"):
         await _handle_kill_confirm(query)
         return
@@ -86,8 +90,6 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def _handle_spawn_project(query, context) -> None:
     """Callback cuando el usuario selecciona un proyecto para spawn."""
-    from bot.services import token_pool, worker_registry
-
     project_name = query.data[len("spawn_project:"):]
     role = context.user_data.pop("pending_spawn_role", "general")
 
@@ -96,47 +98,61 @@ async def _handle_spawn_project(query, context) -> None:
         await query.edit_message_text(f"Proyecto {project_name} no encontrado.")
         return
 
-    # Adquirir token
-    token_entry = token_pool.acquire_token(proj["name"], role, pid=0)
-    if not token_entry:
-        await query.edit_message_text(
-            "No hay tokens disponibles.\n"
-            "Crea un bot en @BotFather y usa /addtoken."
-        )
+    await _request_worker(query, proj["name"], proj["path"], role)
+
+
+async def _handle_wake(query) -> None:
+    """Callback para relanzar un worker aparcado."""
+    from bot.services import autoscaler
+
+    parked = autoscaler.get_parked(query.data[len("wake:"):])
+    if not parked:
+        await query.edit_message_text("Ese worker ya no esta aparcado.")
         return
+    await _request_worker(query, parked["project_name"], parked["project_path"], parked["role"])
+
+
+async def _request_worker(query, project_name: str, project_path: str, role: str) -> None:
+    """Lanza el worker o lo deja en espera de token, según el autoescalado."""
+    from bot.services import autoscaler
 
-    # Spawn worker
+    await query.edit_message_text(f"Lanzando worker {project_name} / {role}...")
     try:
-        pid = worker_registry.spawn_worker(
-            token_id=token_entry["id"],
-            bot_token=token_entry["bot_token"],
-            bot_username=token_entry["bot_username"],
-            project_name=proj["name"],
-            project_path=proj["path"],
-            role=role,
-        )
+        result = await autoscaler.request_worker(project_name, project_path, role)
     except Exception as e:
-        token_pool.release_token(token_entry["id"])
         await query.edit_message_text(f"Error al crear worker: {e}")
         return
 
-    # Actualizar PID en el token y registrar worker
-    token_pool.update_pid(token_entry["id"], pid)
-    worker_registry.register_worker(
-        token_id=token_entry["id"],
-        bot_username=token_entry["bot_username"],
-        project_name=proj["name"],
-        project_path=proj["path"],
-        role=role,
-        pid=pid,
-    )
+    if result["status"] == "limit":
+        await query.edit_message_text(
+            f"{project_name} ya tiene {result['max']} workers (maximo por proyecto)."
+        )
+        return
+
+    if result["status"] == "queued":
+        text = f"⏳ Sin tokens libres: {project_name} / {role} queda en espera."
+        if result["preempted"]:
+            text += f"\nSe ha aparcado {result['preempted']} para cederle su token."
+        else:
+            text += "\nSe lanzara en cuanto se libere un token (o añade uno con /addtoken)."
+        await query.edit_message_text(text)
+        return
+
+    if result["status"] == "failed":
+        text = f"❌ El worker {project_name} / {role} no arranco: {result['error']}\nToken liberado."
+        if result["log"]:
+            text += f"\n\nSalida del worker:\n{result['log']}"
+        await query.edit_message_text(text[:4000])
+        return
 
+    token_entry, pid = result["token"], result["pid"]
     await query.edit_message_text(
         f"🟢 *Worker creado*\n\n"
         f"Bot: @{token_entry['bot_username']}\n"
-        f"Proyecto: *{proj['name']}*\n"
+        f"Proyecto: *{project_name}*\n"
         f"Rol: _{role}_\n"
-        f"PID: {pid}\n\n"
+        f"PID: {pid}\n"
+        f"Listo en {result['ready_seconds']:.1f}s\n\n"
         f"Abre el chat con @{token_entry['bot_username']} para empezar.",
         parse_mode="Markdown",
     )
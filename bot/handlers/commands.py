@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -7,9 +8,11 @@ from pathlib import Path
 
 from bot.config import BASE_DIR, CLAUDE_PROJECTS_DIR
 from bot.security import authorized_only
-from bot.services import project_manager, session_manager
+from bot.services import project_manager, session_manager, storage_manager
 from bot.services.claude_service import run_claude, stop_claude, is_running
 from bot.services.message_formatter import send_long_message
+from bot.services.whisper_service import cancel_transcriptions
+from bot.handlers.utils import stats_text, whisper_status_line
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +38,8 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         "/nochat - Volver a modo chat libre\n"
         "/newproject `<nombre>` - Crear proyecto nuevo\n"
         "/status - Estado de la sesion actual\n"
+        "/stats - Estadisticas (cache de transcripciones)\n"
+        "/storage - Espacio usado por imagenes y temporales\n"
         "/clear - Limpiar sesion del proyecto activo\n"
         "/stop - Detener ejecucion en curso\n"
         "/ask `<pregunta>` - Pregunta rapida\n"
@@ -42,7 +47,10 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         "/gemini - Generar imagenes con Gemini\n\n"
         "*Multi-bot (workers):*\n"
         "/spawn `[rol]` - Crear worker para un proyecto\n"
+        "/spawnbatch `proyecto/rol, ...` - Crear varios workers en paralelo\n"
         "/bots - Ver workers activos\n"
+        "/wake - Retomar un worker aparcado\n"
+        "/worker `<nombre> <drain|stoprun|reload>` - Ordenes a un worker\n"
         "/kill `[nombre]` - Detener un worker\n"
         "/stopall - Detener todos los workers\n"
         "/addtoken `<token>` - Agregar token de bot\n"
@@ -63,7 +71,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "`/select <nombre>` - Seleccionar proyecto\n"
         "`/newproject <nombre>` - Crear proyecto nuevo\n"
         "`/nochat` - Volver a chat libre\n"
-        "`/status` - Info del proyecto y sesion\n\n"
+        "`/status` - Info del proyecto y sesion\n"
+        "`/stats` - Estadisticas (cache de transcripciones)\n"
+        "`/storage [clean]` - Espacio usado por imagenes y temporales\n\n"
         "*Sesion:*\n"
         "`/clear` - Limpiar sesion actual\n"
         "`/newchat` - Alias de /clear\n"
@@ -74,14 +84,17 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "`/gemini [rapido|pro] [clean] <prompt>` - Generar imagen con Gemini\n\n"
         "*Multi-bot (workers):*\n"
         "`/spawn [rol]` - Crear worker para un proyecto\n"
+        "`/spawnbatch proyecto/rol, ...` - Crear varios workers en paralelo\n"
         "`/bots` - Ver workers activos\n"
+        "`/wake` - Retomar un worker aparcado\n"
+        "`/worker <nombre> <drain|stoprun|reload>` - Ordenes a un worker\n"
         "`/kill [nombre]` - Detener un worker\n"
         "`/stopall` - Detener todos los workers\n"
         "`/addtoken <token>` - Agregar token al pool\n"
         "`/removetoken <id>` - Quitar token del pool\n\n"
         "*Uso:*\n"
         "1. Selecciona un proyecto con /projects\n"
-        "2. Envia texto, imagen o nota de voz\n"
+        "2. Envia texto, imagen, nota de voz o archivo\n"
         "3. Usa /spawn para crear bots dedicados\n"
     )
     await send_long_message(update, text)
@@ -155,11 +168,45 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             f"*Estado actual*\n\n"
             f"*Modo:* Chat libre (sin proyecto)\n"
             f"*Session ID:* `{session_id or 'ninguna'}`\n"
-            f"\nUsa /projects para seleccionar un proyecto."
+            f"\nUsa /projects para seleccionar un proyecto.\n"
         )
+    text += f"\n{await whisper_status_line()}"
     await send_long_message(update, text)
 
 
+@authorized_only
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await send_long_message(update, await asyncio.to_thread(stats_text))
+
+
+@authorized_only
+async def storage_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Espacio usado por temporales e imágenes de cada proyecto. `/storage clean` limpia ya."""
+    lines = ["*Almacenamiento*\n"]
+    if context.args and context.args[0] == "clean":
+        report = await asyncio.to_thread(storage_manager.run_janitor)
+        freed = sum(r["bytes"] for r in report)
+        files = sum(r["files"] for r in report)
+        kept = sum(r["kept_protected"] for r in report)
+        lines.append(f"Limpieza: {files} archivos, {freed / 1024 / 1024:.1f} MB liberados"
+                     f" ({kept} conservados por sesiones activas)\n")
+
+    dirs = storage_manager.managed_dirs()
+    usages = await asyncio.to_thread(lambda: [storage_manager.usage(d["path"]) for d in dirs])
+    for d, u in zip(dirs, usages):
+        if not u["files"]:
+            continue
+        age = f", el mas antiguo hace {u['oldest_age'] / 86400:.0f} d" if u["oldest_age"] else ""
+        quota = f" / {d['max_bytes'] / 1024 / 1024:.0f}" if d["max_bytes"] else ""
+        lines.append(
+            f"*{d['label']}:* {u['bytes'] / 1024 / 1024:.1f}{quota} MB"
+            f" ({u['files']} archivos{age})"
+        )
+    if len(lines) == 1 or (len(lines) == 2 and context.args):
+        lines.append("Sin archivos temporales.")
+    await send_long_message(update, "\n".join(lines))
+
+
 @authorized_only
 async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     active = session_manager.get_active_project()
@@ -204,6 +251,8 @@ async def newproject_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 @authorized_only
 async def stop_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     stopped = stop_claude()
+    if cancel_transcriptions():
+        stopped = True
     if not stopped:
         await update.message.reply_text("No hay nada en ejecucion.", parse_mode="Markdown")
 
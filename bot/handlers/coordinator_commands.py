@@ -1,15 +1,46 @@
-"""Comandos del bot coordinador: /spawn, /bots, /kill, /stopall, /addtoken, /removetoken."""
+"""Comandos del bot coordinador: /spawn, /spawnbatch, /bots, /wake, /worker, /kill, /stopall, /addtoken, /removetoken."""
 
+import asyncio
 import logging
+import time
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from bot.security import authorized_only
-from bot.services import project_manager, token_pool, worker_registry
+from bot.services import autoscaler, project_manager, shutdown, token_pool, worker_registry, worker_supervisor
 
 logger = logging.getLogger(__name__)
 
+_STATE_LABELS = {"idle": "libre", "busy": "ocupado", "draining": "drenando"}
+
+# Órdenes de /worker → comando del canal de control
+_WORKER_ACTIONS = {"drain": "drain", "stoprun": "stop-run", "reload": "reload"}
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes}m {secs:02d}s" if minutes else f"{secs}s"
+
+
+def _format_live(live: dict) -> str:
+    """Líneas de /bots con el estado en vivo que reporta el worker."""
+    state = _STATE_LABELS.get(live.get("state"), live.get("state", "?"))
+    runs = live.get("runs") or []
+    if runs:
+        state += f" ({len(runs)} ejecucion{'es' if len(runs) > 1 else ''}, la mas larga {_format_duration(max(runs))})"
+    lines = [f"   Estado: {state}", f"   Cola: {live.get('queue', 0)}"]
+    if live.get("cpu") is None:
+        return "\n".join(lines)  # worker alojado: sus recursos son los del coordinador
+    usage = []
+    if live.get("rss"):
+        usage.append(f"{live['rss'] / 1024 / 1024:.0f} MB")
+    if live.get("pss"):
+        usage.append(f"PSS {live['pss'] / 1024 / 1024:.0f} MB")
+    usage.append(f"CPU {live.get('cpu', 0):.0f}%")
+    lines.append(f"   Recursos: {' · '.join(usage)}")
+    return "\n".join(lines)
+
 
 @authorized_only
 async def spawn_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -19,11 +50,10 @@ async def spawn_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     else:
         role = " ".join(context.args)
 
-    # Verificar tokens disponibles
-    available = token_pool.get_available_tokens()
-    if not available:
+    # Verificar que hay tokens (si están todos en uso, la petición queda en espera)
+    if not token_pool.list_tokens():
         await update.message.reply_text(
-            "No hay tokens disponibles en el pool.\n\n"
+            "No hay tokens en el pool.\n\n"
             "Crea un bot en @BotFather y añádelo con:\n"
             "`/addtoken TU_TOKEN`",
             parse_mode="Markdown",
@@ -54,6 +84,61 @@ async def spawn_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     )
 
 
+@authorized_only
+async def spawnbatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Lanza varios workers a la vez. Uso: /spawnbatch proyecto/rol, proyecto/rol, ..."""
+    specs = [s.strip() for s in " ".join(context.args or []).split(",") if s.strip()]
+    if not specs:
+        await update.message.reply_text(
+            "Uso: `/spawnbatch proyecto/rol, proyecto/rol, ...`\n\n"
+            "Sin rol se usa `general`. Los workers arrancan en paralelo y se informa "
+            "del tiempo hasta que cada uno recibe mensajes.",
+            parse_mode="Markdown",
+        )
+        return
+
+    requests, lines = [], []
+    for spec in specs:
+        project_name, _, role = spec.partition("/")
+        proj = project_manager.find_project(project_name.strip())
+        if not proj:
+            lines.append(f"❌ {spec}: proyecto no encontrado")
+            continue
+        requests.append((proj, role.strip() or "general"))
+    if not requests:
+        await update.message.reply_text("\n".join(lines))
+        return
+
+    msg = await update.message.reply_text(f"Lanzando {len(requests)} workers en paralelo...")
+    started = time.monotonic()
+    results = await asyncio.gather(
+        *(autoscaler.request_worker(proj["name"], proj["path"], role) for proj, role in requests),
+        return_exceptions=True,
+    )
+    total = time.monotonic() - started
+
+    failures = []
+    for (proj, role), result in zip(requests, results):
+        name = f"{proj['name']} / {role}"
+        if isinstance(result, Exception):
+            lines.append(f"❌ {name}: {result}")
+        elif result["status"] == "started":
+            lines.append(f"🟢 {name}: @{result['token']['bot_username']} listo en {result['ready_seconds']:.1f}s")
+        elif result["status"] == "queued":
+            lines.append(f"⏳ {name}: en espera de token")
+        elif result["status"] == "limit":
+            lines.append(f"⛔ {name}: maximo de {result['max']} workers por proyecto")
+        else:
+            lines.append(f"❌ {name}: {result['error']}")
+            if result["log"]:
+                failures.append(f"Salida de {name}:\n{result['log']}")
+    lines.append(f"\nTotal: {total:.1f}s")
+
+    await msg.edit_text("\n".join(lines))
+    for text in failures:
+        await update.message.reply_text(text[:4000])
+
+
 @authorized_only
 async def bots_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Lista todos los worker bots activos."""
@@ -61,29 +146,119 @@ async def bots_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     cleaned = worker_registry.cleanup_dead_workers()
 
     workers = worker_registry.list_active_workers()
-    if not workers:
+    parked = autoscaler.list_parked()
+    waiting = autoscaler.list_waiting()
+    if not workers and not parked and not waiting:
         await update.message.reply_text("No hay workers activos.")
         return
 
+    # Estado en vivo de todos a la vez (cada consulta tiene su propio timeout)
+    live_states = await asyncio.gather(*(worker_registry.query_live(w) for w in workers))
+
     lines = ["*Workers activos:*\n"]
-    for w in workers:
-        alive = worker_registry._is_pid_alive(w.get("pid", 0))
-        icon = "🟢" if alive else "🔴"
-        lines.append(
+    for w, live in zip(workers, live_states):
+        if w.get("status") == "restarting":
+            icon = "🟡"
+        elif w.get("status") == "parking":
+            icon = "💤"
+        elif w.get("status") == "starting":
+            icon = "⏳"
+        else:
+            icon = "🟢" if worker_registry.is_worker_alive(w) else "🔴"
+        entry = (
             f"{icon} *@{w['bot_username']}*\n"
             f"   Proyecto: {w['project_name']}\n"
             f"   Rol: {w['role']}\n"
             f"   PID: {w['pid']}"
         )
+        if w.get("mode") == "inprocess":
+            entry += "\n   Modo: dentro del coordinador"
+        age = worker_supervisor.heartbeat_age(w)
+        if age is not None:
+            entry += f"\n   Heartbeat: hace {age:.0f}s"
+        if w.get("ready_seconds") is not None:
+            entry += f"\n   Arranque: {w['ready_seconds']:.1f}s ({w.get('spawn_mode', '?')})"
+        if w.get("restarts"):
+            entry += f"\n   Reinicios: {w['restarts']}"
+        if live:
+            entry += "\n" + _format_live(live)
+        lines.append(entry)
+
+    if parked:
+        lines.append("\n*Aparcados* (/wake para retomarlos):")
+        for p in parked:
+            lines.append(f"💤 {p['project_name']} / {p['role']} (era @{p['bot_username']})")
+    if waiting:
+        lines.append("\n*En espera de token:*")
+        for w in waiting:
+            lines.append(f"⏳ {w['project_name']} / {w['role']}")
 
     # Mostrar tokens disponibles
-    available = len(token_pool.get_available_tokens())
-    total = len(token_pool.list_tokens())
-    lines.append(f"\nTokens: {total - available}/{total} en uso")
+    tokens = token_pool.list_tokens()
+    in_use = sum(1 for t in tokens if t["status"] == "in_use")
+    revoked = sum(1 for t in tokens if token_pool.is_revoked(t))
+    line = f"\nTokens: {in_use}/{len(tokens)} en uso"
+    if revoked:
+        line += f", {revoked} revocados (/removetoken)"
+    lines.append(line)
 
     await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
 
 
+@authorized_only
+async def wake_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Relanza un worker aparcado con su sesión. Uso: /wake"""
+    parked = autoscaler.list_parked()
+    if not parked:
+        await update.message.reply_text("No hay workers aparcados.")
+        return
+
+    buttons = [
+        [InlineKeyboardButton(f"{p['project_name']} / {p['role']}", callback_data=f"wake:{p['key']}")]
+        for p in parked
+    ]
+    await update.message.reply_text(
+        "*Workers aparcados:*\nSe relanzan con su sesion (con el mismo bot si sigue libre).",
+        reply_markup=InlineKeyboardMarkup(buttons),
+        parse_mode="Markdown",
+    )
+
+
+@authorized_only
+async def worker_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Órdenes a un worker por su canal de control. Uso: /worker <nombre> <drain|stoprun|reload>"""
+    if len(context.args or []) < 2 or context.args[1].lower() not in _WORKER_ACTIONS:
+        await update.message.reply_text(
+            "Uso: `/worker <nombre> <drain|stoprun|reload>`\n\n"
+            "drain - terminar lo pendiente y apagarse\n"
+            "stoprun - detener la ejecucion en curso\n"
+            "reload - terminar lo pendiente y reiniciarse",
+            parse_mode="Markdown",
+        )
+        return
+
+    target = context.args[0].lstrip("@")
+    worker = worker_registry.find_worker_by_name(target)
+    if not worker:
+        await update.message.reply_text(f"Worker `{target}` no encontrado.", parse_mode="Markdown")
+        return
+
+    action = context.args[1].lower()
+    reply = await worker_registry.send_command(worker, _WORKER_ACTIONS[action])
+    if not reply or "error" in reply:
+        detail = reply["error"] if reply else "no responde"
+        await update.message.reply_text(f"@{worker['bot_username']}: {detail}")
+        return
+
+    if action == "stoprun":
+        text = "ejecucion detenida." if reply.get("stopped") else "no habia nada en ejecucion."
+    elif action == "drain":
+        text = "terminara lo pendiente y se apagara."
+    else:
+        text = "terminara lo pendiente y se reiniciara."
+    await update.message.reply_text(f"@{worker['bot_username']}: {text}")
+
+
 @authorized_only
 async def kill_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Mata un worker bot. Uso: /kill <nombre>"""
@@ -136,8 +311,9 @@ async def stopall_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text("No hay workers activos.")
         return
 
-    count = worker_registry.kill_all_workers()
-    await update.message.reply_text(f"Detenidos {count} workers.")
+    msg = await update.message.reply_text(f"Deteniendo {len(workers)} workers...")
+    summary = await shutdown.shutdown_workers()
+    await msg.edit_text(f"🔴 {shutdown.summary_text(summary)}")
 
 
 @authorized_only
@@ -156,7 +332,7 @@ async def addtoken_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     # Validar token contra la API de Telegram
     msg = await update.message.reply_text("Validando token...")
 
-    bot_info = token_pool.validate_token(bot_token)
+    bot_info = await token_pool.validate_token(bot_token)
     if not bot_info:
         await msg.edit_text("Token inválido. Verifica que lo copiaste bien.")
         return
@@ -190,8 +366,14 @@ async def removetoken_command(update: Update, context: ContextTypes.DEFAULT_TYPE
 
         lines = ["*Tokens en el pool:*\n"]
         for t in tokens:
-            icon = "🔒" if t["status"] == "in_use" else "✅"
-            lines.append(f"{icon} `{t['id']}` — @{t['bot_username']} ({t['status']})")
+            if token_pool.is_revoked(t):
+                icon = "⛔"
+            else:
+                icon = "🔒" if t["status"] == "in_use" else "✅"
+            lines.append(
+                f"{icon} `{t['id']}` — @{t['bot_username']} ({t['status']}, "
+                f"salud {token_pool.health_score(t):.0%})"
+            )
         lines.append("\nUso: `/removetoken <id>`")
         await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
         return
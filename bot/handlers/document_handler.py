@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from pathlib import Path
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from bot.config import TEMP_DIR, UPLOADS_DIRNAME, DOCUMENT_MAX_BYTES
+from bot.security import authorized_only
+from bot.services import document_service, session_manager, storage_manager
+from bot.services.file_downloader import FileTooLarge, download_to_path
+from bot.handlers.utils import resolve_context, run_with_feedback
+
+logger = logging.getLogger(__name__)
+
+
+def _unique_path(directory: Path, filename: str, file_unique_id: str) -> Path:
+    """
+    Ruta de destino sin componentes de directorio que no exista todavía: si el nombre está
+    ocupado añade el id, y un contador si el mismo archivo ya se envió antes.
+    """
+    name = Path(filename).name or file_unique_id
+    path = directory / name
+    stem, suffix = path.stem, path.suffix
+    attempt = 1
+    while path.exists():
+        tag = file_unique_id if attempt == 1 else f"{file_unique_id}_{attempt}"
+        path = directory / f"{stem}_{tag}{suffix}"
+        attempt += 1
+    return path
+
+
+@authorized_only
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    ctx = resolve_context()
+    if "error" in ctx:
+        await update.message.reply_text(ctx["error"], parse_mode="Markdown")
+        return
+
+    document = update.message.document
+    if not document:
+        return
+
+    if document.file_size and document.file_size > DOCUMENT_MAX_BYTES:
+        await update.message.reply_text(
+            f"Archivo demasiado grande ({document.file_size / 1024 / 1024:.1f} MB, "
+            f"max {DOCUMENT_MAX_BYTES / 1024 / 1024:.0f} MB)."
+        )
+        return
+
+    uploads_dir = Path(ctx["cwd"]) / UPLOADS_DIRNAME if ctx["cwd"] else TEMP_DIR / "uploads"
+    status_msg = await update.message.reply_text("Descargando archivo...")
+
+    # Descarga por bloques directamente al proyecto
+    try:
+        file = await document.get_file()
+        path = _unique_path(uploads_dir, document.file_name or "", file.file_unique_id)
+        await download_to_path(file, path, max_bytes=DOCUMENT_MAX_BYTES)
+    except FileTooLarge as e:
+        await status_msg.edit_text(f"Archivo demasiado grande: {e}")
+        return
+    except Exception as e:
+        logger.error(f"Error descargando documento: {e}")
+        await status_msg.edit_text(f"Error al descargar el archivo: {e}")
+        return
+    logger.info(f"Documento guardado: {path}")
+
+    saved = [path]
+    if document_service.is_archive(path):
+        extract_dir = _unique_path(uploads_dir, document_service.archive_stem(path), file.file_unique_id)
+        try:
+            files = await asyncio.to_thread(document_service.extract_archive, path, extract_dir)
+        except Exception as e:
+            logger.warning(f"No se pudo extraer {path.name}: {e}")
+            await status_msg.edit_text(f"No se pudo extraer {path.name}: {e}")
+            return
+        saved += files
+        location = f"[Archivo {path.name} extraido en: {extract_dir.resolve()}]"
+        summary = await asyncio.to_thread(document_service.summarize_archive, extract_dir, files)
+    else:
+        location = f"[El archivo está en: {path.resolve()}]"
+        summary = await asyncio.to_thread(document_service.summarize_file, path)
+
+    caption = update.message.caption or "Revisa este archivo"
+    prompt = f"{caption}\n\n{location}\n[Resumen local:\n{summary}]"
+
+    await run_with_feedback(
+        prompt=prompt,
+        reply_to=update.message,
+        send_to=update,
+        cwd=ctx["cwd"],
+        session_key=ctx["session_key"],
+        thinking_text=f"Procesando {path.name}...",
+        thinking_msg=status_msg,
+        user_text=caption,
+    )
+
+    # Mientras la sesión siga activa, la limpieza no borra estos archivos
+    storage_manager.record_references(saved, session_manager.get_session_id(ctx["session_key"]))
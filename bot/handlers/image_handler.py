@@ -1,62 +1,119 @@
 import asyncio
 import logging
+import time
 from pathlib import Path
 
-from telegram import Update
+from telegram import Message, Update
 from telegram.ext import ContextTypes
 
-from bot.config import TEMP_DIR
+from bot.config import (
+    ALBUM_FANOUT_MIN_IMAGES,
+    IMAGES_DIRNAME,
+    IMAGE_DOWNLOAD_CONCURRENCY,
+    MEDIA_GROUP_IDLE,
+    MEDIA_GROUP_MAX_WAIT,
+    TEMP_DIR,
+)
 from bot.security import authorized_only
+from bot.services import run_stats, session_manager, storage_manager
+from bot.services.claude_service import run_claude
+from bot.services.file_downloader import download_to_path
+from bot.services.image_processor import ORIGINALS_DIRNAME, process_image, savings_summary
+from bot.services.media_group import MediaGroupAggregator
 from bot.handlers.utils import resolve_context, run_with_feedback
 
 logger = logging.getLogger(__name__)
 
-# Buffer para agrupar imágenes de un mismo álbum (media_group)
-_media_groups: dict[str, dict] = {}
-_media_group_locks: dict[str, asyncio.Lock] = {}
+# Etiqueta en el pie de foto para pasar a Claude la imagen original sin procesar
+ORIGINAL_TAG = "#original"
 
+# Etiquetas para forzar el modo de análisis de un álbum (si no, se decide por número de imágenes)
+FANOUT_TAG = "#paralelo"
+SINGLE_TAG = "#unturno"
 
-@authorized_only
-async def handle_image(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    media_group_id = update.message.media_group_id
-
-    # Imagen suelta (sin álbum) — procesar directamente
-    if not media_group_id:
-        await _process_images(update, context, [update.message])
-        return
+FANOUT_FINDING_LINES = 8
+_FINDING_MAX_CHARS = 1200
 
-    # Imagen parte de un álbum — agrupar y esperar
-    if media_group_id not in _media_group_locks:
-        _media_group_locks[media_group_id] = asyncio.Lock()
+# Descargas de fotos en paralelo, acotadas para todo el proceso
+_download_semaphore = asyncio.Semaphore(IMAGE_DOWNLOAD_CONCURRENCY)
 
-    async with _media_group_locks[media_group_id]:
-        if media_group_id not in _media_groups:
-            _media_groups[media_group_id] = {
-                "messages": [],
-                "first_update": update,
-                "scheduled": False,
-            }
 
-        _media_groups[media_group_id]["messages"].append(update.message)
+async def _process_album(messages: list, first: tuple) -> None:
+    update, context = first
+    await _process_images(update, context, messages)
 
-        if not _media_groups[media_group_id]["scheduled"]:
-            _media_groups[media_group_id]["scheduled"] = True
-            asyncio.create_task(_process_media_group(media_group_id, update, context))
 
+# Agrupa las imágenes de un mismo álbum (media_group) en una sola llamada a Claude
+_media_groups = MediaGroupAggregator(_process_album, idle=MEDIA_GROUP_IDLE, max_wait=MEDIA_GROUP_MAX_WAIT)
 
-async def _process_media_group(
-    media_group_id: str, update: Update, context: ContextTypes.DEFAULT_TYPE
-) -> None:
-    """Espera a que lleguen todas las imágenes del álbum y las procesa juntas."""
-    await asyncio.sleep(1.0)
 
-    group_data = _media_groups.pop(media_group_id, None)
-    _media_group_locks.pop(media_group_id, None)
+@authorized_only
+async def handle_image(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    media_group_id = update.message.media_group_id
 
-    if not group_data:
+    # Imagen suelta (sin álbum) — procesar directamente
+    if not media_group_id:
+        await _process_images(update, context, [update.message])
         return
 
-    await _process_images(update, context, group_data["messages"])
+    # Imagen parte de un álbum — agrupar hasta que dejen de llegar
+    _media_groups.add(media_group_id, update.message, first=(update, context))
+
+
+async def _download_photo(msg, images_dir: Path) -> dict:
+    async with _download_semaphore:
+        file = await msg.photo[-1].get_file()
+        image_path = images_dir / ORIGINALS_DIRNAME / f"{file.file_unique_id}.jpg"
+        await download_to_path(file, image_path)
+    logger.info(f"Imagen descargada: {image_path}")
+    return await asyncio.to_thread(process_image, image_path, images_dir)
+
+
+async def _analyze_each(
+    image_paths: list[Path], caption: str, cwd: str | None, thinking_msg,
+) -> list[str] | None:
+    """
+    Fase map: una ejecución corta y sin sesión por imagen, en paralelo
+    (acotadas por CLAUDE_MAX_CONCURRENT). Retorna los hallazgos en orden, o None si se detuvo.
+    """
+    done = 0
+
+    async def _one(path: Path) -> dict:
+        nonlocal done
+        result = await run_claude(
+            prompt=(
+                f"Tarea del usuario para un conjunto de imágenes: {caption}\n\n"
+                f"Analiza SOLO esta imagen: {path.resolve()}\n"
+                f"Responde con los hallazgos relevantes para la tarea en {FANOUT_FINDING_LINES} lineas como maximo, "
+                f"sin introducción ni marcadores interactivos."
+            ),
+            cwd=cwd,
+            user_text=caption,
+        )
+        done += 1
+        try:
+            await thinking_msg.edit_text(f"Analizando cada imagen en paralelo... {done}/{len(image_paths)}")
+        except Exception:
+            pass
+        return result
+
+    results = await asyncio.gather(*(_one(p) for p in image_paths))
+    if any(r.get("cancelled") for r in results):
+        try:
+            await thinking_msg.edit_text("Ejecucion detenida.")
+        except Exception:
+            pass
+        return None
+
+    findings = []
+    for r in results:
+        text = r.get("response", "").strip()
+        if r.get("error"):
+            text = f"(sin analisis: {text[:200]})"
+        elif len(text) > _FINDING_MAX_CHARS:
+            text = text[:_FINDING_MAX_CHARS] + "..."
+        findings.append(text)
+    return findings
 
 
 async def _process_images(
@@ -68,42 +125,98 @@ async def _process_images(
         await update.message.reply_text(ctx["error"], parse_mode="Markdown")
         return
 
-    if ctx["cwd"]:
-        images_dir = Path(ctx["cwd"]) / ".claude-bot-images"
-    else:
-        images_dir = TEMP_DIR
+    images_dir = images_dir_for(ctx)
 
+    # Descargar todas las imágenes a la vez (el orden del álbum se conserva)
+    photo_messages = [msg for msg in messages if msg.photo]
+    images = list(await asyncio.gather(
+        *(_download_photo(msg, images_dir) for msg in photo_messages)
+    ))
+    caption = next((msg.caption for msg in photo_messages if msg.caption), None)
+
+    await analyze_images(update, ctx, images, caption)
+
+
+def images_dir_for(ctx: dict) -> Path:
+    """Carpeta de imágenes del proyecto activo (TEMP_DIR en chat libre)."""
+    images_dir = Path(ctx["cwd"]) / IMAGES_DIRNAME if ctx["cwd"] else TEMP_DIR
     images_dir.mkdir(parents=True, exist_ok=True)
+    return images_dir
+
 
-    # Descargar todas las imágenes
-    image_paths = []
-    caption = None
-    for msg in messages:
-        if not msg.photo:
-            continue
-        photo = msg.photo[-1]
-        file = await photo.get_file()
-        image_path = images_dir / f"{file.file_unique_id}.jpg"
-        await file.download_to_drive(str(image_path))
-        image_paths.append(image_path)
-        logger.info(f"Imagen guardada: {image_path}")
-        if not caption and msg.caption:
-            caption = msg.caption
-
-    if not image_paths:
+async def prepare_images(paths: list[Path], images_dir: Path) -> list[dict]:
+    """Pasa por process_image archivos ya escritos en disco (p. ej. fotogramas de un vídeo)."""
+    return list(await asyncio.gather(
+        *(asyncio.to_thread(process_image, path, images_dir) for path in paths)
+    ))
+
+
+async def analyze_images(
+    update: Update,
+    ctx: dict,
+    images: list[dict],
+    caption: str | None,
+    extra_context: str = "",
+    thinking_msg: Message | None = None,
+) -> None:
+    """
+    Envía a Claude imágenes ya preparadas (resultado de process_image), en un turno o en
+    paralelo según el tamaño del álbum. extra_context se añade al prompt (p. ej. transcripción);
+    thinking_msg es un mensaje de progreso ya enviado para reutilizar.
+    """
+    if not images:
         return
 
-    caption = caption or ("Analiza esta imagen" if len(image_paths) == 1 else "Analiza estas imagenes")
+    # "#original" en el pie: Claude recibe las imágenes sin procesar
+    use_originals = bool(caption and ORIGINAL_TAG in caption)
+    if use_originals:
+        caption = caption.replace(ORIGINAL_TAG, "").strip()
+    image_paths = [img["original_path" if use_originals else "path"] for img in images]
+
+    # Modo de análisis: en paralelo por imagen (map-reduce) o en un solo turno
+    n = len(image_paths)
+    fanout = ALBUM_FANOUT_MIN_IMAGES > 0 and n >= ALBUM_FANOUT_MIN_IMAGES
+    if caption and FANOUT_TAG in caption:
+        fanout = n > 1
+    elif caption and SINGLE_TAG in caption:
+        fanout = False
+    if caption:
+        caption = caption.replace(FANOUT_TAG, "").replace(SINGLE_TAG, "").strip()
+
+    caption = caption or ("Analiza esta imagen" if n == 1 else "Analiza estas imagenes")
+
+    thinking_text = f"Procesando {n} imagenes..." if n > 1 else "Procesando imagen..."
+    savings = None if use_originals else savings_summary(images)
+    if savings:
+        thinking_text += f"\n\nOptimizadas ({ORIGINAL_TAG} para enviar los originales):\n{savings}"
 
     # Construir prompt con todas las rutas
     paths_text = "\n".join(f"- {p.resolve()}" for p in image_paths)
-    if len(image_paths) == 1:
+    if n == 1:
         prompt = f"{caption}\n\n[La imagen está en: {image_paths[0].resolve()}]"
     else:
-        prompt = f"{caption}\n\n[Las {len(image_paths)} imágenes están en:\n{paths_text}]"
-
-    n = len(image_paths)
-    thinking_text = f"Procesando {n} imagenes..." if n > 1 else "Procesando imagen..."
+        prompt = f"{caption}\n\n[Las {n} imágenes están en:\n{paths_text}]"
+    if extra_context:
+        prompt += f"\n{extra_context}"
+
+    started = time.monotonic()
+    if fanout:
+        fanout_text = f"{thinking_text}\n\nAnalizando cada imagen en paralelo..."
+        if thinking_msg:
+            await thinking_msg.edit_text(fanout_text)
+        else:
+            thinking_msg = await update.message.reply_text(fanout_text)
+        findings = await _analyze_each(image_paths, caption, ctx["cwd"], thinking_msg)
+        if findings is None:
+            return
+        prompt = (
+            f"{caption}\n\n[Análisis previo de cada imagen (hecho en paralelo, sin sesión):\n"
+            + "\n".join(f"{i}. {p.resolve()}\n{f}" for i, (p, f) in enumerate(zip(image_paths, findings), 1))
+            + "\n]\n[Usa este análisis para responder; abre una imagen solo si necesitas más detalle.]"
+        )
+        if extra_context:
+            prompt += f"\n{extra_context}"
+        thinking_text = f"Combinando el analisis de {n} imagenes..."
 
     await run_with_feedback(
         prompt=prompt,
@@ -112,4 +225,16 @@ async def _process_images(
         cwd=ctx["cwd"],
         session_key=ctx["session_key"],
         thinking_text=thinking_text,
+        thinking_msg=thinking_msg,
+        user_text=caption,
+    )
+    if n > 1:
+        elapsed = time.monotonic() - started
+        run_stats.record_album_run("fanout" if fanout else "single", n, elapsed)
+        logger.info(f"Album de {n} imagenes ({'paralelo' if fanout else 'un turno'}): {elapsed:.1f}s")
+
+    # Mientras la sesión siga activa, la limpieza no borra estas imágenes
+    storage_manager.record_references(
+        [img["path"] for img in images] + [img["original_path"] for img in images],
+        session_manager.get_session_id(ctx["session_key"]),
     )
@@ -9,6 +9,8 @@ from bot.config import BASE_DIR
 from bot.services import session_manager, project_manager
 from bot.services.claude_service import run_claude
 from bot.services.message_formatter import send_long_message
+from bot.services import run_stats, transcript_cache, whisper_daemon
+from bot.services.whisper_service import model_status, uses_daemon
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +30,74 @@ def resolve_context() -> dict:
         return {"cwd": None, "session_key": "__chat__", "active": None}
 
 
+async def whisper_status_line() -> str:
+    """Línea de estado del modelo Whisper para /status (del servicio compartido si lo hay)."""
+    status = model_status()
+    source = ""
+    if uses_daemon():
+        daemon_status = await whisper_daemon.query_status()
+        if daemon_status:
+            status = daemon_status["model"]
+            source = f" [servicio compartido, cola {daemon_status['queue']}]"
+
+    state = status["state"]
+    if state == "ready":
+        detail = f"listo (carga {status['load_time']:.1f}s"
+        if status["warmup_time"] is not None:
+            detail += f", warm-up {status['warmup_time']:.1f}s"
+        detail += ")"
+    elif state == "loading":
+        detail = "cargando..."
+    elif state == "error":
+        detail = f"error ({status['error']})"
+    else:
+        detail = "no cargado (se carga con el primer audio)"
+    return f"*Whisper:* {detail}{source}"
+
+
+def stats_text() -> str:
+    """Estadísticas de uso para /stats."""
+    cache = transcript_cache.stats()
+    lookups = cache["hits"] + cache["misses"]
+    hit_rate = f"{100 * cache['hits'] / lookups:.0f}%" if lookups else "-"
+    text = (
+        "*Estadisticas*\n\n"
+        "*Cache de transcripciones:*\n"
+        f"Entradas: {cache['entries']} ({cache['bytes'] / 1024:.1f} KB)\n"
+        f"Aciertos: {cache['hits']} / {lookups} ({hit_rate})\n"
+    )
+    albums = run_stats.album_summary()
+    if albums:
+        text += "\n*Albumes (tiempo hasta la respuesta):*\n"
+        labels = {"single": "Un turno", "fanout": "En paralelo"}
+        for mode, s in albums.items():
+            text += (
+                f"{labels.get(mode, mode)}: {s['avg_seconds']:.1f}s de media, "
+                f"{s['seconds_per_image']:.1f}s/imagen ({s['runs']} albumes)\n"
+            )
+    spawns = run_stats.spawn_summary()
+    if spawns:
+        text += "\n*Arranque de workers (hasta estar listo):*\n"
+        labels = {"zygote": "Zygote (fork)", "exec": "Subproceso"}
+        for mode, s in spawns.items():
+            memory = ""
+            if s["avg_rss"]:
+                memory += f", RSS {s['avg_rss'] / 1024 / 1024:.0f} MB"
+            if s["avg_pss"]:
+                memory += f", PSS {s['avg_pss'] / 1024 / 1024:.0f} MB"
+            text += f"{labels.get(mode, mode)}: {s['avg_seconds']:.1f}s de media{memory} ({s['spawns']} arranques)\n"
+    from bot.services import webhook_ingress
+    if webhook_ingress.is_serving():
+        ingress = webhook_ingress.stats()
+        text += (
+            "\n*Webhook:*\n"
+            f"Bots: {ingress['routes']}, conexiones abiertas: {ingress['connections_open']} "
+            f"({ingress['connections_total']} en total)\n"
+            f"Actualizaciones: {ingress['updates']} (rechazadas para reintento: {ingress['rejected']})\n"
+        )
+    return text
+
+
 async def run_with_feedback(
     prompt: str,
     reply_to: Message,
@@ -36,6 +106,8 @@ async def run_with_feedback(
     session_key: str,
     thinking_text: str = "Procesando...",
     response_header: str = "",
+    thinking_msg: Message | None = None,
+    user_text: str | None = None,
 ) -> None:
     """
     Ejecuta Claude con feedback visual: mensaje de progreso, notificaciones
@@ -49,9 +121,17 @@ async def run_with_feedback(
         session_key: Clave de sesión para persistencia.
         thinking_text: Texto inicial del mensaje de progreso.
         response_header: Texto a prepender a la respuesta (ej: transcripción).
+        thinking_msg: Mensaje de progreso ya enviado para reutilizar en vez de crear otro.
+        user_text: Parte del prompt escrita por el usuario (ver run_claude).
     """
     session_id = session_manager.get_session_id(session_key)
-    thinking_msg = await reply_to.reply_text(thinking_text)
+    if thinking_msg:
+        try:
+            await thinking_msg.edit_text(thinking_text)
+        except Exception:
+            pass
+    else:
+        thinking_msg = await reply_to.reply_text(thinking_text)
 
     async def _notify(msg: str):
         try:
@@ -65,6 +145,7 @@ async def run_with_feedback(
             cwd=cwd,
             session_id=session_id,
             on_notification=_notify,
+            user_text=user_text,
         )
     except asyncio.CancelledError:
         try:
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from bot.config import VIDEO_KEYFRAMES, VIDEO_MAX_BYTES
+from bot.security import authorized_only
+from bot.services import transcript_cache, video_service
+from bot.services.file_downloader import download_to_memory
+from bot.services.image_processor import ORIGINALS_DIRNAME
+from bot.handlers.utils import resolve_context
+from bot.handlers.voice_handler import run_transcript, transcribe_with_progress
+from bot.handlers.image_handler import analyze_images, images_dir_for, prepare_images
+
+logger = logging.getLogger(__name__)
+
+
+@authorized_only
+async def handle_video(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Vídeos y notas de vídeo: el audio se transcribe desde memoria por el mismo camino que
+    las notas de voz y, si VIDEO_KEYFRAMES > 0, unos fotogramas clave se analizan como imágenes.
+    """
+    ctx = resolve_context()
+    if "error" in ctx:
+        await update.message.reply_text(ctx["error"], parse_mode="Markdown")
+        return
+
+    video = update.message.video or update.message.video_note
+    if not video:
+        return
+
+    if video.file_size and video.file_size > VIDEO_MAX_BYTES:
+        await update.message.reply_text(
+            f"Video demasiado grande ({video.file_size / 1024 / 1024:.1f} MB, "
+            f"max {VIDEO_MAX_BYTES / 1024 / 1024:.0f} MB)."
+        )
+        return
+
+    status_msg = await update.message.reply_text("Procesando video...")
+
+    # El vídeo nunca se escribe a disco: se demuxa desde memoria
+    try:
+        file = await video.get_file()
+        data = await download_to_memory(file)
+    except Exception as e:
+        logger.error(f"Error descargando video: {e}")
+        await status_msg.edit_text(f"Error al descargar el video: {e}")
+        return
+    logger.info(f"Video descargado en memoria ({data.getbuffer().nbytes} bytes)")
+
+    try:
+        info = await asyncio.to_thread(video_service.probe, data)
+    except Exception as e:
+        logger.error(f"Video no legible: {e}")
+        await status_msg.edit_text(f"No se pudo leer el video: {e}")
+        return
+
+    images = []
+    if VIDEO_KEYFRAMES > 0 and info["has_video"]:
+        images_dir = images_dir_for(ctx)
+        try:
+            frames = await asyncio.to_thread(
+                video_service.extract_keyframes,
+                data, VIDEO_KEYFRAMES, images_dir / ORIGINALS_DIRNAME, video.file_unique_id,
+            )
+            images = await prepare_images(frames, images_dir)
+        except Exception as e:
+            logger.error(f"Error extrayendo fotogramas: {e}")
+            await status_msg.edit_text(f"No se pudieron extraer los fotogramas del video: {e}")
+            return
+
+    text = ""
+    if info["has_audio"]:
+        text = await asyncio.to_thread(transcript_cache.get, video.file_unique_id)
+        if text is None:
+            await status_msg.edit_text("Transcribiendo audio del video...")
+            text = await transcribe_with_progress(data, status_msg)
+            if text is None:
+                return
+            if text.strip():
+                await asyncio.to_thread(transcript_cache.put, video.file_unique_id, text)
+
+    if not images:
+        if not text.strip():
+            await status_msg.edit_text("El video no tiene audio con voz que transcribir.")
+            return
+        await run_transcript(update, ctx, text, status_msg)
+        return
+
+    extra = f"[Transcripción del audio del vídeo: {text}]" if text.strip() else "[El vídeo no tiene voz.]"
+    caption = update.message.caption or f"Analiza este video ({len(images)} fotogramas clave)"
+    await analyze_images(update, ctx, images, caption, extra_context=extra, thinking_msg=status_msg)
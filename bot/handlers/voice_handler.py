@@ -1,15 +1,22 @@
+import asyncio
 import logging
+import time
 
-from telegram import Update
+from telegram import Message, Update
 from telegram.ext import ContextTypes
 
-from bot.config import TEMP_DIR
+from bot.config import TEMP_DIR, WHISPER_PARTIAL_INTERVAL, VOICE_AUTORUN, VOICE_MEMORY_MAX_BYTES
 from bot.security import authorized_only
-from bot.services.whisper_service import transcribe
+from bot.services import transcript_cache
+from bot.services.file_downloader import download_to_memory, download_to_path
+from bot.services.whisper_service import AudioSource, transcribe_stream, TranscriptionCancelled
 from bot.handlers.utils import resolve_context, run_with_feedback
 
 logger = logging.getLogger(__name__)
 
+# Máximo de caracteres de la transcripción parcial que se muestran en el mensaje de progreso
+_PARTIAL_PREVIEW_CHARS = 600
+
 
 @authorized_only
 async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -18,38 +25,105 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         await update.message.reply_text(ctx["error"], parse_mode="Markdown")
         return
 
-    # Descargar audio
     voice = update.message.voice or update.message.audio
     if not voice:
         return
 
-    file = await voice.get_file()
-    audio_path = TEMP_DIR / f"{file.file_unique_id}.ogg"
-    await file.download_to_drive(str(audio_path))
-    logger.info(f"Audio descargado: {audio_path}")
+    # Audio reenviado o repetido: ni descarga ni Whisper
+    text = await asyncio.to_thread(transcript_cache.get, voice.file_unique_id)
+    if text is not None:
+        logger.info(f"Transcripcion en cache: {voice.file_unique_id}")
+        transcribing_msg = await update.message.reply_text("Transcripcion recuperada de cache.")
+    else:
+        transcribing_msg = await update.message.reply_text("Transcribiendo audio...")
+
+        # Descargar audio. Notas normales: directo a memoria.
+        # Solo los audios grandes pasan por disco (por bloques).
+        file = await voice.get_file()
+        audio_path = None
+        if (file.file_size or 0) <= VOICE_MEMORY_MAX_BYTES:
+            audio = await download_to_memory(file)
+            logger.info(f"Audio descargado en memoria ({audio.getbuffer().nbytes} bytes)")
+        else:
+            audio_path = TEMP_DIR / f"{file.file_unique_id}.ogg"
+            await download_to_path(file, audio_path)
+            audio = audio_path
+
+        try:
+            text = await transcribe_with_progress(audio, transcribing_msg)
+        finally:
+            if audio_path:
+                audio_path.unlink(missing_ok=True)
+        if text is None:
+            return
+        if text.strip():
+            await asyncio.to_thread(transcript_cache.put, voice.file_unique_id, text)
+
+    await run_transcript(update, ctx, text, transcribing_msg)
+
+
+async def transcribe_with_progress(audio: AudioSource, transcribing_msg: Message) -> str | None:
+    """
+    Transcribe mostrando cola, porcentaje y transcripción parcial en transcribing_msg.
+    Retorna el texto, o None si se canceló o falló (el mensaje ya refleja el motivo).
+    """
+    async def _on_queue(ahead: int):
+        await transcribing_msg.edit_text(f"Transcribiendo audio... ({ahead} por delante)")
+
+    parts: list[str] = []
+    progress = {"fraction": 0.0, "last_update": time.monotonic()}
 
-    transcribing_msg = await update.message.reply_text("Transcribiendo audio...")
+    async def _refresh():
+        # Porcentaje y transcripción parcial en el mensaje de progreso (throttled)
+        now = time.monotonic()
+        if now - progress["last_update"] < WHISPER_PARTIAL_INTERVAL:
+            return
+        progress["last_update"] = now
+        partial = " ".join(parts)
+        if len(partial) > _PARTIAL_PREVIEW_CHARS:
+            partial = "..." + partial[-_PARTIAL_PREVIEW_CHARS:]
+        try:
+            await transcribing_msg.edit_text(
+                f"Transcribiendo audio... {progress['fraction']:.0%}\n\n{partial}".rstrip()
+            )
+        except Exception:
+            pass
+
+    async def _on_progress(fraction: float):
+        progress["fraction"] = fraction
+        await _refresh()
 
     try:
-        text = transcribe(str(audio_path))
+        async for segment in transcribe_stream(audio, on_queue=_on_queue, on_progress=_on_progress):
+            parts.append(segment["text"])
+            await _refresh()
+    except (asyncio.CancelledError, TranscriptionCancelled):
+        try:
+            await transcribing_msg.edit_text("Transcripcion cancelada.")
+        except Exception:
+            pass
+        return None
     except Exception as e:
         logger.error(f"Error transcribiendo: {e}")
         await transcribing_msg.edit_text(f"Error al transcribir audio: {e}")
-        return
-    finally:
-        audio_path.unlink(missing_ok=True)
+        return None
+
+    return " ".join(parts)
 
+
+async def run_transcript(update: Update, ctx: dict, text: str, transcribing_msg: Message) -> None:
+    """Envía la transcripción final a Claude (o solo la muestra si VOICE_AUTORUN está desactivado)."""
     if not text.strip():
         await transcribing_msg.edit_text("No se pudo transcribir el audio (vacío).")
         return
 
-    try:
-        await transcribing_msg.delete()
-    except Exception:
-        pass
+    if not VOICE_AUTORUN:
+        await transcribing_msg.edit_text(f"Transcripcion:\n\n{text}")
+        return
 
     header = f"*Transcripcion:* _{text}_\n\n"
 
+    # El mensaje de progreso pasa directamente a ser el de "Procesando..."
     await run_with_feedback(
         prompt=text,
         reply_to=update.message,
@@ -58,4 +132,5 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         session_key=ctx["session_key"],
         thinking_text=f"Transcripcion: _{text}_\n\nProcesando...",
         response_header=header,
+        thinking_msg=transcribing_msg,
     )
@@ -1,5 +1,6 @@
 """Comandos específicos para worker bots (subset simplificado)."""
 
+import asyncio
 import logging
 
 from telegram import Update
@@ -8,6 +9,8 @@ from telegram.ext import ContextTypes
 from bot.security import authorized_only
 from bot.services import session_manager
 from bot.services.claude_service import stop_claude
+from bot.services.whisper_service import cancel_transcriptions
+from bot.handlers.utils import stats_text, whisper_status_line
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +25,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         f"*Worker Bot*\n\n"
         f"Proyecto: *{active}*\n"
         f"Estado: {status}\n\n"
-        f"Envíame texto, imágenes o notas de voz y trabajaré en ello.\n\n"
+        f"Envíame texto, imágenes, notas de voz o archivos y trabajaré en ello.\n\n"
         f"*Comandos:*\n"
         f"/status — Ver estado\n"
         f"/clear — Nueva sesión\n"
@@ -36,10 +39,11 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await update.message.reply_text(
         "*Comandos del Worker:*\n\n"
         "/status — Estado del worker y sesión\n"
+        "/stats — Estadísticas (caché de transcripciones)\n"
         "/clear — Limpiar sesión (empezar de cero)\n"
         "/newchat — Igual que /clear\n"
         "/stop — Detener la ejecución actual de Claude\n\n"
-        "Envía texto, imágenes o audio para trabajar en el proyecto.",
+        "Envía texto, imágenes, audio o archivos para trabajar en el proyecto.",
         parse_mode="Markdown",
     )
 
@@ -54,14 +58,21 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     info = session_manager.get_session_info(active)
     session_id = info.get("session_id")
 
+    session_line = f"Sesion: `{session_id[:16]}...`" if session_id else "Sesion: nueva"
     await update.message.reply_text(
         f"*Worker Status*\n\n"
         f"Proyecto: *{active}*\n"
-        f"Sesion: `{session_id[:16]}...`" if session_id else f"Sesion: nueva",
+        f"{session_line}\n"
+        f"{await whisper_status_line()}",
         parse_mode="Markdown",
     )
 
 
+@authorized_only
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.message.reply_text(await asyncio.to_thread(stats_text), parse_mode="Markdown")
+
+
 @authorized_only
 async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     active = session_manager.get_active_project()
@@ -75,5 +86,7 @@ async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 @authorized_only
 async def stop_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     stopped = stop_claude()
+    if cancel_transcriptions():
+        stopped = True
     if not stopped:
         await update.message.reply_text("No hay nada en ejecucion.")
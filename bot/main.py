@@ -1,10 +1,10 @@
+import asyncio
 import atexit
 import logging
 import os
 import signal
 import sys
-import urllib.request
-import urllib.parse
+import time
 
 # Limpiar variable CLAUDECODE al inicio para que el SDK funcione
 # aunque el bot se lance desde dentro de una sesión de Claude Code
@@ -19,13 +19,15 @@ from telegram.ext import (
     filters,
 )
 
-from bot.config import TELEGRAM_BOT_TOKEN, AUTHORIZED_USER_ID
+from bot.config import TELEGRAM_BOT_TOKEN, AUTHORIZED_USER_ID, WHISPER_PRELOAD
 from bot.handlers.commands import (
     start_command,
     help_command,
     projects_command,
     select_command,
     status_command,
+    stats_command,
+    storage_command,
     clear_command,
     nochat_command,
     newproject_command,
@@ -35,7 +37,10 @@ from bot.handlers.commands import (
 )
 from bot.handlers.coordinator_commands import (
     spawn_command,
+    spawnbatch_command,
     bots_command,
+    worker_command,
+    wake_command,
     kill_command,
     stopall_command,
     addtoken_command,
@@ -43,6 +48,8 @@ from bot.handlers.coordinator_commands import (
 )
 from bot.handlers.text_handler import handle_text
 from bot.handlers.image_handler import handle_image
+from bot.handlers.document_handler import handle_document
+from bot.handlers.video_handler import handle_video
 from bot.handlers.voice_handler import handle_voice
 from bot.handlers.callback_handler import handle_callback
 from bot.handlers.reaction_handler import handle_reaction
@@ -64,13 +71,18 @@ async def _on_startup(app) -> None:
         BotCommand("newproject", "Crear proyecto nuevo"),
         BotCommand("nochat", "Volver a chat libre"),
         BotCommand("status", "Info del proyecto y sesion"),
+        BotCommand("stats", "Estadisticas de uso"),
+        BotCommand("storage", "Espacio usado por imagenes y temporales"),
         BotCommand("clear", "Limpiar sesion actual"),
         BotCommand("stop", "Detener ejecucion en curso"),
         BotCommand("ask", "Pregunta rapida sin sesion"),
         BotCommand("devbot", "Trabajar en el propio bot"),
         BotCommand("gemini", "Generar imagen con Gemini"),
         BotCommand("spawn", "Crear worker bot"),
+        BotCommand("spawnbatch", "Crear varios workers en paralelo"),
         BotCommand("bots", "Ver workers activos"),
+        BotCommand("wake", "Retomar un worker aparcado"),
+        BotCommand("worker", "Ordenes a un worker (drain, stoprun, reload)"),
         BotCommand("kill", "Detener un worker"),
         BotCommand("stopall", "Detener todos los workers"),
         BotCommand("addtoken", "Agregar token al pool"),
@@ -82,41 +94,107 @@ async def _on_startup(app) -> None:
     except Exception as e:
         logger.warning(f"No se pudieron registrar comandos: {e}")
 
+    # Con el servicio compartido el modelo se carga allí, no en el coordinador
+    from bot.services import whisper_service
+    if WHISPER_PRELOAD and not whisper_service.uses_daemon():
+        whisper_service.preload_model()
+    if whisper_service.uses_daemon():
+        from bot.services.whisper_daemon import watch_daemon
+        app.bot_data["whisper_watch_task"] = asyncio.create_task(watch_daemon())
+
+    # Limpieza periódica de temporales e imágenes (solo el coordinador)
+    from bot.services import storage_manager
+    app.bot_data["janitor_task"] = asyncio.create_task(storage_manager.janitor_loop())
+
+    # Supervisor de workers: los relanza si caen y solo avisa si no lo consigue
+    from bot.services.worker_supervisor import supervise_workers
+
+    async def _notify(text: str) -> None:
+        await app.bot.send_message(chat_id=AUTHORIZED_USER_ID, text=text)
+
+    app.bot_data["supervisor_task"] = asyncio.create_task(supervise_workers(_notify))
+
+    # Autoescalado: aparca los workers ociosos y lanza los que esperan token
+    from bot.services.autoscaler import autoscale_workers
+    app.bot_data["autoscaler_task"] = asyncio.create_task(autoscale_workers(_notify))
+
+    # Pool de tokens: concesiones con TTL y validación periódica con getMe
+    from bot.services.token_monitor import monitor_tokens
+    app.bot_data["token_monitor_task"] = asyncio.create_task(monitor_tokens(_notify))
+
     try:
         await app.bot.send_message(chat_id=AUTHORIZED_USER_ID, text="🟢 Bot iniciado")
     except Exception as e:
         logger.warning(f"No se pudo enviar mensaje de inicio: {e}")
 
 
+async def _on_stop(app) -> None:
+    """Detiene todos los workers a la vez y envía un único aviso de apagado con el resumen."""
+    global _shutdown_sent
+    started = time.monotonic()
+    from bot.services import shutdown
+    for name in ("supervisor_task", "autoscaler_task", "token_monitor_task", "whisper_watch_task"):
+        task = app.bot_data.get(name)
+        if task:
+            task.cancel()
+    try:
+        summary = await shutdown.shutdown_workers()
+    except Exception as e:
+        logger.error(f"Error deteniendo workers: {e}")
+        summary = {"stopped": 0}
+    if not _shutdown_sent:
+        try:
+            await app.bot.send_message(chat_id=AUTHORIZED_USER_ID, text=_shutdown_text(summary))
+            _shutdown_sent = True
+        except Exception as e:
+            logger.warning(f"No se pudo enviar mensaje de apagado: {e}")
+    from bot.services import bot_api
+    await bot_api.aclose()
+    logger.info(f"Apagado completado en {time.monotonic() - started:.2f}s")
+
+
 _shutdown_sent = False
 
 
-def _send_shutdown_sync():
-    """Envía mensaje de apagado usando HTTP directo (sin asyncio)."""
+def _shutdown_text(summary: dict | None) -> str:
+    from bot.services.shutdown import summary_text
+    detail = summary_text(summary) if summary else ""
+    return "🔴 Bot apagado" + (f"\n{detail}" if detail else "")
+
+
+def _send_shutdown_sync(summary: dict | None = None):
+    """Envía mensaje de apagado con la fachada síncrona de bot_api (señales, atexit)."""
     global _shutdown_sent
     if _shutdown_sent or not TELEGRAM_BOT_TOKEN or not AUTHORIZED_USER_ID:
         return
     _shutdown_sent = True
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        data = urllib.parse.urlencode({
-            "chat_id": AUTHORIZED_USER_ID,
-            "text": "🔴 Bot apagado",
-        }).encode()
-        urllib.request.urlopen(url, data, timeout=5)
-    except Exception as e:
-        logger.warning(f"No se pudo enviar mensaje de apagado: {e}")
+    from bot.services import bot_api
+    if not bot_api.send_message_sync(TELEGRAM_BOT_TOKEN, AUTHORIZED_USER_ID, _shutdown_text(summary)):
+        logger.warning("No se pudo enviar mensaje de apagado")
 
 
 def _signal_handler(signum, frame):
-    """Maneja SIGTERM/SIGINT para enviar mensaje antes de morir."""
-    # Matar todos los workers antes de morir
+    """Maneja SIGTERM/SIGINT (antes de que arranque el polling) para enviar mensaje antes de morir."""
+    # Detener todos los workers a la vez, con un único plazo
+    started = time.monotonic()
+    summary = None
     try:
-        from bot.services.worker_registry import kill_all_workers
-        kill_all_workers()
+        from bot.services.shutdown import stop_workers
+        summary = stop_workers()
     except Exception:
         pass
-    _send_shutdown_sync()
+    try:
+        from bot.services.whisper_daemon import stop_daemon
+        stop_daemon()
+    except Exception:
+        pass
+    try:
+        from bot.services.zygote import stop_zygote
+        stop_zygote()
+    except Exception:
+        pass
+    _send_shutdown_sync(summary)
+    logger.info(f"Apagado completado en {time.monotonic() - started:.2f}s")
     sys.exit(0)
 
 
@@ -137,6 +215,8 @@ def main() -> None:
 
     # Limpiar workers/tokens huérfanos de ejecuciones anteriores
     try:
+        from bot.services.shutdown import clear_marker
+        clear_marker()
         from bot.services.token_pool import release_stale_tokens
         from bot.services.worker_registry import cleanup_dead_workers
         stale = release_stale_tokens()
@@ -148,6 +228,26 @@ def main() -> None:
     except Exception as e:
         logger.warning(f"Error limpiando estado previo: {e}")
 
+    # Servicio de transcripción compartido con los workers
+    from bot.services import whisper_service
+    if whisper_service.uses_daemon():
+        from bot.services.whisper_daemon import start_daemon
+        try:
+            if not start_daemon():
+                whisper_service._use_daemon = False
+        except Exception as e:
+            logger.warning(f"No se pudo lanzar el servicio de transcripcion: {e}")
+            whisper_service._use_daemon = False
+
+    # Plantilla precargada para crear workers por fork
+    from bot.config import WORKER_ZYGOTE
+    if WORKER_ZYGOTE:
+        from bot.services.zygote import start_zygote
+        try:
+            start_zygote()
+        except Exception as e:
+            logger.warning(f"No se pudo lanzar el zygote, los workers arrancaran como subproceso: {e}")
+
     # Registrar signal handlers para apagado limpio
     signal.signal(signal.SIGTERM, _signal_handler)
     signal.signal(signal.SIGINT, _signal_handler)
@@ -156,6 +256,7 @@ def main() -> None:
         ApplicationBuilder()
         .token(TELEGRAM_BOT_TOKEN)
         .post_init(_on_startup)
+        .post_stop(_on_stop)
         .build()
     )
 
@@ -165,6 +266,8 @@ def main() -> None:
     app.add_handler(CommandHandler("projects", projects_command))
     app.add_handler(CommandHandler("select", select_command))
     app.add_handler(CommandHandler("status", status_command))
+    app.add_handler(CommandHandler("stats", stats_command))
+    app.add_handler(CommandHandler("storage", storage_command))
     app.add_handler(CommandHandler("clear", clear_command))
     app.add_handler(CommandHandler("newchat", clear_command))
     app.add_handler(CommandHandler("nochat", nochat_command))
@@ -175,13 +278,18 @@ def main() -> None:
 
     # Comandos del coordinador (multi-bot)
     app.add_handler(CommandHandler("spawn", spawn_command))
+    # block=False: esperan hasta WORKER_READY_TIMEOUT a que los workers estén listos
+    app.add_handler(CommandHandler("spawnbatch", spawnbatch_command, block=False))
     app.add_handler(CommandHandler("bots", bots_command))
+    app.add_handler(CommandHandler("wake", wake_command))
+    app.add_handler(CommandHandler("worker", worker_command))
     app.add_handler(CommandHandler("kill", kill_command))
     app.add_handler(CommandHandler("stopall", stopall_command))
     app.add_handler(CommandHandler("addtoken", addtoken_command))
     app.add_handler(CommandHandler("removetoken", removetoken_command))
 
-    # Callbacks (inline keyboard)
+    # Callbacks (inline keyboard). Los que lanzan workers no bloquean: esperan su arranque
+    app.add_handler(CallbackQueryHandler(handle_callback, pattern=r"^(spawn_project|wake):", block=False))
     app.add_handler(CallbackQueryHandler(handle_callback))
 
     # Reacciones (corazon = confirmar)
@@ -189,9 +297,31 @@ def main() -> None:
 
     # Mensajes
     app.add_handler(MessageHandler(filters.PHOTO, handle_image))
-    app.add_handler(MessageHandler(filters.VOICE | filters.AUDIO, handle_voice))
+    # block=False: la transcripción no frena /stop ni el resto de mensajes
+    app.add_handler(MessageHandler(filters.VOICE | filters.AUDIO, handle_voice, block=False))
+    app.add_handler(MessageHandler(filters.Document.ALL, handle_document, block=False))
+    app.add_handler(MessageHandler(filters.VIDEO | filters.VIDEO_NOTE, handle_video, block=False))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
 
+    from bot.services import webhook_ingress
+    if webhook_ingress.webhook_enabled():
+        # Un servidor local para el coordinador y todos los workers, en vez de un long polling por bot
+        async def _setup_webhook() -> bool:
+            if not await webhook_ingress.start_server():
+                return False
+            webhook_ingress.register("coordinator", TELEGRAM_BOT_TOKEN, webhook_ingress.queue_delivery(app))
+            from bot.services.worker_registry import route_existing_webhooks
+            route_existing_webhooks()
+            url, secret = webhook_ingress.endpoint(TELEGRAM_BOT_TOKEN)
+            if await webhook_ingress.set_webhook(app.bot, url, secret):
+                return True
+            await webhook_ingress.stop_server()
+            return False
+
+        logger.info("Bot iniciado. Webhook...")
+        webhook_ingress.run_application(app, _setup_webhook)
+        return
+
     logger.info("Bot iniciado. Polling...")
     from telegram import Update
     app.run_polling(
@@ -0,0 +1,189 @@
+"""
+Envío de artefactos (PDF, CSV, builds, carpetas de resultados) mencionados por Claude.
+
+Las rutas absolutas de la respuesta con extensión de ARTIFACT_EXTENSIONS se envían como
+documento, y las carpetas cuyo nombre está en ARTIFACT_DIRS como zip construido en disco
+archivo a archivo. Se respeta el límite de subida de la Bot API y los file_id devueltos por
+Telegram se guardan por (bot, ruta, mtime, tamaño): un artefacto sin cambios no se vuelve a
+subir. Un file_id solo vale para el bot que subió el archivo; si Telegram lo rechaza, se sube
+de nuevo. artifact_cache.json lo comparten coordinador y workers (json_file).
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import zipfile
+from pathlib import Path
+
+from bot.config import (
+    ARTIFACT_CACHE_FILE,
+    ARTIFACT_DIRS,
+    ARTIFACT_EXTENSIONS,
+    ARTIFACT_MAX_BYTES,
+    IMAGES_DIRNAME,
+    TEMP_DIR,
+    UPLOADS_DIRNAME,
+)
+from bot.services import json_file
+
+logger = logging.getLogger(__name__)
+
+_ANY_PATH_PATTERN = re.compile(r'(?:[A-Za-z]:\\[^\s*`"<>|]+|/[^\s*`"<>|]+)')
+
+_CACHE_MAX_ENTRIES = 500
+
+
+class ArtifactTooLarge(Exception):
+    """El artefacto (o su zip) supera el límite de subida."""
+
+
+# --- Detección ---
+
+def extract_artifact_paths(text: str) -> list[Path]:
+    """Archivos con extensión de artefacto y carpetas de resultados mencionados en el texto."""
+    paths = []
+    for match in _ANY_PATH_PATTERN.findall(text):
+        p = Path(match.strip("`,.'\":;)("))
+        # Lo que envió el propio usuario no se le devuelve
+        if UPLOADS_DIRNAME in p.parts or IMAGES_DIRNAME in p.parts:
+            continue
+        if p.is_file() and p.suffix.lower() in ARTIFACT_EXTENSIONS:
+            paths.append(p)
+        elif p.is_dir() and p.name.lower() in ARTIFACT_DIRS:
+            paths.append(p)
+    return list(dict.fromkeys(paths))
+
+
+# --- Caché de file_id ---
+
+def _load_cache() -> dict:
+    if not ARTIFACT_CACHE_FILE.exists():
+        return {}
+    cache = json_file.read(ARTIFACT_CACHE_FILE)
+    if cache is None:
+        logger.warning("artifact_cache.json corrupto, reiniciando")
+    return cache or {}
+
+
+def _update_cache(changes: dict) -> None:
+    """Aplica {clave: entrada, o None para quitarla} sobre lo que haya en disco. Bloqueante."""
+    with json_file.locked(ARTIFACT_CACHE_FILE):
+        cache = _load_cache()
+        for key, entry in changes.items():
+            if entry is None:
+                cache.pop(key, None)
+            else:
+                cache[key] = entry
+        # Conservar solo las entradas usadas más recientemente
+        if len(cache) > _CACHE_MAX_ENTRIES:
+            keep = sorted(cache, key=lambda k: cache[k]["last_used"])[-_CACHE_MAX_ENTRIES:]
+            cache = {k: cache[k] for k in keep}
+        json_file.write_atomic(ARTIFACT_CACHE_FILE, cache, indent=2)
+
+
+def _fingerprint(path: Path) -> str:
+    """Clave de caché: cambia si cambia la ruta, el mtime o el tamaño (de cualquier archivo)."""
+    if path.is_file():
+        st = path.stat()
+        return f"{path.resolve()}|{st.st_mtime_ns}|{st.st_size}"
+    digest = hashlib.sha1()
+    for f in sorted(p for p in path.rglob("*") if p.is_file()):
+        st = f.stat()
+        digest.update(f"{f.relative_to(path)}|{st.st_mtime_ns}|{st.st_size}\n".encode())
+    return f"{path.resolve()}/|{digest.hexdigest()}"
+
+
+# --- Zip por streaming ---
+
+def _zip_directory(directory: Path) -> Path:
+    """
+    Comprime la carpeta en TEMP_DIR escribiendo archivo a archivo (nunca el zip entero en
+    memoria). Lanza ArtifactTooLarge en cuanto el zip supera ARTIFACT_MAX_BYTES. Bloqueante.
+    """
+    out_dir = TEMP_DIR / "artifacts"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    zip_path = out_dir / f"{directory.name}_{int(time.time())}.zip"
+    try:
+        with open(zip_path, "wb") as fp, zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED) as zf:
+            for f in sorted(p for p in directory.rglob("*") if p.is_file()):
+                zf.write(f, arcname=str(Path(directory.name) / f.relative_to(directory)))
+                if fp.tell() > ARTIFACT_MAX_BYTES:
+                    raise ArtifactTooLarge(f"zip de {directory.name} supera {ARTIFACT_MAX_BYTES // (1024 * 1024)} MB")
+    except BaseException:
+        zip_path.unlink(missing_ok=True)
+        raise
+    return zip_path
+
+
+# --- Envío ---
+
+async def _send_document(update_or_chat, document, filename: str | None, caption: str):
+    from telegram import Update
+    if isinstance(update_or_chat, Update):
+        return await update_or_chat.message.reply_document(document=document, filename=filename, caption=caption)
+    return await update_or_chat.send_document(document=document, filename=filename, caption=caption)
+
+
+async def send_artifacts(update_or_chat, paths: list[Path]) -> None:
+    """Envía cada artefacto como documento, reutilizando el file_id si no ha cambiado."""
+    from telegram.error import BadRequest
+
+    bot_id = update_or_chat.get_bot().id
+    cache = await asyncio.to_thread(_load_cache)
+    changes = {}
+    for path in paths:
+        caption = f"{path.name}.zip" if path.is_dir() else path.name
+        try:
+            key = f"{bot_id}|{await asyncio.to_thread(_fingerprint, path)}"
+            cached = cache.get(key)
+            if cached:
+                try:
+                    await _send_document(update_or_chat, cached["file_id"], None, caption)
+                    changes[key] = {**cached, "last_used": time.time()}
+                    logger.info(f"Artefacto sin cambios, reenviado por file_id: {path}")
+                    continue
+                except BadRequest as e:
+                    logger.info(f"file_id de {path.name} rechazado ({e}), se sube de nuevo")
+                    changes[key] = None
+
+            if path.is_dir():
+                upload = await asyncio.to_thread(_zip_directory, path)
+            else:
+                if path.stat().st_size > ARTIFACT_MAX_BYTES:
+                    raise ArtifactTooLarge(f"{path.stat().st_size / 1024 / 1024:.1f} MB, max {ARTIFACT_MAX_BYTES // (1024 * 1024)} MB")
+                upload = path
+
+            try:
+                with open(upload, "rb") as f:
+                    message = await _send_document(update_or_chat, f, caption, caption)
+            finally:
+                if upload != path:
+                    upload.unlink(missing_ok=True)
+
+            if message and message.document:
+                changes[key] = {"file_id": message.document.file_id, "last_used": time.time()}
+            logger.info(f"Artefacto enviado: {path}")
+        except ArtifactTooLarge as e:
+            logger.warning(f"Artefacto demasiado grande {path}: {e}")
+            await _send_text(update_or_chat, f"{caption}: demasiado grande para enviarlo por Telegram ({e}).")
+        except Exception as e:
+            logger.error(f"Error enviando artefacto {path}: {e}")
+            await _send_text(update_or_chat, f"No se pudo enviar {caption}: {e}")
+    if changes:
+        try:
+            await asyncio.to_thread(_update_cache, changes)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la cache de artefactos: {e}")
+
+
+async def _send_text(update_or_chat, text: str) -> None:
+    from telegram import Update
+    try:
+        if isinstance(update_or_chat, Update):
+            await update_or_chat.message.reply_text(text)
+        else:
+            await update_or_chat.send_message(text)
+    except Exception as e:
+        logger.error(f"Error enviando mensaje: {e}")
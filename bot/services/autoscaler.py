@@ -0,0 +1,331 @@
+"""
+Autoescalado de workers (tarea del coordinador).
+
+Los tokens del pool se reparten según la demanda en vez de quedarse atados a workers ociosos:
+  - Un worker sin actividad durante WORKER_IDLE_TTL se aparca: termina lo pendiente y se
+    detiene, su token vuelve al pool y queda anotado en parked_workers.json. Su sesión sigue
+    en worker_<proyecto>_<rol>.json, así que al relanzarlo (/wake, o /spawn del mismo proyecto
+    y rol) continúa donde estaba, con el mismo bot si ese token sigue libre.
+  - Si no hay tokens libres, la petición queda en espera y se atiende en cuanto se libere uno,
+    por orden de WORKER_PRIORITY y de llegada. Si hay un worker ocioso de menor prioridad, se
+    aparca en el momento para cederle el token.
+  - WORKER_MAX_PER_PROJECT limita los workers simultáneos de un proyecto.
+
+Tanto el lanzamiento desde /spawn como el de las peticiones en espera pasan por launch_worker,
+que no da el worker por creado hasta que confirma que recibe mensajes (ver wait_ready).
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Awaitable, Callable
+
+from bot.config import (
+    PARKED_WORKERS_FILE,
+    WORKER_IDLE_TTL,
+    WORKER_MAX_PER_PROJECT,
+    WORKER_MODE,
+    WORKER_PRIORITY,
+)
+from bot.services import json_file, token_pool, worker_registry
+
+logger = logging.getLogger(__name__)
+
+_TICK_INTERVAL = 30.0
+
+_cache: dict | None = None
+# Lanzamientos en curso por proyecto: {"token_id"} desde la comprobación del límite hasta el final
+_launching: dict[str, list[dict]] = {}
+
+
+def _load_state() -> dict:
+    global _cache
+    if _cache is not None:
+        return _cache
+    if PARKED_WORKERS_FILE.exists():
+        _cache = json_file.read(PARKED_WORKERS_FILE)
+        if _cache is not None:
+            return _cache
+        logger.warning("parked_workers.json corrupto, reiniciando")
+    _cache = {"parked": {}, "waiting": []}
+    return _cache
+
+
+def _save_state(state: dict) -> None:
+    global _cache
+    _cache = state
+    json_file.write_atomic(PARKED_WORKERS_FILE, state, indent=2)
+
+
+def _key(project_name: str, role: str) -> str:
+    """Identificador corto de proyecto+rol (cabe en el callback_data de un botón)."""
+    return hashlib.sha1(f"{project_name}/{role}".encode()).hexdigest()[:10]
+
+
+def _label(worker: dict) -> str:
+    return f"@{worker['bot_username']} [{worker['project_name']} / {worker['role']}]"
+
+
+def list_parked() -> list[dict]:
+    return sorted(_load_state()["parked"].values(), key=lambda p: p["parked_at"])
+
+
+def list_waiting() -> list[dict]:
+    return list(_load_state()["waiting"])
+
+
+def get_parked(key: str) -> dict | None:
+    return _load_state()["parked"].get(key)
+
+
+# --- Política ---
+
+def priority(project_name: str, role: str) -> int:
+    """Posición en WORKER_PRIORITY (menor = más prioritario). Sin entrada: detrás de todos."""
+    for i, entry in enumerate(WORKER_PRIORITY):
+        project, _, entry_role = entry.partition("/")
+        if project.lower() == project_name.lower() and (not entry_role or entry_role.lower() == role.lower()):
+            return i
+    return len(WORKER_PRIORITY)
+
+
+def project_limit_reached(project_name: str) -> bool:
+    """Cuenta los workers registrados y los lanzamientos en curso que aún no se han registrado."""
+    if not WORKER_MAX_PER_PROJECT:
+        return False
+    registered = {w["token_id"] for w in worker_registry.list_active_workers() if w["project_name"] == project_name}
+    launching = [r for r in _launching.get(project_name, []) if r["token_id"] not in registered]
+    return len(registered) + len(launching) >= WORKER_MAX_PER_PROJECT
+
+
+# --- Lanzamiento ---
+
+async def launch_worker(token_entry: dict, project_name: str, project_path: str, role: str) -> dict:
+    """
+    Lanza y registra un worker con el token ya reservado y espera a que esté listo.
+    Retorna {"pid", "ready_seconds"}. Si no arranca, lo da de baja, libera el token y lanza
+    worker_registry.SpawnFailed.
+    """
+    token_id = token_entry["id"]
+    mode = "inprocess" if WORKER_MODE == "inprocess" else "process"
+    started = time.time()
+    if mode == "inprocess":
+        from bot.services import hosted_workers
+        try:
+            await hosted_workers.start_worker(
+                token_id=token_id,
+                bot_token=token_entry["bot_token"],
+                bot_username=token_entry["bot_username"],
+                project_name=project_name,
+                project_path=project_path,
+                role=role,
+            )
+        except Exception as e:
+            token_pool.release_token(token_id)
+            raise worker_registry.SpawnFailed(str(e)) from e
+        pid = os.getpid()
+    else:
+        # Bloqueante (petición al zygote o fork+exec): fuera del event loop
+        pid = await asyncio.to_thread(
+            worker_registry.spawn_worker,
+            token_id=token_id,
+            bot_token=token_entry["bot_token"],
+            bot_username=token_entry["bot_username"],
+            project_name=project_name,
+            project_path=project_path,
+            role=role,
+        )
+
+    token_pool.update_pid(token_id, pid)
+    worker_registry.register_worker(
+        token_id=token_id,
+        bot_username=token_entry["bot_username"],
+        project_name=project_name,
+        project_path=project_path,
+        role=role,
+        pid=pid,
+        mode=mode,
+    )
+    if mode == "process":
+        # Mientras arranca lo vigila el handshake, no el supervisor
+        worker_registry.update_worker(token_id, status="starting")
+        try:
+            ready_seconds = await worker_registry.wait_ready(token_id)
+        except worker_registry.SpawnFailed:
+            worker_registry.kill_worker(token_id, notify=False)
+            raise
+        worker_registry.update_worker(token_id, status="running")
+    else:
+        ready_seconds = time.time() - started
+
+    # Ya no está aparcado ni esperando
+    state = _load_state()
+    key = _key(project_name, role)
+    state["parked"].pop(key, None)
+    state["waiting"] = [w for w in state["waiting"] if w["key"] != key]
+    _save_state(state)
+    return {"pid": pid, "ready_seconds": ready_seconds}
+
+
+async def request_worker(project_name: str, project_path: str, role: str) -> dict:
+    """
+    Pide un worker para proyecto+rol. Retorna {"status": ...}:
+      - "started": lanzado y listo ("token", "pid", "ready_seconds")
+      - "failed": no arrancó; su token ya está libre ("error", "log": salida del worker)
+      - "queued": sin token libre, en espera ("preempted": worker aparcado para cederle el token)
+      - "limit": el proyecto ya tiene WORKER_MAX_PER_PROJECT workers
+    Otros errores al lanzar liberan el token y se propagan.
+    """
+    # Comprobar y reservar sin awaits entre medias: las peticiones simultáneas (/spawnbatch)
+    # ven las reservas de las demás aunque aún no tengan token ni registro
+    if project_limit_reached(project_name):
+        return {"status": "limit", "max": WORKER_MAX_PER_PROJECT}
+    reservation = {"token_id": None}
+    _launching.setdefault(project_name, []).append(reservation)
+    try:
+        key = _key(project_name, role)
+        parked = get_parked(key)
+        token_entry = await token_pool.acquire_checked_token(project_name, role, prefer=parked and parked["token_id"])
+        if token_entry:
+            reservation["token_id"] = token_entry["id"]
+            try:
+                launched = await launch_worker(token_entry, project_name, project_path, role)
+            except worker_registry.SpawnFailed as e:
+                logger.error(f"Worker {project_name} / {role} no arranco: {e}")
+                return {"status": "failed", "error": str(e), "log": e.log}
+            except Exception:
+                token_pool.release_token(token_entry["id"])
+                raise
+            return {"status": "started", "token": token_entry, **launched}
+    finally:
+        _launching[project_name].remove(reservation)
+        if not _launching[project_name]:
+            del _launching[project_name]
+
+    state = _load_state()
+    if not any(w["key"] == key for w in state["waiting"]):
+        state["waiting"].append({
+            "key": key,
+            "project_name": project_name,
+            "project_path": project_path,
+            "role": role,
+            "requested_at": time.time(),
+        })
+        _save_state(state)
+    preempted = await _preempt_for(project_name, role)
+    return {"status": "queued", "preempted": preempted}
+
+
+async def _preempt_for(project_name: str, role: str) -> str | None:
+    """Aparca el worker ocioso de menor prioridad que la petición. Retorna su etiqueta."""
+    rank = priority(project_name, role)
+    candidates = []
+    for worker in worker_registry.list_active_workers():
+        if worker.get("status") in ("parking", "restarting", "starting", "stopping"):
+            continue
+        worker_rank = priority(worker["project_name"], worker["role"])
+        if worker_rank <= rank:
+            continue
+        live = await worker_registry.query_live(worker)
+        if live and live.get("state") == "idle" and not live.get("queue"):
+            candidates.append((worker_rank, live.get("idle", 0), worker))
+    if not candidates:
+        return None
+    _rank, _idle, worker = max(candidates, key=lambda c: (c[0], c[1]))
+    if not await park_worker(worker, f"cede su token a {project_name} / {role}"):
+        return None
+    return _label(worker)
+
+
+# --- Aparcado ---
+
+async def park_worker(worker: dict, reason: str) -> bool:
+    """Pide al worker que termine lo pendiente y se detenga sin aviso; lo anota como aparcado."""
+    reply = await worker_registry.send_command(worker, "park")
+    if not reply or "error" in reply:
+        return False
+    worker_registry.update_worker(worker["token_id"], status="parking")
+    state = _load_state()
+    state["parked"][_key(worker["project_name"], worker["role"])] = {
+        "key": _key(worker["project_name"], worker["role"]),
+        "project_name": worker["project_name"],
+        "project_path": worker["project_path"],
+        "role": worker["role"],
+        "token_id": worker["token_id"],
+        "bot_username": worker["bot_username"],
+        "parked_at": time.time(),
+        "reason": reason,
+    }
+    _save_state(state)
+    logger.info(f"Worker {_label(worker)} aparcado: {reason}")
+    return True
+
+
+async def _reap_idle(notify: Callable[[str], Awaitable]) -> None:
+    if not WORKER_IDLE_TTL:
+        return
+    pending = worker_registry.pending_spawns()
+    for worker in worker_registry.list_active_workers():
+        if worker.get("status") in ("parking", "restarting", "starting", "stopping") or worker["token_id"] in pending:
+            continue
+        live = await worker_registry.query_live(worker)
+        if not live or live.get("state") != "idle" or live.get("queue"):
+            continue
+        idle = live.get("idle", 0)
+        if idle < WORKER_IDLE_TTL:
+            continue
+        if await park_worker(worker, f"sin actividad en {idle / 60:.0f} min"):
+            await _notify(notify, (
+                f"💤 Worker aparcado por inactividad: {_label(worker)}\n"
+                f"La sesion se conserva. Para retomarlo: /wake"
+            ))
+
+
+async def _serve_waiting(notify: Callable[[str], Awaitable]) -> None:
+    """Lanza las peticiones en espera mientras haya tokens libres, por prioridad y llegada."""
+    waiting = sorted(list_waiting(), key=lambda w: (priority(w["project_name"], w["role"]), w["requested_at"]))
+    for request in waiting:
+        if not token_pool.get_available_tokens():
+            return
+        if project_limit_reached(request["project_name"]):
+            continue
+        try:
+            result = await request_worker(request["project_name"], request["project_path"], request["role"])
+        except Exception as e:
+            logger.error(f"No se pudo lanzar el worker en espera {request['project_name']} / {request['role']}: {e}")
+            continue
+        if result["status"] == "started":
+            await _notify(notify, (
+                f"🟢 Worker en espera lanzado: @{result['token']['bot_username']} "
+                f"[{request['project_name']} / {request['role']}]"
+            ))
+        elif result["status"] == "failed":
+            # Sale de la espera: reintentarlo en cada ciclo solo repetiría el fallo
+            state = _load_state()
+            state["waiting"] = [w for w in state["waiting"] if w["key"] != request["key"]]
+            _save_state(state)
+            await _notify(notify, (
+                f"❌ Worker en espera no arranco: {request['project_name']} / {request['role']}\n"
+                f"{result['error']}\n\n{result['log'][-1500:]}"
+            ))
+
+
+async def _notify(notify: Callable[[str], Awaitable], text: str) -> None:
+    try:
+        await notify(text)
+    except Exception as e:
+        logger.warning(f"No se pudo enviar aviso del autoescalado: {e}")
+
+
+async def autoscale_workers(notify: Callable[[str], Awaitable]) -> None:
+    """Bucle del autoescalado: aparca los ociosos y atiende las peticiones en espera."""
+    logger.info(f"Autoescalado iniciado (inactividad maxima {WORKER_IDLE_TTL}s)")
+    while True:
+        try:
+            await _reap_idle(notify)
+            await _serve_waiting(notify)
+        except Exception as e:
+            logger.error(f"Error en el autoescalado: {e}")
+        await asyncio.sleep(_TICK_INTERVAL)
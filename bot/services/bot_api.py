@@ -0,0 +1,137 @@
+"""
+Cliente de la Bot API para las llamadas fuera de python-telegram-bot: validar tokens del pool
+y los avisos de apagado (del coordinador, de los workers y el de respaldo de /kill).
+
+Un único cliente httpx (ya es dependencia de python-telegram-bot) con conexiones keep-alive,
+timeouts y reintentos con backoff ante errores de red, 5xx y 429 (respetando retry_after).
+Las llamadas asíncronas nunca bloquean el event loop; la fachada síncrona (call_sync,
+send_message_sync) es para los manejadores de señales y atexit, donde no hay loop utilizable.
+"""
+
+import asyncio
+import logging
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_API_URL = "https://api.telegram.org/bot{token}/{method}"
+_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+_RETRIES = 2
+_BACKOFF_BASE = 0.5
+_MAX_RETRY_AFTER = 10.0  # un 429 con esperas largas no debe colgar un aviso
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_sync_client: httpx.Client | None = None
+_background: set[asyncio.Task] = set()  # envíos en segundo plano (referencia hasta que acaban)
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Cliente del event loop actual (un AsyncClient no se puede compartir entre loops)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(timeout=_TIMEOUT, limits=_LIMITS)
+        _client_loop = loop
+    return _client
+
+
+def _get_sync_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = httpx.Client(timeout=_TIMEOUT, limits=_LIMITS)
+    return _sync_client
+
+
+def _retry_delay(attempt: int, response: httpx.Response | None) -> float | None:
+    """Espera antes del siguiente intento, o None si la respuesta no se reintenta."""
+    if response is not None:
+        if response.status_code == 429:
+            try:
+                return min(float(response.json()["parameters"]["retry_after"]), _MAX_RETRY_AFTER)
+            except (ValueError, KeyError, TypeError):
+                pass
+        elif response.status_code < 500:
+            return None
+    return _BACKOFF_BASE * 2 ** attempt
+
+
+def _decode(response: httpx.Response) -> dict | None:
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+async def call(bot_token: str, method: str, params: dict | None = None,
+               retries: int = _RETRIES) -> dict | None:
+    """
+    Llama a un método de la Bot API. Retorna la respuesta ({"ok", "result" | "description"})
+    o None si no se pudo contactar con Telegram tras los reintentos.
+    """
+    url = _API_URL.format(token=bot_token, method=method)
+    for attempt in range(retries + 1):
+        response = None
+        try:
+            response = await _get_client().post(url, json=params or {})
+        except httpx.HTTPError as e:
+            logger.debug(f"Bot API {method}: {e}")
+        delay = _retry_delay(attempt, response)
+        if delay is None or attempt == retries:
+            return _decode(response) if response is not None else None
+        await asyncio.sleep(delay)
+    return None
+
+
+def call_sync(bot_token: str, method: str, params: dict | None = None,
+              retries: int = _RETRIES) -> dict | None:
+    """Como call() pero síncrona (manejadores de señales, atexit)."""
+    url = _API_URL.format(token=bot_token, method=method)
+    for attempt in range(retries + 1):
+        response = None
+        try:
+            response = _get_sync_client().post(url, json=params or {})
+        except httpx.HTTPError as e:
+            logger.debug(f"Bot API {method}: {e}")
+        delay = _retry_delay(attempt, response)
+        if delay is None or attempt == retries:
+            return _decode(response) if response is not None else None
+        time.sleep(delay)
+    return None
+
+
+async def send_message(bot_token: str, chat_id: int, text: str) -> bool:
+    reply = await call(bot_token, "sendMessage", {"chat_id": chat_id, "text": text})
+    return bool(reply and reply.get("ok"))
+
+
+def send_message_sync(bot_token: str, chat_id: int, text: str, retries: int = 0) -> bool:
+    """Aviso síncrono; sin reintentos por defecto para no alargar el apagado."""
+    reply = call_sync(bot_token, "sendMessage", {"chat_id": chat_id, "text": text}, retries=retries)
+    return bool(reply and reply.get("ok"))
+
+
+def send_message_soon(bot_token: str, chat_id: int, text: str) -> None:
+    """Envía sin esperar: en segundo plano si hay event loop, si no de forma síncrona."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        send_message_sync(bot_token, chat_id, text)
+        return
+    task = loop.create_task(send_message(bot_token, chat_id, text))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def aclose() -> None:
+    """Cierra las conexiones del cliente asíncrono (al apagar)."""
+    global _client, _client_loop
+    if _background:
+        await asyncio.gather(*_background, return_exceptions=True)
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _client_loop = None
@@ -0,0 +1,63 @@
+"""
+Ámbito del bot que atiende la actualización en curso.
+
+Un worker necesita su propio archivo de sesión (por proyecto+rol) y su rol en el system
+prompt. En vez de sustituir session_manager.STATE_FILE y claude_service._full_append_prompt
+para todo el proceso, el ámbito vive en una ContextVar: cada tarea de asyncio hereda el de
+quien la creó, así que varios bots pueden compartir proceso y event loop sin pisarse.
+
+Sin ámbito (el coordinador) todo funciona como siempre. El ámbito es un dict:
+    {"key": token_id, "label": str, "state_file": Path, "role_prompt": str}
+"""
+
+import contextvars
+import re
+from contextlib import contextmanager
+
+from bot.config import SESSIONS_DIR
+
+_current: contextvars.ContextVar[dict | None] = contextvars.ContextVar("bot_scope", default=None)
+
+
+def make_scope(token_id: str, bot_username: str, project_name: str, project_path: str, role: str) -> dict:
+    """Ámbito de un worker: sesión en worker_<proyecto>_<rol>.json (persiste entre respawns) y su rol."""
+    safe_name = re.sub(r'[^\w\-]', '_', f"{project_name}_{role}").lower()
+    return {
+        "key": token_id,
+        "label": f"@{bot_username} [{project_name} / {role}]",
+        "state_file": SESSIONS_DIR / f"worker_{safe_name}.json",
+        "role_prompt": (
+            f"\n\n# Tu Rol\n"
+            f"Eres un *{role}* trabajando en el proyecto *{project_name}*.\n"
+            f"Directorio del proyecto: `{project_path}`\n"
+            f"Enfocate exclusivamente en tu rol. No cambies de proyecto.\n"
+        ),
+    }
+
+
+def current() -> dict | None:
+    return _current.get()
+
+
+def key() -> str | None:
+    """Identificador del ámbito actual (token_id del worker) o None en el coordinador."""
+    scope = _current.get()
+    return scope["key"] if scope else None
+
+
+def enter(scope: dict | None) -> contextvars.Token:
+    """Activa el ámbito en el contexto actual (y en las tareas que se creen desde él)."""
+    return _current.set(scope)
+
+
+def leave(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def use(scope: dict | None):
+    token = enter(scope)
+    try:
+        yield scope
+    finally:
+        leave(token)
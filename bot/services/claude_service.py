@@ -11,18 +11,26 @@ from typing import Any
 os.environ.pop("CLAUDECODE", None)
 
 from bot.config import (
+    CLAUDE_MAX_CONCURRENT,
     CLAUDE_MAX_TURNS,
     CLAUDE_PERMISSION_MODE,
     CLAUDE_TIMEOUT,
     CLAUDE_SKILLS_DIR,
     DANGEROUS_COMMANDS,
 )
+from bot.services import bot_scope
 
 logger = logging.getLogger(__name__)
 
-# Tarea y proceso activos para poder cancelar con /stop
-_active_task: asyncio.Task | None = None
-_active_process: asyncio.subprocess.Process | None = None
+# Tareas y procesos activos para poder cancelar con /stop (varios con el análisis en paralelo),
+# con el ámbito del bot que los lanzó: /stop en un bot no detiene los de otro del mismo proceso
+_active_tasks: dict[asyncio.Task, str | None] = {}
+_active_processes: dict[asyncio.subprocess.Process, str | None] = {}
+# Inicio (monotonic) de las ejecuciones que ya tienen turno en el semáforo
+_run_started: dict[asyncio.Task, float] = {}
+
+# Límite global de ejecuciones simultáneas de Claude en este proceso
+_run_semaphore = asyncio.Semaphore(CLAUDE_MAX_CONCURRENT)
 
 SKILLS_DIR = CLAUDE_SKILLS_DIR
 
@@ -82,6 +90,10 @@ Estas respondiendo a traves de un bot de Telegram en el movil del usuario. Adapt
 - El bot detecta rutas de imagen (.png, .jpg, etc.) y las envia automaticamente como foto al chat.
 - No digas "puedes ver la imagen en..." - simplemente menciona la ruta y el bot la mostrara.
 
+## Documentos y resultados
+- Si generas un informe, CSV, PDF, build u otro archivo para el usuario, menciona su ruta absoluta: el bot lo envia como documento.
+- Las carpetas de resultados (dist, output, results, reports) mencionadas por ruta se envian comprimidas en zip.
+
 ## Elementos interactivos de Telegram
 El bot convierte marcadores especiales en tu respuesta en elementos interactivos nativos de Telegram.
 USA ESTOS MARCADORES siempre que tenga sentido (opciones, confirmaciones, etc.):
@@ -167,26 +179,51 @@ def _check_dangerous(prompt: str) -> str | None:
     return None
 
 
+def _own_tasks() -> list[asyncio.Task]:
+    scope = bot_scope.key()
+    return [task for task, owner in _active_tasks.items() if owner == scope]
+
+
+def append_prompt() -> str:
+    """System prompt añadido para el bot actual (con su rol si es un worker)."""
+    scope = bot_scope.current()
+    return scope["role_prompt"] + _full_append_prompt if scope else _full_append_prompt
+
+
 def is_running() -> bool:
-    """Retorna True si hay una tarea de Claude Code en ejecución."""
-    return _active_task is not None and not _active_task.done()
+    """Retorna True si hay alguna tarea de Claude Code en ejecución (de este bot)."""
+    return any(not task.done() for task in _own_tasks())
+
+
+def run_status() -> dict:
+    """Ejecuciones en curso de este bot (segundos que llevan cada una) y las que esperan turno."""
+    now = time.monotonic()
+    tasks = _own_tasks()
+    running = [now - _run_started[task] for task in tasks if task in _run_started]
+    return {"running": running, "waiting": len(tasks) - len(running)}
 
 
 def stop_claude() -> bool:
-    """Cancela la tarea activa y mata el proceso hijo. Retorna True si había algo que cancelar."""
-    global _active_task, _active_process
+    """
+    Cancela las tareas activas de este bot y mata sus procesos hijo.
+    Retorna True si había algo que cancelar.
+    """
+    scope = bot_scope.key()
     stopped = False
-    if _active_process:
+    for process, owner in list(_active_processes.items()):
+        if owner != scope:
+            continue
         try:
-            _active_process.kill()
+            process.kill()
         except ProcessLookupError:
             pass
-        _active_process = None
-        stopped = True
-    if _active_task and not _active_task.done():
-        _active_task.cancel()
-        _active_task = None
+        _active_processes.pop(process, None)
         stopped = True
+    for task in _own_tasks():
+        if not task.done():
+            task.cancel()
+            stopped = True
+        _active_tasks.pop(task, None)
     return stopped
 
 
@@ -195,15 +232,16 @@ async def run_claude(
     cwd: str | None = None,
     session_id: str | None = None,
     on_notification: NotifyCallback = None,
+    user_text: str | None = None,
 ) -> dict:
     """
-    Ejecuta Claude Code con el prompt dado.
-    Retorna dict con 'response', 'session_id', 'error'.
+    Ejecuta Claude Code con el prompt dado (como mucho CLAUDE_MAX_CONCURRENT a la vez).
+    Retorna dict con 'response', 'session_id', 'error' (y 'cancelled' si se detuvo).
     on_notification: callback async opcional para eventos del sistema (ej. compactación).
+    user_text: parte del prompt escrita por el usuario, la única que se revisa en busca de
+        comandos peligrosos (por defecto todo el prompt; los resúmenes de archivos no cuentan).
     """
-    global _active_task
-
-    dangerous = _check_dangerous(prompt)
+    dangerous = _check_dangerous(prompt if user_text is None else user_text)
     if dangerous:
         return {
             "response": f"Comando bloqueado por seguridad: `{dangerous}`",
@@ -216,17 +254,23 @@ async def run_claude(
     else:
         coro = _run_with_subprocess(prompt, cwd, session_id)
 
-    _active_task = asyncio.current_task()
+    task = asyncio.current_task()
+    _active_tasks[task] = bot_scope.key()
     try:
-        return await coro
+        async with _run_semaphore:
+            _run_started[task] = time.monotonic()
+            return await coro
     except asyncio.CancelledError:
+        coro.close()
         return {
             "response": "Ejecucion detenida por el usuario.",
             "session_id": session_id,
             "error": True,
+            "cancelled": True,
         }
     finally:
-        _active_task = None
+        _active_tasks.pop(task, None)
+        _run_started.pop(task, None)
 
 
 async def _run_with_sdk(
@@ -243,7 +287,7 @@ async def _run_with_sdk(
             env=clean_env,
             extra_args={"chrome": None},
         )
-        options.append_system_prompt = _full_append_prompt
+        options.append_system_prompt = append_prompt()
         if cwd:
             options.cwd = cwd
         if session_id:
@@ -324,7 +368,7 @@ async def _run_with_subprocess(prompt: str, cwd: str | None, session_id: str | N
         "--chrome",
     ]
 
-    cmd.extend(["--append-system-prompt", _full_append_prompt])
+    cmd.extend(["--append-system-prompt", append_prompt()])
 
     if session_id:
         cmd.extend(["--resume", session_id])
@@ -334,7 +378,6 @@ async def _run_with_subprocess(prompt: str, cwd: str | None, session_id: str | N
     cmd.extend(["--permission-mode", CLAUDE_PERMISSION_MODE])
 
     try:
-        global _active_process
         clean_env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
         process = await asyncio.create_subprocess_exec(
             *cmd,
@@ -343,7 +386,7 @@ async def _run_with_subprocess(prompt: str, cwd: str | None, session_id: str | N
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
-        _active_process = process
+        _active_processes[process] = bot_scope.key()
 
         try:
             stdout, stderr = await asyncio.wait_for(
@@ -358,7 +401,7 @@ async def _run_with_subprocess(prompt: str, cwd: str | None, session_id: str | N
                 "error": True,
             }
         finally:
-            _active_process = None
+            _active_processes.pop(process, None)
 
         output = stdout.decode("utf-8", errors="replace").strip()
 
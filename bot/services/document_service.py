@@ -0,0 +1,167 @@
+"""
+Documentos recibidos por Telegram: extracción segura de archivos comprimidos y resumen
+local barato (tamaño, líneas, primeras y últimas líneas) para no meter el contenido
+entero en el prompt.
+"""
+
+import logging
+import shutil
+import tarfile
+import zipfile
+from pathlib import Path
+
+from bot.config import ARCHIVE_MAX_FILES, ARCHIVE_MAX_TOTAL_BYTES, DOCUMENT_SUMMARY_LINES
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+_SAMPLE_BYTES = 64 * 1024
+_MAX_LINE_CHARS = 300
+_MAX_LISTED_FILES = 30
+
+
+class UnsafeArchive(Exception):
+    """El archivo comprimido intenta salir del destino o supera los límites."""
+
+
+def is_archive(path: Path) -> bool:
+    return path.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def archive_stem(path: Path) -> str:
+    name = path.name
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if name.lower().endswith(suffix):
+            return name[: -len(suffix)] or "archivo"
+    return path.stem
+
+
+def _safe_target(dest: Path, member_name: str) -> Path:
+    target = (dest / member_name).resolve()
+    if not target.is_relative_to(dest.resolve()):
+        raise UnsafeArchive(f"ruta fuera del destino: {member_name}")
+    return target
+
+
+def _copy_limited(source, target: Path, budget: dict) -> None:
+    """Copia por bloques descontando del presupuesto de bytes (cabeceras mentirosas incluidas)."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, "wb") as out:
+        while block := source.read(1024 * 1024):
+            budget["bytes"] -= len(block)
+            if budget["bytes"] < 0:
+                raise UnsafeArchive(f"descomprimido supera {ARCHIVE_MAX_TOTAL_BYTES} bytes")
+            out.write(block)
+
+
+def extract_archive(archive: Path, dest: Path) -> list[Path]:
+    """
+    Extrae zip/tar en dest sin permitir rutas fuera de dest, enlaces ni dispositivos,
+    y con límites de número de archivos y bytes descomprimidos. Bloqueante.
+    Si falla, borra lo extraído (dest solo si lo ha creado esta llamada) y lanza
+    UnsafeArchive (o el error de lectura).
+    """
+    budget = {"bytes": ARCHIVE_MAX_TOTAL_BYTES}
+    extracted: list[Path] = []
+    created = not dest.exists()
+    dest.mkdir(parents=True, exist_ok=True)
+    try:
+        if zipfile.is_zipfile(archive):
+            with zipfile.ZipFile(archive) as zf:
+                members = [m for m in zf.infolist() if not m.is_dir()]
+                if len(members) > ARCHIVE_MAX_FILES:
+                    raise UnsafeArchive(f"{len(members)} archivos (max {ARCHIVE_MAX_FILES})")
+                for member in members:
+                    target = _safe_target(dest, member.filename)
+                    with zf.open(member) as source:
+                        _copy_limited(source, target, budget)
+                    extracted.append(target)
+        else:
+            with tarfile.open(archive) as tf:
+                members = [m for m in tf.getmembers() if not m.isdir()]
+                if len(members) > ARCHIVE_MAX_FILES:
+                    raise UnsafeArchive(f"{len(members)} archivos (max {ARCHIVE_MAX_FILES})")
+                for member in members:
+                    if not member.isfile():
+                        logger.info(f"Omitido (no es un archivo normal): {member.name}")
+                        continue
+                    target = _safe_target(dest, member.name)
+                    with tf.extractfile(member) as source:
+                        _copy_limited(source, target, budget)
+                    extracted.append(target)
+    except BaseException:
+        if created:
+            shutil.rmtree(dest, ignore_errors=True)
+        else:
+            for path in extracted:
+                path.unlink(missing_ok=True)
+        raise
+    return extracted
+
+
+def _is_text(sample: bytes) -> bool:
+    if b"\x00" in sample:
+        return False
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Un carácter multibyte cortado al final de la muestra no cuenta
+        return e.start >= len(sample) - 3
+    return True
+
+
+def _clip(line: str) -> str:
+    return line if len(line) <= _MAX_LINE_CHARS else line[:_MAX_LINE_CHARS] + "..."
+
+
+def _format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def summarize_file(path: Path) -> str:
+    """Tamaño, número de líneas y primeras/últimas líneas (si es texto). Bloqueante."""
+    size = path.stat().st_size
+    with open(path, "rb") as f:
+        head = f.read(_SAMPLE_BYTES)
+        if not _is_text(head):
+            return f"{path.name}: {_format_size(size)}, binario"
+
+        lines = head.count(b"\n")
+        while block := f.read(1024 * 1024):
+            lines += block.count(b"\n")
+
+        tail = b""
+        if size > _SAMPLE_BYTES:
+            f.seek(max(0, size - _SAMPLE_BYTES))
+            tail = f.read()
+
+    n = DOCUMENT_SUMMARY_LINES
+    head_lines = head.decode("utf-8", errors="replace").splitlines()
+    parts = [f"{path.name}: {_format_size(size)}, {lines} lineas"]
+    if lines <= 2 * n and not tail:
+        parts.append("--- contenido ---")
+        parts.extend(_clip(line) for line in head_lines)
+        return "\n".join(parts)
+
+    parts.append(f"--- primeras {n} lineas ---")
+    parts.extend(_clip(line) for line in head_lines[:n])
+    tail_lines = (tail or head).decode("utf-8", errors="replace").splitlines()
+    parts.append(f"--- ultimas {n} lineas ---")
+    parts.extend(_clip(line) for line in tail_lines[-n:])
+    return "\n".join(parts)
+
+
+def summarize_archive(dest: Path, files: list[Path]) -> str:
+    """Listado de lo extraído con tamaños."""
+    total = sum(p.stat().st_size for p in files)
+    lines = [f"{len(files)} archivos extraidos ({_format_size(total)}):"]
+    for p in files[:_MAX_LISTED_FILES]:
+        lines.append(f"- {p.relative_to(dest.resolve())} ({_format_size(p.stat().st_size)})")
+    if len(files) > _MAX_LISTED_FILES:
+        lines.append(f"- ... y {len(files) - _MAX_LISTED_FILES} mas")
+    return "\n".join(lines)
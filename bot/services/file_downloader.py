@@ -0,0 +1,62 @@
+"""Descarga de archivos de Telegram a memoria o a disco por bloques, con límite de tamaño."""
+
+import io
+import logging
+from pathlib import Path
+
+import httpx
+from telegram import File
+
+from bot.config import DOWNLOAD_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class FileTooLarge(Exception):
+    """El archivo supera el tamaño máximo permitido."""
+
+
+async def download_to_memory(file: File) -> io.BytesIO:
+    """Descarga el archivo completo a un buffer en memoria (sin tocar disco)."""
+    buffer = io.BytesIO()
+    await file.download_to_memory(out=buffer)
+    buffer.seek(0)
+    return buffer
+
+
+async def download_to_path(file: File, dest: Path, max_bytes: int | None = None) -> int:
+    """
+    Descarga el archivo a disco escribiendo por bloques, sin cargarlo entero en memoria.
+    Lanza FileTooLarge (y borra lo escrito) si supera max_bytes. Retorna los bytes escritos.
+    """
+    if max_bytes and file.file_size and file.file_size > max_bytes:
+        raise FileTooLarge(f"{file.file_size} bytes (max {max_bytes})")
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    # Con un Bot API server local file_path es una ruta, no una URL
+    if not str(file.file_path).startswith(("http://", "https://")):
+        await file.download_to_drive(str(dest))
+        written = dest.stat().st_size
+        if max_bytes and written > max_bytes:
+            dest.unlink(missing_ok=True)
+            raise FileTooLarge(f"{written} bytes (max {max_bytes})")
+        return written
+
+    written = 0
+    try:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=60.0)) as client:
+            async with client.stream("GET", file.file_path) as response:
+                response.raise_for_status()
+                with open(dest, "wb") as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        written += len(chunk)
+                        if max_bytes and written > max_bytes:
+                            raise FileTooLarge(f">{max_bytes} bytes")
+                        f.write(chunk)
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+
+    logger.info(f"Descargado por bloques: {dest} ({written} bytes)")
+    return written
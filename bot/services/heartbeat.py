@@ -0,0 +1,62 @@
+"""
+Heartbeats de los workers: cada worker escribe periódicamente un archivo con su PID y la
+hora en HEARTBEAT_DIR; el supervisor del coordinador los lee para detectar workers colgados.
+
+El archivo lleva también la fase de arranque, para el handshake de /spawn:
+imports (handlers cargados) → getme (token válido) → ready (recibiendo actualizaciones).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+from bot.config import HEARTBEAT_DIR, WORKER_HEARTBEAT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_phase: str | None = None
+
+
+def _path(token_id: str):
+    return HEARTBEAT_DIR / f"{token_id}.json"
+
+
+def write_heartbeat(token_id: str) -> None:
+    path = _path(token_id)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"pid": os.getpid(), "ts": time.time(), "phase": _phase}), encoding="utf-8")
+    tmp.replace(path)  # atómico: el lector nunca ve un archivo a medias
+
+
+def set_phase(token_id: str, phase: str) -> None:
+    """Avanza la fase de arranque del worker y la publica al momento."""
+    global _phase
+    _phase = phase
+    try:
+        write_heartbeat(token_id)
+    except OSError as e:
+        logger.warning(f"No se pudo escribir heartbeat: {e}")
+
+
+def read_heartbeat(token_id: str) -> dict | None:
+    """{"pid", "ts", "phase"} del último heartbeat, o None si no hay."""
+    try:
+        return json.loads(_path(token_id).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def clear_heartbeat(token_id: str) -> None:
+    _path(token_id).unlink(missing_ok=True)
+
+
+async def heartbeat_loop(token_id: str) -> None:
+    """Escribe el heartbeat cada WORKER_HEARTBEAT_INTERVAL segundos (tarea del worker)."""
+    while True:
+        try:
+            write_heartbeat(token_id)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir heartbeat: {e}")
+        await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
@@ -0,0 +1,221 @@
+"""
+Workers alojados en el proceso del coordinador (WORKER_MODE=inprocess).
+
+Cada token del pool se atiende con su propia Application dentro del mismo event loop: sin
+intérprete, modelo de Whisper ni imports propios, un worker más cuesta poco más que sus
+handlers y su conexión HTTP. El aislamiento entre bots lo da bot_scope: cada actualización se
+procesa dentro del ámbito de su worker (archivo de sesión, rol, ejecuciones de Claude).
+
+Mismas órdenes que el canal de control de los workers en proceso propio (stop-run, drain,
+reload, park) y mismo formato de estado, para que /bots y /worker no distingan el modo.
+"""
+
+import asyncio
+import logging
+
+import httpx
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder
+from telegram.request import HTTPXRequest
+
+from bot.config import AUTHORIZED_USER_ID
+from bot.services import (
+    bot_api,
+    bot_scope,
+    claude_service,
+    session_manager,
+    webhook_ingress,
+    whisper_service,
+    worker_control,
+)
+
+logger = logging.getLogger(__name__)
+
+_apps: dict[str, Application] = {}
+_drains: set[asyncio.Task] = set()  # referencias para que el GC no se lleve las tareas
+_ssl_context = None
+
+
+class _ScopedApplication(Application):
+    """Application que procesa cada actualización dentro del ámbito de su worker."""
+
+    async def process_update(self, update: object) -> None:
+        # Las tareas que creen los handlers (block=False) copian el contexto y heredan el ámbito
+        with bot_scope.use(self.bot_data["scope"]):
+            await super().process_update(update)
+
+
+def _request(get_updates: bool) -> HTTPXRequest:
+    """
+    Cliente HTTP de una Application con el contexto TLS compartido. Cada AsyncClient de httpx
+    carga por defecto su propio almacén de certificados (unos 900 KB, dos por bot): era casi
+    todo el coste de un worker alojado.
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return HTTPXRequest(
+        connection_pool_size=1 if get_updates else 256,  # los valores de ApplicationBuilder
+        httpx_kwargs={"verify": _ssl_context},
+    )
+
+
+def is_hosted(token_id: str) -> bool:
+    return token_id in _apps
+
+
+async def _notify(app: Application, text: str) -> None:
+    try:
+        await app.bot.send_message(chat_id=AUTHORIZED_USER_ID, text=text)
+    except Exception as e:
+        logger.warning(f"No se pudo enviar aviso del worker: {e}")
+
+
+async def start_worker(token_id: str, bot_token: str, bot_username: str,
+                       project_name: str, project_path: str, role: str, quiet: bool = False) -> None:
+    """Crea la Application del worker y empieza su polling en el loop actual."""
+    from bot.worker_main import add_worker_handlers
+
+    scope = bot_scope.make_scope(token_id, bot_username, project_name, project_path, role)
+    with bot_scope.use(scope):
+        session_manager.set_active_project(project_name)
+        worker_control.mark_started()
+
+    app = (
+        ApplicationBuilder()
+        .token(bot_token)
+        .request(_request(get_updates=False))
+        .get_updates_request(_request(get_updates=True))
+        .application_class(_ScopedApplication)
+        .build()
+    )
+    app.bot_data["scope"] = scope
+    app.bot_data["params"] = {
+        "token_id": token_id, "bot_token": bot_token, "bot_username": bot_username,
+        "project_name": project_name, "project_path": project_path, "role": role,
+    }
+    add_worker_handlers(app)
+
+    await app.initialize()
+    try:
+        await app.start()
+        if webhook_ingress.is_serving():
+            webhook_ingress.register(token_id, bot_token, webhook_ingress.queue_delivery(app))
+            url, secret = webhook_ingress.endpoint(bot_token)
+            # quiet: reload; conservar lo que Telegram reintentó mientras tanto
+            app.bot_data["webhook"] = await webhook_ingress.set_webhook(app.bot, url, secret, drop_pending=not quiet)
+        if not app.bot_data.get("webhook"):
+            webhook_ingress.unregister(token_id)
+            await app.updater.start_polling(drop_pending_updates=not quiet, allowed_updates=Update.ALL_TYPES)
+    except Exception:
+        webhook_ingress.unregister(token_id)
+        if app.running:
+            await app.stop()
+        await app.shutdown()
+        raise
+    _apps[token_id] = app
+    logger.info(f"Worker alojado iniciado: {scope['label']}")
+    if not quiet:
+        await _notify(app, f"🟢 Worker iniciado: {scope['label']}")
+
+
+async def stop_worker(token_id: str, notify: bool = True) -> None:
+    """Detiene el polling y la Application del worker, cancelando sus ejecuciones de Claude."""
+    app = _apps.pop(token_id, None)
+    if not app:
+        return
+    webhook_ingress.unregister(token_id)
+    scope = app.bot_data["scope"]
+    with bot_scope.use(scope):
+        claude_service.stop_claude()
+        whisper_service.cancel_transcriptions()
+        worker_control.forget()  # si se despierta, la inactividad cuenta desde el nuevo arranque
+    if notify:
+        await _notify(app, f"🔴 Worker apagado: {scope['label']}")
+    try:
+        if app.updater.running:
+            await app.updater.stop()
+        if app.running:
+            await app.stop()
+        await app.shutdown()
+    except Exception as e:
+        logger.warning(f"Error deteniendo worker alojado {scope['label']}: {e}")
+    logger.info(f"Worker alojado detenido: {scope['label']}")
+
+
+async def stop_all(notify: bool = True) -> list[str]:
+    """Detiene todos los workers alojados a la vez. Retorna sus token_id."""
+    token_ids = list(_apps)
+    await asyncio.gather(*(stop_worker(token_id, notify=notify) for token_id in token_ids), return_exceptions=True)
+    return token_ids
+
+
+def live_status(token_id: str) -> dict | None:
+    """Estado en vivo con el formato de worker_control (sin memoria: es la del coordinador)."""
+    app = _apps.get(token_id)
+    if not app:
+        return None
+    with bot_scope.use(app.bot_data["scope"]):
+        runs = claude_service.run_status()
+        idle = worker_control.idle_seconds(bool(runs["running"] or runs["waiting"]))
+    if app.bot_data.get("draining"):
+        state = "draining"
+    else:
+        state = "busy" if runs["running"] else "idle"
+    return {
+        "state": state,
+        "runs": [round(s, 1) for s in runs["running"]],
+        "queue": runs["waiting"],
+        "idle": round(idle),
+    }
+
+
+async def _drain(app: Application, reload: bool, notify: bool = True) -> None:
+    params = app.bot_data["params"]
+    if app.bot_data.get("webhook"):
+        # Mientras drena, queue_delivery rechaza las actualizaciones y Telegram las reintenta
+        if not reload:
+            try:
+                await app.bot.delete_webhook()
+            except Exception as e:
+                logger.warning(f"No se pudo borrar el webhook: {e}")
+    if app.updater.running:
+        await app.updater.stop()
+    with bot_scope.use(app.bot_data["scope"]):
+        while claude_service.is_running():
+            await asyncio.sleep(1)
+    await stop_worker(params["token_id"], notify=notify and not reload)
+    if reload:
+        try:
+            await start_worker(**params, quiet=True)
+            return
+        except Exception as e:
+            label = app.bot_data["scope"]["label"]
+            logger.error(f"Worker alojado {label} no se pudo recargar: {e}")
+            # La Application ya está cerrada: se avisa por la Bot API con el token del worker
+            await bot_api.send_message(
+                params["bot_token"], AUTHORIZED_USER_ID, f"🔴 Worker {label} no se pudo recargar: {e}"
+            )
+    from bot.services import token_pool, worker_registry
+    token_pool.release_token(params["token_id"])
+    worker_registry.unregister_worker(params["token_id"])
+
+
+def send_command(token_id: str, cmd: str) -> dict | None:
+    """Órdenes del canal de control (stop-run, drain, reload, park) para un worker alojado."""
+    app = _apps.get(token_id)
+    if not app:
+        return None
+    if cmd == "stop-run":
+        with bot_scope.use(app.bot_data["scope"]):
+            return {"ok": True, "stopped": claude_service.stop_claude()}
+    if cmd in ("drain", "reload", "park"):
+        if not app.bot_data.get("draining"):
+            app.bot_data["draining"] = True
+            task = asyncio.get_running_loop().create_task(
+                _drain(app, reload=cmd == "reload", notify=cmd != "park")
+            )
+            _drains.add(task)
+            task.add_done_callback(_drains.discard)
+        return {"ok": True}
+    return {"error": f"comando desconocido: {cmd}"}
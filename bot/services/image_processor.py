@@ -0,0 +1,174 @@
+"""
+Preprocesado de imágenes antes de pasarlas a Claude: limita el lado mayor, elimina
+EXIF y recomprime a la calidad configurada. Las imágenes idénticas se deduplican por
+hash de contenido y el original se conserva en `originals/` por si se pide.
+"""
+
+import hashlib
+import io
+import logging
+from pathlib import Path
+
+from bot.config import IMAGE_MAX_SIDE, IMAGE_JPEG_QUALITY
+
+logger = logging.getLogger(__name__)
+
+_use_pillow = False
+try:
+    from PIL import ExifTags, Image, ImageOps
+    _use_pillow = True
+except ImportError:
+    logger.warning("Pillow no disponible, las imagenes solo se guardan sin metadatos (ni reescaladas ni giradas)")
+
+ORIGINALS_DIRNAME = "originals"
+# Segmentos JPEG con metadatos: APP1 (EXIF, XMP) y APP13 (IPTC)
+_JPEG_METADATA_MARKERS = {0xE1, 0xED}
+
+
+def _content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:24]
+
+
+def _strip_jpeg_metadata(data: bytes) -> bytes:
+    """Quita los segmentos de metadatos de un JPEG sin recomprimir: los píxeles no cambian."""
+    if data[:2] != b"\xff\xd8":
+        raise ValueError("no es un JPEG")
+    out = bytearray(data[:2])
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError(f"marcador JPEG invalido en el byte {pos}")
+        marker = data[pos + 1]
+        if marker == 0xFF:  # relleno entre segmentos
+            pos += 1
+            continue
+        if marker == 0xDA:  # SOS: desde aquí solo datos de imagen
+            return bytes(out + data[pos:])
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # marcadores sin longitud
+            out += data[pos:pos + 2]
+            pos += 2
+            continue
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+        if marker not in _JPEG_METADATA_MARKERS:
+            out += data[pos:end]
+        pos = end
+    raise ValueError("JPEG truncado")
+
+
+def _copy_without_metadata(source: Path, target: Path) -> int:
+    """Copia source a target quitando los metadatos si es un JPEG. Retorna los bytes escritos."""
+    data = source.read_bytes()
+    try:
+        data = _strip_jpeg_metadata(data)
+    except ValueError as e:
+        logger.warning(f"{source.name} se guarda con sus metadatos: {e}")
+    target.write_bytes(data)
+    return len(data)
+
+
+def _reencode(source: Path) -> tuple[bytes, tuple[int, int], tuple[int, int], bool]:
+    """
+    Retorna (jpeg, tamaño original, tamaño final, rotada) sin EXIF y con el lado mayor limitado.
+    rotada indica que la orientación EXIF obligó a girar los píxeles.
+    """
+    with Image.open(source) as img:
+        original_size = img.size
+        rotated = img.getexif().get(ExifTags.Base.Orientation, 1) != 1
+        # Aplicar la orientación EXIF antes de descartarla
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        if IMAGE_MAX_SIDE and max(img.size) > IMAGE_MAX_SIDE:
+            img.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+        return out.getvalue(), original_size, img.size, rotated
+
+
+def process_image(downloaded: Path, images_dir: Path) -> dict:
+    """
+    Procesa una imagen recién descargada (la mueve a originals/).
+    Retorna {"path", "original_path", "deduplicated", "original_bytes", "bytes",
+    "original_pixels", "pixels"}. Operación bloqueante: llamar desde un hilo.
+    """
+    content_hash = _content_hash(downloaded)
+    originals_dir = images_dir / ORIGINALS_DIRNAME
+    originals_dir.mkdir(parents=True, exist_ok=True)
+
+    original_path = originals_dir / f"{content_hash}{downloaded.suffix or '.jpg'}"
+    if original_path.exists():
+        downloaded.unlink(missing_ok=True)
+    else:
+        downloaded.replace(original_path)
+    original_bytes = original_path.stat().st_size
+
+    processed_path = images_dir / f"{content_hash}.jpg"
+    result = {
+        "path": processed_path,
+        "original_path": original_path,
+        "deduplicated": processed_path.exists(),
+        "original_bytes": original_bytes,
+        "bytes": original_bytes,
+        "original_pixels": None,
+        "pixels": None,
+    }
+
+    if result["deduplicated"]:
+        # Imagen ya vista (p. ej. captura reenviada): se reutiliza el archivo procesado
+        result["bytes"] = processed_path.stat().st_size
+        logger.info(f"Imagen duplicada, reutilizando {processed_path.name}")
+        return result
+
+    if not _use_pillow:
+        result["bytes"] = _copy_without_metadata(original_path, processed_path)
+        return result
+
+    try:
+        data, (ow, oh), (w, h), rotated = _reencode(original_path)
+    except Exception as e:
+        # Sin poder girarla se pierde la orientación, pero no se mandan la ubicación ni el dispositivo
+        logger.warning(f"No se pudo procesar {original_path.name}, se usa el original: {e}")
+        result["bytes"] = _copy_without_metadata(original_path, processed_path)
+        return result
+
+    result["original_pixels"] = ow * oh
+    result["pixels"] = w * h
+    if (
+        not rotated
+        and (w, h) == (ow, oh)
+        and len(data) >= original_bytes
+        and original_path.suffix.lower() in (".jpg", ".jpeg")
+    ):
+        # Sin reescalar la recompresión no compensa: se conservan los píxeles, sin los metadatos
+        result["bytes"] = _copy_without_metadata(original_path, processed_path)
+    else:
+        processed_path.write_bytes(data)
+        result["bytes"] = len(data)
+
+    logger.info(
+        f"Imagen {processed_path.name}: {ow}x{oh} -> {w}x{h}, "
+        f"{original_bytes / 1024:.0f} KB -> {result['bytes'] / 1024:.0f} KB"
+    )
+    return result
+
+
+def savings_summary(results: list[dict]) -> str | None:
+    """Resumen de píxeles y bytes ahorrados por imagen, o None si no hubo ahorro."""
+    lines = []
+    for i, r in enumerate(results, 1):
+        if r["deduplicated"]:
+            lines.append(f"{i}. duplicada, reutilizada")
+            continue
+        saved_bytes = r["original_bytes"] - r["bytes"]
+        saved_pixels = (r["original_pixels"] or 0) - (r["pixels"] or 0)
+        if saved_bytes <= 0 and saved_pixels <= 0:
+            continue
+        lines.append(
+            f"{i}. {saved_pixels / 1e6:.1f} MP y {saved_bytes / 1024:.0f} KB menos "
+            f"({r['original_bytes'] / 1024:.0f} -> {r['bytes'] / 1024:.0f} KB)"
+        )
+    return "\n".join(lines) if lines else None
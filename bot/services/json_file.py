@@ -0,0 +1,45 @@
+"""
+Archivos JSON compartidos entre el coordinador y los workers (cachés, referencias, estadísticas).
+
+write_atomic escribe en un temporal y lo renombra: un lector nunca ve un archivo a medias.
+locked serializa los ciclos leer-modificar-escribir de varios procesos (y hilos) con un
+flock sobre un archivo .lock al lado; sin fcntl (Windows) solo queda la escritura atómica.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def read(path: Path) -> dict | None:
+    """Contenido del archivo, o None si no existe o no es JSON válido."""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def write_atomic(path: Path, data, indent: int | None = None) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, indent=indent, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+@contextmanager
+def locked(path: Path):
+    """Exclusión entre procesos para leer-modificar-escribir path."""
+    if fcntl is None:
+        yield
+        return
+    with open(path.with_name(path.name + ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,80 @@
+"""Canal IPC local entre procesos del bot: mensajes JSON (uno por línea) sobre sockets Unix."""
+
+import asyncio
+import json
+import logging
+import socket
+import sys
+from collections.abc import Callable, Coroutine
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Límite de línea generoso: las respuestas incluyen transcripciones completas
+_LINE_LIMIT = 16 * 1024 * 1024
+
+ConnectionHandler = Callable[[asyncio.StreamReader, asyncio.StreamWriter], Coroutine[Any, Any, None]]
+
+
+def ipc_available() -> bool:
+    """Los sockets Unix solo se usan fuera de Windows."""
+    return sys.platform != "win32" and hasattr(socket, "AF_UNIX")
+
+
+async def serve(path: Path, handler: ConnectionHandler) -> asyncio.AbstractServer:
+    """Abre un servidor en el socket dado, eliminando un socket huérfano previo."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    server = await asyncio.start_unix_server(handler, path=str(path), limit=_LINE_LIMIT)
+    logger.info(f"IPC escuchando en {path}")
+    return server
+
+
+async def connect(path: Path, timeout: float = 2.0) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Conecta con un socket. Lanza OSError si no hay nadie escuchando."""
+    if not ipc_available() or not path.exists():
+        raise ConnectionRefusedError(f"Sin servidor IPC en {path}")
+    return await asyncio.wait_for(
+        asyncio.open_unix_connection(str(path), limit=_LINE_LIMIT), timeout=timeout,
+    )
+
+
+async def send_message(writer: asyncio.StreamWriter, message: dict) -> None:
+    writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader) -> dict | None:
+    """Lee un mensaje. Retorna None si el otro extremo cerró la conexión."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        logger.warning(f"Mensaje IPC corrupto: {line[:100]!r}")
+        return None
+
+
+async def close(writer: asyncio.StreamWriter) -> None:
+    try:
+        writer.close()
+        await writer.wait_closed()
+    except Exception:
+        pass
+
+
+async def request(path: Path, message: dict, timeout: float = 2.0) -> dict | None:
+    """Petición/respuesta simple. Retorna None si el servidor no está o no responde a tiempo."""
+    try:
+        reader, writer = await connect(path, timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        await send_message(writer, message)
+        return await asyncio.wait_for(read_message(reader), timeout=timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        await close(writer)
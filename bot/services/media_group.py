@@ -0,0 +1,73 @@
+"""
+Agrupación de mensajes de un mismo álbum (media_group) de Telegram.
+
+Telegram entrega cada elemento del álbum como un update independiente. El agregador
+los acumula por media_group_id con un debounce adaptativo: cada llegada reinicia la
+espera corta, y el grupo se entrega cuando dejan de llegar elementos, cuando se alcanza
+el máximo de un álbum o cuando se agota la espera máxima.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Telegram no permite álbumes de más de 10 elementos
+ALBUM_MAX_ITEMS = 10
+
+FlushCallback = Callable[[list, Any], Awaitable[None]]
+
+
+class MediaGroupAggregator:
+    """Acumula elementos por media_group_id y llama a on_flush(items, first) una vez por grupo."""
+
+    def __init__(self, on_flush: FlushCallback, idle: float, max_wait: float):
+        self.on_flush = on_flush
+        self.idle = idle
+        self.max_wait = max_wait
+        self._groups: dict[str, dict] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, group_id: str, item: Any, first: Any = None) -> None:
+        """
+        Añade un elemento al grupo y reprograma la entrega.
+        first: dato asociado al grupo (p. ej. el primer update); solo cuenta el del primer elemento.
+        """
+        # Sin awaits entre consulta y modificación: no hace falta lock en el event loop
+        group = self._groups.get(group_id)
+        if group is None:
+            group = {"items": [], "first": first, "started": time.monotonic(), "timer": None}
+            self._groups[group_id] = group
+        group["items"].append(item)
+
+        if group["timer"]:
+            group["timer"].cancel()
+
+        if len(group["items"]) >= ALBUM_MAX_ITEMS:
+            self._flush(group_id)
+            return
+
+        remaining = self.max_wait - (time.monotonic() - group["started"])
+        delay = max(0.0, min(self.idle, remaining))
+        group["timer"] = asyncio.get_running_loop().call_later(delay, self._flush, group_id)
+
+    def _flush(self, group_id: str) -> None:
+        group = self._groups.pop(group_id, None)
+        if not group:
+            return
+        if group["timer"]:
+            group["timer"].cancel()
+        waited = time.monotonic() - group["started"]
+        logger.info(f"Album {group_id}: {len(group['items'])} elementos tras {waited:.2f}s")
+        task = asyncio.create_task(self._deliver(group_id, group["items"], group["first"]))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, group_id: str, items: list, first: Any) -> None:
+        try:
+            await self.on_flush(items, first)
+        except Exception as e:
+            logger.error(f"Error procesando album {group_id}: {e}")
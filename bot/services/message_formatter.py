@@ -12,6 +12,7 @@ from telegram import (
 )
 
 from bot.config import TELEGRAM_MAX_MESSAGE_LENGTH
+from bot.services.artifacts import extract_artifact_paths, send_artifacts
 
 logger = logging.getLogger(__name__)
 
@@ -215,10 +216,11 @@ def extract_interactive(text: str) -> tuple[str, InteractiveElements]:
 # --- Envío de mensajes ---
 
 async def send_long_message(update_or_chat, text: str, parse_mode: str | None = "Markdown") -> None:
-    """Envía un mensaje con soporte para imágenes y elementos interactivos."""
+    """Envía un mensaje con soporte para imágenes, artefactos y elementos interactivos."""
     from telegram import Update
 
     images = extract_image_paths(text)
+    artifacts = extract_artifact_paths(text)
     text, elements = extract_interactive(text)
 
     parts = split_message(text) if text else []
@@ -261,6 +263,10 @@ async def send_long_message(update_or_chat, text: str, parse_mode: str | None =
         except Exception as e:
             logger.error(f"Error enviando imagen {img_path}: {e}")
 
+    # Enviar documentos y carpetas de resultados
+    if artifacts:
+        await send_artifacts(update_or_chat, artifacts)
+
     # Enviar polls
     for poll in elements.polls:
         try:
@@ -0,0 +1,78 @@
+"""
+Tiempos medidos por modo: álbumes analizados (un solo turno / en paralelo) y arranque de
+workers (zygote / subproceso), para comparar los dos caminos con datos reales.
+
+Los archivos los escriben el coordinador y los workers: bajo bloqueo y de forma atómica.
+"""
+
+import logging
+import time
+from pathlib import Path
+
+from bot.config import RUN_STATS_FILE, SPAWN_STATS_FILE
+from bot.services import json_file
+
+logger = logging.getLogger(__name__)
+
+_MAX_RUNS_PER_MODE = 200
+
+
+def _load(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    data = json_file.read(path)
+    if data is None:
+        logger.warning(f"{path.name} corrupto, reiniciando")
+    return data or {}
+
+
+def _record(path: Path, mode: str, entry: dict) -> None:
+    with json_file.locked(path):
+        data = _load(path)
+        runs = data.setdefault(mode, [])
+        runs.append({**entry, "at": time.time()})
+        data[mode] = runs[-_MAX_RUNS_PER_MODE:]
+        json_file.write_atomic(path, data, indent=2)
+
+
+def record_album_run(mode: str, images: int, seconds: float) -> None:
+    """Guarda la duración total (hasta la respuesta final) de un álbum en el modo dado."""
+    _record(RUN_STATS_FILE, mode, {"images": images, "seconds": round(seconds, 2)})
+
+
+def album_summary() -> dict:
+    """Por modo: número de álbumes, segundos de media y segundos por imagen."""
+    summary = {}
+    for mode, runs in _load(RUN_STATS_FILE).items():
+        if not runs:
+            continue
+        total_images = sum(r["images"] for r in runs)
+        total_seconds = sum(r["seconds"] for r in runs)
+        summary[mode] = {
+            "runs": len(runs),
+            "avg_seconds": total_seconds / len(runs),
+            "seconds_per_image": total_seconds / total_images if total_images else 0.0,
+        }
+    return summary
+
+
+def record_spawn(mode: str, seconds: float, rss: int | None, pss: int | None) -> None:
+    """Guarda el tiempo de lanzamiento a listo de un worker y su memoria (RSS y PSS) al estar listo."""
+    _record(SPAWN_STATS_FILE, mode, {"seconds": round(seconds, 2), "rss": rss, "pss": pss})
+
+
+def spawn_summary() -> dict:
+    """Por modo: arranques, segundos de media hasta estar listo y memoria media (bytes o None)."""
+    summary = {}
+    for mode, runs in _load(SPAWN_STATS_FILE).items():
+        if not runs:
+            continue
+        rss = [r["rss"] for r in runs if r.get("rss")]
+        pss = [r["pss"] for r in runs if r.get("pss")]
+        summary[mode] = {
+            "spawns": len(runs),
+            "avg_seconds": sum(r["seconds"] for r in runs) / len(runs),
+            "avg_rss": sum(rss) / len(rss) if rss else None,
+            "avg_pss": sum(pss) / len(pss) if pss else None,
+        }
+    return summary
@@ -3,33 +3,41 @@ import logging
 from pathlib import Path
 
 from bot.config import SESSIONS_DIR
+from bot.services import bot_scope
 
 logger = logging.getLogger(__name__)
 
 STATE_FILE = SESSIONS_DIR / "user_state.json"
 
-# Caché en memoria — se carga una sola vez
-_cache: dict | None = None
+# Caché en memoria por archivo de estado — cada uno se carga una sola vez
+_caches: dict[Path, dict] = {}
+
+
+def _state_file() -> Path:
+    """Archivo del bot actual: el del worker si hay ámbito, si no el del coordinador."""
+    scope = bot_scope.current()
+    return scope["state_file"] if scope else STATE_FILE
 
 
 def _load_state() -> dict:
-    global _cache
-    if _cache is not None:
-        return _cache
-    if STATE_FILE.exists():
+    path = _state_file()
+    cached = _caches.get(path)
+    if cached is not None:
+        return cached
+    state = {"active_project": None, "sessions": {}}
+    if path.exists():
         try:
-            _cache = json.loads(STATE_FILE.read_text(encoding="utf-8"))
-            return _cache
+            state = json.loads(path.read_text(encoding="utf-8"))
         except (json.JSONDecodeError, OSError):
-            logger.warning("Estado corrupto, reiniciando")
-    _cache = {"active_project": None, "sessions": {}}
-    return _cache
+            logger.warning(f"Estado corrupto ({path.name}), reiniciando")
+    _caches[path] = state
+    return state
 
 
 def _save_state(state: dict) -> None:
-    global _cache
-    _cache = state
-    STATE_FILE.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
+    path = _state_file()
+    _caches[path] = state
+    path.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
 
 
 def get_active_project() -> str | None:
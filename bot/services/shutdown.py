@@ -0,0 +1,138 @@
+"""
+Apagado ordenado de los workers (coordinador y /stopall).
+
+En vez de matarlos uno a uno esperando el aviso de cada uno, se envía SIGTERM a todos a la
+vez, se espera con un único plazo global (WORKER_SHUTDOWN_TIMEOUT) y los que sigan vivos
+reciben SIGKILL. Mientras dura, SHUTDOWN_MARKER indica a los workers que no envíen su propio
+aviso de apagado: el coordinador manda un solo resumen.
+
+stop_workers() es síncrona (sirve desde un manejador de señales, sin event loop);
+shutdown_workers() la ejecuta en un hilo y detiene a la vez los workers alojados.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+
+from bot.config import SHUTDOWN_MARKER, WORKER_MODE, WORKER_SHUTDOWN_TIMEOUT
+from bot.services import worker_registry
+
+logger = logging.getLogger(__name__)
+
+_POLL_INTERVAL = 0.05
+
+
+def clear_marker() -> None:
+    """Al arrancar el coordinador: los workers nuevos vuelven a avisar de su apagado."""
+    SHUTDOWN_MARKER.unlink(missing_ok=True)
+
+
+def _signal(worker: dict, force: bool) -> None:
+    """SIGTERM (o SIGKILL si force) al worker, por su handle o por PID."""
+    process = worker_registry.get_process(worker["token_id"])
+    try:
+        if process:
+            if process.poll() is None:
+                if force:
+                    process.kill()
+                else:
+                    process.terminate()
+        elif sys.platform == "win32":
+            os.system(f"taskkill /PID {worker['pid']} /F >nul 2>&1")
+        elif worker.get("pid", 0) > 0:
+            os.kill(worker["pid"], signal.SIGKILL if force else signal.SIGTERM)
+    except (ProcessLookupError, OSError):
+        pass
+
+
+def _is_running(worker: dict) -> bool:
+    process = worker_registry.get_process(worker["token_id"])
+    if process:
+        return process.poll() is None
+    return worker_registry._is_pid_alive(worker.get("pid", 0))
+
+
+def _begin() -> list[dict]:
+    """SIGTERM a todos los workers en proceso propio, marcados "stopping" para el supervisor."""
+    workers = [w for w in worker_registry.list_active_workers() if w.get("mode") != "inprocess"]
+    if not workers:
+        return []
+    try:
+        SHUTDOWN_MARKER.touch()
+    except OSError:
+        pass
+    for worker in workers:
+        worker_registry.update_worker(worker["token_id"], status="stopping")
+        _signal(worker, force=False)
+    return workers
+
+
+def _wait(workers: list[dict], deadline: float) -> list[str]:
+    """Espera hasta el plazo global; SIGKILL a los que sigan vivos. Retorna sus etiquetas."""
+    pending = list(workers)
+    while pending and time.monotonic() < deadline:
+        time.sleep(_POLL_INTERVAL)
+        pending = [w for w in pending if _is_running(w)]
+    killed = []
+    for worker in pending:
+        _signal(worker, force=True)
+        killed.append(f"@{worker['bot_username']}")
+        logger.warning(f"Worker @{worker['bot_username']} no termino a tiempo, SIGKILL")
+    return killed
+
+
+def _finish(workers: list[dict]) -> None:
+    for worker in workers:
+        worker_registry.release_worker(worker["token_id"])
+    clear_marker()
+
+
+def stop_workers(timeout: float = WORKER_SHUTDOWN_TIMEOUT) -> dict:
+    """
+    Detiene todos los workers en proceso propio con un plazo global y los da de baja.
+    Retorna {"stopped": N, "killed": [etiquetas de los que necesitaron SIGKILL], "seconds": s}.
+    """
+    started = time.monotonic()
+    workers = _begin()
+    killed = _wait(workers, started + timeout) if workers else []
+    _finish(workers)
+    return {"stopped": len(workers), "killed": killed, "seconds": time.monotonic() - started}
+
+
+async def _stop_hosted() -> list[str]:
+    if WORKER_MODE != "inprocess":
+        return []
+    from bot.services import hosted_workers
+    return await hosted_workers.stop_all(notify=False)
+
+
+async def shutdown_workers(timeout: float = WORKER_SHUTDOWN_TIMEOUT) -> dict:
+    """Como stop_workers, sin bloquear el event loop y deteniendo a la vez los workers alojados."""
+    started = time.monotonic()
+    workers = _begin()
+    hosted, killed = await asyncio.gather(
+        _stop_hosted(),
+        asyncio.to_thread(_wait, workers, started + timeout),
+    )
+    _finish(workers)
+    for token_id in hosted:
+        worker_registry.release_worker(token_id)
+    summary = {"stopped": len(workers) + len(hosted), "killed": killed, "seconds": time.monotonic() - started}
+    logger.info(
+        f"Workers detenidos: {summary['stopped']} en {summary['seconds']:.2f}s"
+        f" ({len(killed)} con SIGKILL)"
+    )
+    return summary
+
+
+def summary_text(summary: dict) -> str:
+    """Líneas del aviso de apagado con el resultado de stop_workers / shutdown_workers."""
+    if not summary["stopped"]:
+        return ""
+    text = f"Workers detenidos: {summary['stopped']} en {summary['seconds']:.1f}s"
+    if summary["killed"]:
+        text += f"\nForzados (SIGKILL): {', '.join(summary['killed'])}"
+    return text
@@ -0,0 +1,216 @@
+"""
+Retención de archivos temporales: TEMP_DIR, `<proyecto>/.claude-bot-images` y, solo si se
+configura una cuota (UPLOADS_DIR_MAX_*), `<proyecto>/.claude-bot-uploads`.
+
+Cada directorio tiene una cuota de bytes y una antigüedad máxima. Al superarse se borran
+primero los archivos usados hace más tiempo (atime). Nunca se borran archivos recientes
+(pueden estar en uso por una ejecución en curso) ni los referenciados por una sesión que
+sigue activa en algún state file de SESSIONS_DIR (coordinador o workers).
+
+storage_refs.json lo modifican el coordinador, los workers y el hilo del janitor: cada
+leer-modificar-escribir va bajo bloqueo y con escritura atómica (json_file).
+"""
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+
+from bot.config import (
+    BASE_DIR,
+    IMAGES_DIRNAME,
+    IMAGES_DIR_MAX_AGE_DAYS,
+    IMAGES_DIR_MAX_BYTES,
+    SESSIONS_DIR,
+    STORAGE_JANITOR_INTERVAL,
+    STORAGE_MIN_AGE,
+    STORAGE_REFS_FILE,
+    TEMP_DIR,
+    TEMP_DIR_MAX_AGE_DAYS,
+    TEMP_DIR_MAX_BYTES,
+    UPLOADS_DIRNAME,
+    UPLOADS_DIR_MAX_AGE_DAYS,
+    UPLOADS_DIR_MAX_BYTES,
+)
+from bot.services import json_file, project_manager
+
+logger = logging.getLogger(__name__)
+
+
+# --- Referencias archivo → sesiones ---
+
+def _load_refs() -> dict | None:
+    """Referencias guardadas; None si el archivo está corrupto (no debe sobrescribirse a ciegas)."""
+    if not STORAGE_REFS_FILE.exists():
+        return {}
+    refs = json_file.read(STORAGE_REFS_FILE)
+    if refs is None:
+        logger.warning("storage_refs.json corrupto")
+    return refs
+
+
+def _save_refs(refs: dict) -> None:
+    json_file.write_atomic(STORAGE_REFS_FILE, refs, indent=2)
+
+
+def _session_ids(value) -> list[str]:
+    # Formato anterior: una sola sesión por archivo
+    return [value] if isinstance(value, str) else list(value)
+
+
+def record_references(paths: list[Path], session_id: str | None) -> None:
+    """
+    Marca los archivos como usados por la sesión (no se borran mientras siga activa).
+    Las imágenes se deduplican por contenido: un archivo puede estar en varias sesiones.
+    """
+    if not session_id:
+        return
+    with json_file.locked(STORAGE_REFS_FILE):
+        refs = _load_refs() or {}
+        for path in paths:
+            key = str(Path(path).resolve())
+            sessions = _session_ids(refs.get(key, []))
+            if session_id not in sessions:
+                sessions.append(session_id)
+            refs[key] = sessions
+        _save_refs(refs)
+
+
+def _active_session_ids() -> set[str]:
+    """Session IDs vigentes en los state files del coordinador y de los workers."""
+    active = set()
+    for state_file in SESSIONS_DIR.glob("*.json"):
+        try:
+            state = json.loads(state_file.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            continue
+        for info in state.get("sessions", {}).values():
+            if info.get("session_id"):
+                active.add(info["session_id"])
+    return active
+
+
+def _protected_paths() -> set[str]:
+    """Archivos referenciados por alguna sesión activa. Olvida las referencias caducadas."""
+    active = _active_session_ids()
+    with json_file.locked(STORAGE_REFS_FILE):
+        refs = _load_refs()
+        if refs is None:
+            return set()  # solo quedan protegidos los archivos recientes (STORAGE_MIN_AGE)
+        live = {}
+        for path, value in refs.items():
+            sessions = [sid for sid in _session_ids(value) if sid in active]
+            if sessions and Path(path).exists():
+                live[path] = sessions
+        if live != refs:
+            _save_refs(live)
+    return set(live)
+
+
+# --- Directorios gestionados ---
+
+def managed_dirs() -> list[dict]:
+    """Directorios con cuota: {"label", "path", "max_bytes", "max_age"}."""
+    dirs = [{
+        "label": "temp",
+        "path": TEMP_DIR,
+        "max_bytes": TEMP_DIR_MAX_BYTES,
+        "max_age": TEMP_DIR_MAX_AGE_DAYS * 86400,
+    }]
+    kinds = [(IMAGES_DIRNAME, "", IMAGES_DIR_MAX_BYTES, IMAGES_DIR_MAX_AGE_DAYS)]
+    if UPLOADS_DIR_MAX_BYTES or UPLOADS_DIR_MAX_AGE_DAYS:
+        kinds.append((UPLOADS_DIRNAME, " (archivos)", UPLOADS_DIR_MAX_BYTES, UPLOADS_DIR_MAX_AGE_DAYS))
+    roots = [("devbot", str(BASE_DIR))] + [(p["name"], p["path"]) for p in project_manager.list_projects()]
+    for label, root in roots:
+        for dirname, suffix, max_bytes, max_age_days in kinds:
+            directory = Path(root) / dirname
+            if directory.is_dir():
+                dirs.append({
+                    "label": label + suffix,
+                    "path": directory,
+                    "max_bytes": max_bytes,
+                    "max_age": max_age_days * 86400,
+                })
+    return dirs
+
+
+def _scan(directory: Path) -> list[tuple[Path, float, int]]:
+    """(ruta, último uso, bytes) de cada archivo. Último uso = max(atime, mtime)."""
+    files = []
+    for path in directory.rglob("*"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if path.is_file():
+            files.append((path, max(st.st_atime, st.st_mtime), st.st_size))
+    return files
+
+
+def usage(directory: Path) -> dict:
+    """Archivos, bytes y antigüedad del archivo usado hace más tiempo."""
+    files = _scan(directory) if directory.is_dir() else []
+    oldest = min((used for _, used, _ in files), default=None)
+    return {
+        "files": len(files),
+        "bytes": sum(size for _, _, size in files),
+        "oldest_age": time.time() - oldest if oldest else None,
+    }
+
+
+def enforce_quota(directory: Path, max_bytes: int, max_age: float, protected: set[str]) -> dict:
+    """Borra archivos caducados y luego los de uso más antiguo hasta cumplir max_bytes."""
+    now = time.time()
+    files = sorted(_scan(directory), key=lambda f: f[1])
+    total = sum(size for _, _, size in files)
+    freed = {"files": 0, "bytes": 0, "kept_protected": 0}
+
+    for path, used, size in files:
+        expired = max_age and now - used > max_age
+        over_quota = max_bytes and total > max_bytes
+        if not expired and not over_quota:
+            break
+        if now - used < STORAGE_MIN_AGE:
+            break  # el resto es todavía más reciente
+        if str(path.resolve()) in protected:
+            freed["kept_protected"] += 1
+            continue
+        try:
+            path.unlink()
+        except OSError as e:
+            logger.warning(f"No se pudo borrar {path}: {e}")
+            continue
+        total -= size
+        freed["files"] += 1
+        freed["bytes"] += size
+
+    # Quitar subdirectorios que hayan quedado vacíos
+    for sub in sorted((p for p in directory.rglob("*") if p.is_dir()), reverse=True):
+        try:
+            sub.rmdir()
+        except OSError:
+            pass
+    return freed
+
+
+def run_janitor() -> list[dict]:
+    """Aplica las cuotas a todos los directorios gestionados. Bloqueante."""
+    protected = _protected_paths()
+    report = []
+    for d in managed_dirs():
+        freed = enforce_quota(d["path"], d["max_bytes"], d["max_age"], protected)
+        if freed["files"]:
+            logger.info(f"Limpieza {d['label']}: {freed['files']} archivos, {freed['bytes'] / 1024 / 1024:.1f} MB")
+        report.append({"label": d["label"], **freed})
+    return report
+
+
+async def janitor_loop() -> None:
+    """Ejecuta la limpieza periódicamente en segundo plano."""
+    while True:
+        try:
+            await asyncio.to_thread(run_janitor)
+        except Exception as e:
+            logger.error(f"Error en limpieza de almacenamiento: {e}")
+        await asyncio.sleep(STORAGE_JANITOR_INTERVAL)
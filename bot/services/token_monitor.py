@@ -0,0 +1,96 @@
+"""
+Vigilancia del pool de tokens (tarea del coordinador).
+
+  - Concesiones: cada _LEASE_INTERVAL renueva la de cada token en uso con el último heartbeat
+    de su worker (los alojados en el coordinador, mientras sigan registrados). Si una vence, el
+    worker lleva TOKEN_LEASE_TTL sin dar señales y nadie lo dio de baja: se detiene lo que
+    quede de él y el token vuelve al pool.
+  - Salud: cada TOKEN_VALIDATE_INTERVAL valida todos los tokens con getMe y actualiza su
+    puntuación. Avisa cuando Telegram rechaza uno (revocado en BotFather): deja de repartirse
+    y, si estaba en uso, su worker ya no recibe mensajes.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from bot.config import TOKEN_LEASE_TTL, TOKEN_VALIDATE_INTERVAL
+from bot.services import bot_api, heartbeat, token_pool, worker_registry
+
+logger = logging.getLogger(__name__)
+
+_LEASE_INTERVAL = 30.0
+
+
+def _renew_leases() -> None:
+    renewals = {}
+    for worker in worker_registry.list_active_workers():
+        token_id = worker["token_id"]
+        if worker.get("mode") == "inprocess":
+            renewals[token_id] = time.time()  # vive en este proceso
+            continue
+        beat = heartbeat.read_heartbeat(token_id)
+        if beat and beat.get("pid") == worker.get("pid"):
+            renewals[token_id] = beat["ts"]
+    token_pool.renew_leases(renewals)
+
+
+async def _reclaim_expired(notify: Callable[[str], Awaitable]) -> None:
+    for token in token_pool.expired_leases():
+        worker = worker_registry.kill_worker(token["id"], notify=False)
+        if worker is None:
+            token_pool.release_token(token["id"])  # reservado pero sin worker registrado
+        logger.warning(f"Concesion del token {token['id']} (@{token['bot_username']}) vencida, recuperado")
+        if worker:
+            await _notify(notify, (
+                f"♻️ Token recuperado: @{token['bot_username']} "
+                f"[{worker['project_name']} / {worker['role']}]\n"
+                f"Su worker no dio señales en {TOKEN_LEASE_TTL}s y se dio de baja."
+            ))
+
+
+async def _validate_tokens(notify: Callable[[str], Awaitable]) -> None:
+    """Valida todos los tokens del pool con getMe a la vez y anota el resultado."""
+    tokens = token_pool.list_tokens()
+    replies = await asyncio.gather(*(bot_api.call(t["bot_token"], "getMe", retries=1) for t in tokens))
+    for token, reply in zip(tokens, replies):
+        if not token_pool.record_check(token["id"], reply):
+            continue
+        logger.error(f"Token {token['id']} (@{token['bot_username']}) rechazado: {reply.get('description')}")
+        text = (
+            f"⛔ Telegram rechaza el token de @{token['bot_username']} ({reply.get('description')}).\n"
+            f"No se usara para nuevos workers; quitalo con /removetoken {token['id']}"
+        )
+        if token["status"] == "in_use":
+            text += (
+                f"\nSu worker [{token['assigned_project']} / {token['assigned_role']}] "
+                f"ya no recibe mensajes: /kill {token['bot_username']}"
+            )
+        await _notify(notify, text)
+
+
+async def _notify(notify: Callable[[str], Awaitable], text: str) -> None:
+    try:
+        await notify(text)
+    except Exception as e:
+        logger.warning(f"No se pudo enviar aviso del pool de tokens: {e}")
+
+
+async def monitor_tokens(notify: Callable[[str], Awaitable]) -> None:
+    """Bucle de vigilancia: renueva y recupera concesiones y valida los tokens periódicamente."""
+    logger.info(
+        f"Vigilancia de tokens iniciada (concesion {TOKEN_LEASE_TTL}s, "
+        f"validacion cada {TOKEN_VALIDATE_INTERVAL}s)"
+    )
+    next_validation = 0.0
+    while True:
+        try:
+            _renew_leases()
+            await _reclaim_expired(notify)
+            if TOKEN_VALIDATE_INTERVAL and time.monotonic() >= next_validation:
+                next_validation = time.monotonic() + TOKEN_VALIDATE_INTERVAL
+                await _validate_tokens(notify)
+        except Exception as e:
+            logger.error(f"Error en la vigilancia de tokens: {e}")
+        await asyncio.sleep(_LEASE_INTERVAL)
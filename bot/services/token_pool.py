@@ -1,14 +1,27 @@
-"""Gestión del pool de tokens de Telegram para worker bots."""
+"""
+Gestión del pool de tokens de Telegram para worker bots.
+
+Concesiones: un token reservado tiene una concesión ("lease_until") de TOKEN_LEASE_TTL segundos
+que token_monitor renueva con los heartbeats de su worker; si vence, recupera el token.
+
+Salud: cada token lleva una puntuación de 0 a 1 (media móvil de sus validaciones con getMe).
+Un token que Telegram rechaza (revocado o borrado en BotFather) queda marcado como revocado y
+no se reparte; entre los demás se reparten primero los de mejor puntuación.
+"""
 
 import json
 import logging
 import os
-import urllib.request
+import time
 
-from bot.config import TOKEN_POOL_FILE
+from bot.config import TOKEN_LEASE_TTL, TOKEN_POOL_FILE, TOKEN_VALIDATE_INTERVAL
 
 logger = logging.getLogger(__name__)
 
+_HEALTH_ALPHA = 0.5  # peso de la última validación en la puntuación
+_UNCHECKED_SCORE = 0.5  # sin validar aún: detrás de los que se sabe que funcionan
+_REVOKED_CODES = (401, 404)  # respuestas de getMe con un token revocado o inexistente
+
 _cache: dict | None = None
 
 
@@ -37,23 +50,76 @@ def list_tokens() -> list[dict]:
     return _load_pool().get("tokens", [])
 
 
+def health_score(token: dict) -> float:
+    """Puntuación de salud del token (0 si está revocado)."""
+    health = token.get("health") or {}
+    if health.get("revoked"):
+        return 0.0
+    return health.get("score", _UNCHECKED_SCORE)
+
+
+def is_revoked(token: dict) -> bool:
+    return bool((token.get("health") or {}).get("revoked"))
+
+
 def get_available_tokens() -> list[dict]:
-    """Retorna los tokens disponibles (no en uso)."""
-    return [t for t in list_tokens() if t.get("status") == "available"]
+    """Retorna los tokens disponibles (no en uso ni revocados)."""
+    return [t for t in list_tokens() if t.get("status") == "available" and not is_revoked(t)]
 
 
-def acquire_token(project: str, role: str, pid: int) -> dict | None:
-    """Reserva un token libre para un worker. Retorna el token o None."""
+def acquire_token(project: str, role: str, pid: int, prefer: str | None = None) -> dict | None:
+    """
+    Reserva un token libre para un worker, el más sano primero. Retorna el token o None.
+    prefer: token_id a usar si está libre (el bot que tenía un worker aparcado).
+    """
     pool = _load_pool()
-    for token in pool["tokens"]:
-        if token["status"] == "available":
-            token["status"] = "in_use"
-            token["assigned_project"] = project
-            token["assigned_role"] = role
-            token["pid"] = pid
-            _save_pool(pool)
+    candidates = sorted(
+        (t for t in pool["tokens"] if t["status"] == "available" and not is_revoked(t)),
+        key=lambda t: (t["id"] != prefer, -health_score(t)),
+    )
+    if not candidates:
+        return None
+    token = candidates[0]
+    token["status"] = "in_use"
+    token["assigned_project"] = project
+    token["assigned_role"] = role
+    token["pid"] = pid
+    token["lease_until"] = time.time() + TOKEN_LEASE_TTL
+    _save_pool(pool)
+    return token
+
+
+async def acquire_checked_token(project: str, role: str, prefer: str | None = None) -> dict | None:
+    """
+    Como acquire_token, pero si el token no se ha validado en TOKEN_VALIDATE_INTERVAL lo
+    comprueba antes con getMe: uno revocado se marca y se prueba con el siguiente.
+    """
+    from bot.services import bot_api
+    while True:
+        token = acquire_token(project, role, pid=0, prefer=prefer)
+        if token is None or not _check_is_stale(token):
             return token
-    return None
+        reply = await bot_api.call(token["bot_token"], "getMe", retries=1)
+        record_check(token["id"], reply)
+        if not is_revoked(token):
+            return token
+        logger.warning(f"Token {token['id']} (@{token['bot_username']}) revocado, se prueba otro")
+        release_token(token["id"])
+
+
+def _check_is_stale(token: dict) -> bool:
+    if not TOKEN_VALIDATE_INTERVAL:
+        return False
+    checked_at = (token.get("health") or {}).get("checked_at") or 0
+    return time.time() - checked_at > TOKEN_VALIDATE_INTERVAL
+
+
+def _free(token: dict) -> None:
+    token["status"] = "available"
+    token["assigned_project"] = None
+    token["assigned_role"] = None
+    token["pid"] = None
+    token["lease_until"] = None
 
 
 def release_token(token_id: str) -> bool:
@@ -61,25 +127,89 @@ def release_token(token_id: str) -> bool:
     pool = _load_pool()
     for token in pool["tokens"]:
         if token["id"] == token_id:
-            token["status"] = "available"
-            token["assigned_project"] = None
-            token["assigned_role"] = None
-            token["pid"] = None
+            _free(token)
             _save_pool(pool)
             return True
     return False
 
 
 def update_pid(token_id: str, pid: int) -> None:
-    """Actualiza el PID asociado a un token."""
+    """Actualiza el PID asociado a un token (proceso nuevo: concesión nueva)."""
     pool = _load_pool()
     for token in pool["tokens"]:
         if token["id"] == token_id:
             token["pid"] = pid
+            token["lease_until"] = time.time() + TOKEN_LEASE_TTL
             _save_pool(pool)
             return
 
 
+# --- Concesiones ---
+
+def renew_leases(renewals: dict[str, float]) -> None:
+    """
+    Renueva las concesiones de los tokens en uso: renewals es token_id → instante de la última
+    señal de vida de su worker. Los tokens en uso sin concesión (pool de una versión anterior)
+    reciben una nueva.
+    """
+    pool = _load_pool()
+    now = time.time()
+    changed = False
+    for token in pool["tokens"]:
+        if token["status"] != "in_use":
+            continue
+        lease = token.get("lease_until") or 0
+        if not lease:
+            lease = now + TOKEN_LEASE_TTL
+        if token["id"] in renewals:
+            lease = max(lease, renewals[token["id"]] + TOKEN_LEASE_TTL)
+        if lease != token.get("lease_until"):
+            token["lease_until"] = lease
+            changed = True
+    if changed:
+        _save_pool(pool)
+
+
+def expired_leases() -> list[dict]:
+    """Tokens en uso cuya concesión ha vencido."""
+    now = time.time()
+    return [
+        t for t in list_tokens()
+        if t["status"] == "in_use" and t.get("lease_until") and t["lease_until"] < now
+    ]
+
+
+# --- Salud ---
+
+def record_check(token_id: str, reply: dict | None) -> bool:
+    """
+    Anota una validación con getMe (reply: respuesta de la Bot API, None si no la hubo).
+    Retorna True si el token acaba de quedar revocado.
+    """
+    pool = _load_pool()
+    token = next((t for t in pool["tokens"] if t["id"] == token_id), None)
+    if token is None:
+        return False
+    health = token.setdefault("health", {})
+    was_revoked = health.get("revoked", False)
+    ok = bool(reply and reply.get("ok"))
+    score = health.get("score", _UNCHECKED_SCORE)
+    health["score"] = round((1 - _HEALTH_ALPHA) * score + _HEALTH_ALPHA * ok, 3)
+    health["checked_at"] = time.time()
+    if ok:
+        health.update(revoked=False, error=None, failures=0)
+        if reply["result"].get("username"):
+            token["bot_username"] = reply["result"]["username"]
+    else:
+        health["failures"] = health.get("failures", 0) + 1
+        health["error"] = (reply or {}).get("description", "sin respuesta de Telegram")
+        if reply:
+            # Sin respuesta no se sabe nada del token: conserva lo que hubiera
+            health["revoked"] = reply.get("error_code") in _REVOKED_CODES
+    _save_pool(pool)
+    return bool(health.get("revoked")) and not was_revoked
+
+
 def _is_pid_alive(pid: int) -> bool:
     """Comprueba si un proceso sigue vivo."""
     if not pid or pid <= 0:
@@ -98,26 +228,20 @@ def release_stale_tokens() -> list[str]:
     for token in pool["tokens"]:
         if token["status"] == "in_use" and not _is_pid_alive(token.get("pid", 0)):
             logger.warning(f"Token {token['id']} huerfano (PID {token.get('pid')} muerto), liberando")
-            token["status"] = "available"
-            token["assigned_project"] = None
-            token["assigned_role"] = None
-            token["pid"] = None
+            _free(token)
             released.append(token["id"])
     if released:
         _save_pool(pool)
     return released
 
 
-def validate_token(bot_token: str) -> dict | None:
+async def validate_token(bot_token: str) -> dict | None:
     """Valida un token contra la API de Telegram. Retorna info del bot o None."""
-    try:
-        url = f"https://api.telegram.org/bot{bot_token}/getMe"
-        response = urllib.request.urlopen(url, timeout=10)
-        data = json.loads(response.read())
-        if data.get("ok"):
-            return data["result"]
-    except Exception as e:
-        logger.warning(f"Token inválido: {e}")
+    from bot.services import bot_api
+    data = await bot_api.call(bot_token, "getMe")
+    if data and data.get("ok"):
+        return data["result"]
+    logger.warning(f"Token inválido: {(data or {}).get('description', 'sin respuesta de Telegram')}")
     return None
 
 
@@ -140,6 +264,9 @@ def add_token(bot_token: str, bot_username: str) -> dict:
         "assigned_project": None,
         "assigned_role": None,
         "pid": None,
+        "lease_until": None,
+        # Recién validado con getMe en /addtoken
+        "health": {"score": 1.0, "checked_at": time.time(), "revoked": False, "error": None, "failures": 0},
     }
     pool["tokens"].append(entry)
     _save_pool(pool)
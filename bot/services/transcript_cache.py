@@ -0,0 +1,149 @@
+"""
+Caché persistente de transcripciones por file_unique_id de Telegram, con expulsión LRU.
+
+El archivo lo comparten el coordinador y los workers: se escribe de forma atómica y bajo
+bloqueo (json_file). Las consultas no lo reescriben: aciertos, fallos y último uso se acumulan
+en memoria y se vuelcan con el siguiente put() o, como mucho, cada _FLUSH_INTERVAL.
+get() y put() bloquean (flock y E/S del archivo): desde el event loop, con asyncio.to_thread.
+"""
+
+import logging
+import threading
+import time
+
+from bot.config import (
+    TRANSCRIPT_CACHE_FILE,
+    TRANSCRIPT_CACHE_MAX_BYTES,
+    TRANSCRIPT_CACHE_MAX_ENTRIES,
+    WHISPER_MODEL,
+    WHISPER_LANGUAGE,
+)
+from bot.services import json_file
+
+logger = logging.getLogger(__name__)
+
+_FLUSH_INTERVAL = 60.0
+
+_cache: dict | None = None
+_cache_mtime: float | None = None
+# Uso pendiente de volcar: {"hits", "misses", "touched": {clave: {"last_used", "hits"}}}
+_pending: dict = {"hits": 0, "misses": 0, "touched": {}}
+_pending_lock = threading.Lock()  # get() corre en hilos del pool de asyncio
+_flushed_at = time.monotonic()
+
+
+def _mtime() -> float | None:
+    try:
+        return TRANSCRIPT_CACHE_FILE.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _load_cache(fresh: bool = False) -> dict:
+    """Carga la caché; la relee si otro proceso (coordinador o worker) la ha modificado."""
+    global _cache, _cache_mtime
+    mtime = _mtime()
+    if _cache is not None and mtime == _cache_mtime and not fresh:
+        return _cache
+    cache = json_file.read(TRANSCRIPT_CACHE_FILE) if mtime is not None else None
+    if cache is None:
+        if mtime is not None:
+            logger.warning("transcript_cache.json corrupto, reiniciando")
+        cache = {"entries": {}, "hits": 0, "misses": 0}
+    _cache, _cache_mtime = cache, mtime
+    return _cache
+
+
+def _save_cache(cache: dict) -> None:
+    global _cache, _cache_mtime
+    json_file.write_atomic(TRANSCRIPT_CACHE_FILE, cache)
+    _cache, _cache_mtime = cache, _mtime()
+
+
+def _apply_pending(cache: dict) -> None:
+    global _pending, _flushed_at
+    with _pending_lock:
+        pending, _pending = _pending, {"hits": 0, "misses": 0, "touched": {}}
+        _flushed_at = time.monotonic()
+    cache["hits"] = cache.get("hits", 0) + pending["hits"]
+    cache["misses"] = cache.get("misses", 0) + pending["misses"]
+    for key, usage in pending["touched"].items():
+        entry = cache["entries"].get(key)
+        if entry:
+            entry["last_used"] = max(entry["last_used"], usage["last_used"])
+            entry["hits"] = entry.get("hits", 0) + usage["hits"]
+
+
+def _update(change=None) -> None:
+    """Leer-modificar-escribir bajo bloqueo, con el uso pendiente incluido."""
+    with json_file.locked(TRANSCRIPT_CACHE_FILE):
+        cache = _load_cache(fresh=True)  # el mtime puede no distinguir dos escrituras seguidas
+        _apply_pending(cache)
+        if change:
+            change(cache)
+        _evict(cache)
+        _save_cache(cache)
+
+
+def _key(file_unique_id: str) -> str:
+    # El mismo audio con otro modelo o idioma da otra transcripción
+    return f"{file_unique_id}|{WHISPER_MODEL}|{WHISPER_LANGUAGE}"
+
+
+def _evict(cache: dict) -> None:
+    """Expulsa las entradas usadas hace más tiempo hasta cumplir los límites."""
+    entries = cache["entries"]
+    total = sum(e["size"] for e in entries.values())
+    for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+        if len(entries) <= TRANSCRIPT_CACHE_MAX_ENTRIES and total <= TRANSCRIPT_CACHE_MAX_BYTES:
+            break
+        total -= entries.pop(key)["size"]
+
+
+def get(file_unique_id: str) -> str | None:
+    """Retorna la transcripción cacheada o None. Cuenta aciertos y fallos (en memoria)."""
+    key = _key(file_unique_id)
+    entry = _load_cache()["entries"].get(key)
+    with _pending_lock:
+        if entry:
+            _pending["hits"] += 1
+            usage = _pending["touched"].setdefault(key, {"last_used": 0.0, "hits": 0})
+            usage["last_used"] = time.time()
+            usage["hits"] += 1
+        else:
+            _pending["misses"] += 1
+        flush = time.monotonic() - _flushed_at > _FLUSH_INTERVAL
+    if flush:
+        try:
+            _update()
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el uso de la cache de transcripciones: {e}")
+    return entry["text"] if entry else None
+
+
+def put(file_unique_id: str, text: str) -> None:
+    """Guarda una transcripción y aplica la expulsión LRU."""
+    now = time.time()
+
+    def _add(cache: dict) -> None:
+        cache["entries"][_key(file_unique_id)] = {
+            "text": text,
+            "size": len(text.encode("utf-8")),
+            "created": now,
+            "last_used": now,
+            "hits": 0,
+        }
+
+    _update(_add)
+
+
+def stats() -> dict:
+    """Entradas, bytes ocupados, aciertos y fallos de la caché (con el uso aún sin volcar)."""
+    cache = _load_cache()
+    entries = cache["entries"]
+    return {
+        "entries": len(entries),
+        "bytes": sum(e["size"] for e in entries.values()),
+        "hits": cache.get("hits", 0) + _pending["hits"],
+        "misses": cache.get("misses", 0) + _pending["misses"],
+    }
@@ -0,0 +1,70 @@
+"""
+Vídeos y notas de vídeo: inspección del contenedor y extracción de fotogramas clave con
+PyAV (ya instalado con faster-whisper), todo en CPU y desde memoria. El audio no se extrae
+aquí: decode_audio de faster-whisper demuxa la pista de audio directamente del contenedor.
+"""
+
+import io
+import logging
+from pathlib import Path
+
+import av
+
+logger = logging.getLogger(__name__)
+
+
+def probe(data: io.BytesIO) -> dict:
+    """Duración (s) y pistas presentes. Deja el buffer al principio. Bloqueante."""
+    data.seek(0)
+    try:
+        with av.open(data) as container:
+            duration = container.duration / av.time_base if container.duration else 0.0
+            return {
+                "duration": duration,
+                "has_audio": bool(container.streams.audio),
+                "has_video": bool(container.streams.video),
+            }
+    finally:
+        data.seek(0)
+
+
+def extract_keyframes(data: io.BytesIO, count: int, dest_dir: Path, prefix: str) -> list[Path]:
+    """
+    Guarda hasta `count` fotogramas clave repartidos por el vídeo como JPEG en dest_dir.
+    Solo se decodifican fotogramas clave (sin decodificar el vídeo entero). Requiere Pillow;
+    sin él retorna []. Deja el buffer al principio. Bloqueante.
+    """
+    try:
+        import PIL  # noqa: F401  (frame.to_image lo necesita)
+    except ImportError:
+        logger.info("Pillow no disponible, no se extraen fotogramas")
+        return []
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    frames: list[Path] = []
+    data.seek(0)
+    try:
+        with av.open(data) as container:
+            if not container.streams.video or count <= 0:
+                return []
+            stream = container.streams.video[0]
+            stream.codec_context.skip_frame = "NONKEY"
+            duration = container.duration / av.time_base if container.duration else 0.0
+
+            seen_pts = set()
+            for i in range(count):
+                # Centro de cada tramo: evita el primer fotograma (a menudo negro)
+                target = duration * (i + 0.5) / count
+                container.seek(int(target * av.time_base), backward=True, any_frame=False)
+                frame = next(container.decode(stream), None)
+                if frame is None or frame.pts in seen_pts:
+                    continue
+                seen_pts.add(frame.pts)
+                path = dest_dir / f"{prefix}_frame{i + 1}.jpg"
+                frame.to_image().save(path, format="JPEG", quality=90)
+                frames.append(path)
+    except (av.error.FFmpegError, OSError, ValueError) as e:
+        logger.warning(f"No se pudieron extraer fotogramas: {e}")
+    finally:
+        data.seek(0)
+    return frames
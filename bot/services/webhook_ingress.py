@@ -0,0 +1,284 @@
+"""
+Entrada por webhook (WEBHOOK_URL): un único servidor HTTP local recibe las actualizaciones del
+coordinador y de todos los workers, en vez de una conexión de long polling por bot.
+
+Cada token tiene su ruta secreta (/tg/<hmac del token>) y su cabecera secreta
+(X-Telegram-Bot-Api-Secret-Token), derivadas de una clave guardada en data/: son estables
+entre reinicios y no revelan el token. La ruta lleva la actualización a su destino:
+  - coordinador y workers alojados: la update_queue de su Application;
+  - workers en proceso propio: su canal de control (worker_control.send_update).
+Si el destino no puede recibirla (worker reiniciándose o drenando) se responde 503 y Telegram
+la reintenta más tarde.
+
+El servidor es HTTP/1.1 mínimo con keep-alive sobre asyncio (sin dependencias): delante debe
+haber un proxy o túnel HTTPS que publique WEBHOOK_URL. Si algo falla (no hay URL, el puerto
+está ocupado, setWebhook da error) cada bot vuelve a long polling.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import signal
+from collections.abc import Awaitable, Callable
+
+from bot.config import (
+    WEBHOOK_LISTEN,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET_FILE,
+    WEBHOOK_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[dict], Awaitable[bool]]
+
+_MAX_BODY = 1024 * 1024  # las actualizaciones son JSON pequeños (los archivos van por file_id)
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+            503: "Service Unavailable"}
+
+_server: asyncio.AbstractServer | None = None
+_key: bytes | None = None
+# ruta → {"token_id", "secret", "deliver"}
+_routes: dict[str, dict] = {}
+_writers: set[asyncio.StreamWriter] = set()  # conexiones keep-alive abiertas
+_stats = {"connections_open": 0, "connections_total": 0, "updates": 0, "rejected": 0}
+
+
+def webhook_enabled() -> bool:
+    return bool(WEBHOOK_URL)
+
+
+def is_serving() -> bool:
+    return _server is not None
+
+
+def stats() -> dict:
+    return {**_stats, "routes": len(_routes)}
+
+
+# --- Secretos por token ---
+
+def _secret_key() -> bytes:
+    global _key
+    if _key is None:
+        if WEBHOOK_SECRET_FILE.exists():
+            _key = bytes.fromhex(WEBHOOK_SECRET_FILE.read_text(encoding="utf-8").strip())
+        else:
+            _key = secrets.token_bytes(32)
+            WEBHOOK_SECRET_FILE.write_text(_key.hex(), encoding="utf-8")
+    return _key
+
+
+def _derive(bot_token: str, purpose: str) -> str:
+    return hmac.new(_secret_key(), f"{purpose}:{bot_token}".encode(), hashlib.sha256).hexdigest()[:40]
+
+
+def route_path(bot_token: str) -> str:
+    """Ruta local del token en el servidor (/tg/...)."""
+    return f"/tg/{_derive(bot_token, 'path')}"
+
+
+def endpoint(bot_token: str) -> tuple[str, str]:
+    """(URL pública del webhook, valor de la cabecera secreta) para el token."""
+    return WEBHOOK_URL.rstrip("/") + route_path(bot_token), _derive(bot_token, "header")
+
+
+# --- Rutas ---
+
+def register(token_id: str, bot_token: str, deliver: Deliver) -> None:
+    _routes[route_path(bot_token)] = {"token_id": token_id, "secret": _derive(bot_token, "header"), "deliver": deliver}
+
+
+def unregister(token_id: str) -> None:
+    for path, route in list(_routes.items()):
+        if route["token_id"] == token_id:
+            del _routes[path]
+
+
+def queue_delivery(app) -> Deliver:
+    """Entrega en la update_queue de una Application de este proceso (rechaza si drena)."""
+    from telegram import Update
+
+    async def _deliver(data: dict) -> bool:
+        if app.bot_data.get("draining"):
+            return False
+        await app.update_queue.put(Update.de_json(data, app.bot))
+        return True
+
+    return _deliver
+
+
+async def set_webhook(bot, url: str, secret: str, drop_pending: bool = True) -> bool:
+    """
+    Registra el webhook del bot en Telegram. False si falla (el bot debe usar polling).
+    drop_pending=False al relanzar un worker (reinicio o reload): las actualizaciones que
+    Telegram reintenta tras el 503 del coordinador se entregan en vez de descartarse.
+    """
+    from telegram import Update
+    try:
+        return bool(await bot.set_webhook(
+            url=url,
+            secret_token=secret,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=drop_pending,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        ))
+    except Exception as e:
+        logger.warning(f"setWebhook fallido: {e}")
+        return False
+
+
+# --- Servidor HTTP ---
+
+async def _dispatch(method: str, path: str, headers: dict, body: bytes) -> int:
+    route = _routes.get(path)
+    if not route:
+        return 404
+    if method != "POST":
+        return 405
+    if not hmac.compare_digest(headers.get("x-telegram-bot-api-secret-token", ""), route["secret"]):
+        return 403
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError:
+        return 400
+    try:
+        delivered = await route["deliver"](data)
+    except Exception as e:
+        logger.error(f"Error entregando actualizacion a {route['token_id']}: {e}")
+        return 500
+    if not delivered:
+        _stats["rejected"] += 1
+        return 503
+    _stats["updates"] += 1
+    return 200
+
+
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    _stats["connections_open"] += 1
+    _stats["connections_total"] += 1
+    _writers.add(writer)
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _version = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", "0"))
+            if length > _MAX_BODY:
+                status = 413
+                keep_alive = False
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status = await _dispatch(method, path.split("?", 1)[0], headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                f"Content-Length: 0\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        _stats["connections_open"] -= 1
+        _writers.discard(writer)
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+
+async def start_server(host: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT) -> bool:
+    """Abre el servidor local. False si no se pudo (puerto ocupado...)."""
+    global _server
+    if _server is not None:
+        return True
+    try:
+        _server = await asyncio.start_server(_handle_connection, host, port)
+    except OSError as e:
+        logger.warning(f"No se pudo abrir el servidor de webhooks en {host}:{port}: {e}")
+        return False
+    logger.info(f"Webhooks escuchando en {host}:{port} ({WEBHOOK_URL or 'sin URL publica'})")
+    return True
+
+
+async def stop_server() -> None:
+    global _server
+    if _server is not None:
+        _server.close()
+        # wait_closed espera a las conexiones: las keep-alive ociosas se cierran aquí
+        for writer in list(_writers):
+            writer.close()
+        await _server.wait_closed()
+        _server = None
+    _routes.clear()
+
+
+# --- Ciclo de vida de una Application por webhook ---
+
+def run_application(app, setup_webhook: Callable[[], Awaitable[bool]], drop_pending: bool = True) -> None:
+    """
+    Como app.run_polling (mismas fases: post_init, start, hasta stop_running o señal, stop,
+    post_stop, shutdown, post_shutdown), pero recibiendo por webhook. setup_webhook() se llama
+    tras post_init; si retorna False el bot hace long polling como siempre (drop_pending se
+    aplica a ese polling).
+    """
+    from telegram import Update
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async def _start() -> None:
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        if await setup_webhook():
+            app.bot_data["webhook"] = True
+        else:
+            logger.warning("Webhook no disponible, usando long polling")
+            await app.updater.start_polling(drop_pending_updates=drop_pending, allowed_updates=Update.ALL_TYPES)
+        await app.start()
+
+    async def _stop() -> None:
+        if app.updater and app.updater.running:
+            await app.updater.stop()
+        if app.running:
+            await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        await stop_server()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, loop.stop)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: KeyboardInterrupt
+
+    try:
+        loop.run_until_complete(_start())
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        loop.run_until_complete(_stop())
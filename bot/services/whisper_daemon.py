@@ -0,0 +1,310 @@
+"""
+Servicio de transcripción compartido: un único modelo Whisper (con N réplicas)
+para el coordinador y todos los workers, accesible por socket Unix.
+
+Protocolo (JSON por línea):
+  cliente → {"cmd": "transcribe", "path": ..., "owner": ...}
+            o {"cmd": "transcribe", "size": n, "owner": ...} seguido de n bytes de audio
+  servidor → {"type": "queued", "ahead": n} | {"type": "segment", "start", "end", "text"}
+             | {"type": "progress", "fraction": f}
+             | {"type": "done", "stats": {...}} | {"type": "error", "error": ...}
+  cliente → {"cmd": "status"}  servidor → {"model": {...}, "queue": n, "replicas": n}
+Si el cliente cierra la conexión, su trabajo se cancela.
+Solo se aceptan rutas dentro de TEMP_DIR y audios en memoria de hasta _MAX_AUDIO_BYTES.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import BinaryIO
+
+from bot.config import (
+    BASE_DIR,
+    LOGS_DIR,
+    TEMP_DIR,
+    VIDEO_MAX_BYTES,
+    VOICE_MEMORY_MAX_BYTES,
+    WHISPER_DAEMON_SOCKET,
+    WHISPER_MAX_WORKERS,
+)
+from bot.services import local_ipc, whisper_service
+
+logger = logging.getLogger(__name__)
+
+_daemon_process: subprocess.Popen | None = None
+
+_READY_TIMEOUT = 30.0  # hasta que el servicio acepta conexiones (el modelo se carga después)
+_CONNECT_WAIT = 10.0  # espera de un cliente mientras el servicio arranca o se relanza
+_WATCH_INTERVAL = 5.0
+_connect_failed_at = 0.0
+# Lo más grande que un cliente manda en memoria: notas de voz y audio de vídeos
+_MAX_AUDIO_BYTES = max(VOICE_MEMORY_MAX_BYTES, VIDEO_MAX_BYTES)
+
+
+def _check_request(request: dict) -> str | None:
+    """Motivo para rechazar la petición, o None si es aceptable."""
+    if "size" in request:
+        try:
+            size = int(request["size"])
+        except (TypeError, ValueError):
+            return "tamaño invalido"
+        if not 0 <= size <= _MAX_AUDIO_BYTES:
+            return f"audio demasiado grande ({size} bytes, max {_MAX_AUDIO_BYTES})"
+        return None
+    try:
+        path = Path(request["path"]).resolve()
+    except (KeyError, TypeError, OSError):
+        return "falta la ruta del audio"
+    if not path.is_relative_to(TEMP_DIR.resolve()):
+        return "solo se transcriben archivos de la carpeta temporal del bot"
+    return None
+
+
+# --- Lado servidor ---
+
+async def _serve_transcription(
+    request: dict, audio: whisper_service.AudioSource, writer: asyncio.StreamWriter,
+) -> None:
+    stats: dict = {}
+
+    async def _on_queue(ahead: int):
+        await local_ipc.send_message(writer, {"type": "queued", "ahead": ahead})
+
+    async def _on_progress(fraction: float):
+        await local_ipc.send_message(writer, {"type": "progress", "fraction": fraction})
+
+    try:
+        async for segment in whisper_service.transcribe_stream(
+            audio,
+            on_queue=_on_queue,
+            stats=stats,
+            owner=str(request.get("owner", "?")),
+            on_progress=_on_progress if request.get("progress") else None,
+        ):
+            await local_ipc.send_message(writer, {"type": "segment", **segment})
+        await local_ipc.send_message(writer, {"type": "done", "stats": stats})
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Error transcribiendo {request.get('path', '<memoria>')}: {e}")
+        try:
+            await local_ipc.send_message(writer, {"type": "error", "error": str(e)})
+        except OSError:
+            pass
+
+
+async def _handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = await local_ipc.read_message(reader)
+        if not request:
+            return
+
+        if request.get("cmd") == "status":
+            await local_ipc.send_message(writer, {
+                "model": whisper_service.model_status(),
+                "queue": whisper_service.queue_length(),
+                "replicas": WHISPER_MAX_WORKERS,
+            })
+            return
+
+        if request.get("cmd") != "transcribe":
+            await local_ipc.send_message(writer, {"type": "error", "error": "comando desconocido"})
+            return
+
+        error = _check_request(request)
+        if error:
+            logger.warning(f"Peticion de {request.get('owner')} rechazada: {error}")
+            await local_ipc.send_message(writer, {"type": "error", "error": error})
+            return
+
+        if "size" in request:
+            audio = io.BytesIO(await reader.readexactly(int(request["size"])))
+        else:
+            audio = str(Path(request["path"]).resolve())
+
+        task = asyncio.create_task(_serve_transcription(request, audio, writer))
+        # El cliente no envía nada más: leer solo sirve para detectar que se ha ido
+        disconnected = asyncio.create_task(reader.read())
+        done, _ = await asyncio.wait({task, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+        if task not in done:
+            logger.info(f"Cliente {request.get('owner')} desconectado, cancelando transcripcion")
+            task.cancel()
+        else:
+            disconnected.cancel()
+        await asyncio.gather(task, disconnected, return_exceptions=True)
+    finally:
+        await local_ipc.close(writer)
+
+
+async def serve_forever(parent_pid: int | None = None) -> None:
+    """Carga el modelo y atiende peticiones hasta que muera el proceso padre."""
+    whisper_service.preload_model()
+    server = await local_ipc.serve(WHISPER_DAEMON_SOCKET, _handle_client)
+    async with server:
+        while parent_pid is None or os.getppid() == parent_pid:
+            await asyncio.sleep(5)
+    logger.info("Coordinador terminado, cerrando servicio de transcripcion")
+    WHISPER_DAEMON_SOCKET.unlink(missing_ok=True)
+
+
+# --- Lado cliente ---
+
+async def connect_client() -> tuple[asyncio.StreamReader, asyncio.StreamWriter] | None:
+    """
+    Conecta con el servicio. Si no responde, espera hasta _CONNECT_WAIT a que arranque (o lo
+    relance el coordinador) antes de rendirse; tras un fallo reciente no vuelve a esperar.
+    Retorna None si no está disponible.
+    """
+    global _connect_failed_at
+    deadline = time.monotonic() + (_CONNECT_WAIT if time.monotonic() - _connect_failed_at > 60 else 0)
+    while True:
+        try:
+            connection = await local_ipc.connect(WHISPER_DAEMON_SOCKET)
+            _connect_failed_at = 0.0
+            return connection
+        except (OSError, asyncio.TimeoutError):
+            if time.monotonic() >= deadline:
+                _connect_failed_at = time.monotonic()
+                return None
+            await asyncio.sleep(0.5)
+
+
+async def remote_stream(
+    connection: tuple[asyncio.StreamReader, asyncio.StreamWriter],
+    audio: str | Path | BinaryIO,
+    on_queue: whisper_service.QueueCallback = None,
+    stats: dict | None = None,
+    on_progress: whisper_service.ProgressCallback = None,
+) -> AsyncIterator[dict]:
+    """Pide una transcripción al servicio y entrega los segmentos según llegan."""
+    reader, writer = connection
+    try:
+        request = {"cmd": "transcribe", "owner": str(os.getpid()), "progress": on_progress is not None}
+        if isinstance(audio, (str, Path)):
+            request["path"] = str(Path(audio).resolve())
+            await local_ipc.send_message(writer, request)
+        else:
+            # Audio en memoria: viaja por el socket, nunca pasa por disco
+            data = audio.read()
+            request["size"] = len(data)
+            await local_ipc.send_message(writer, request)
+            writer.write(data)
+            await writer.drain()
+        while True:
+            message = await local_ipc.read_message(reader)
+            if message is None:
+                raise RuntimeError("El servicio de transcripcion cerro la conexion")
+            msg_type = message.get("type")
+            if msg_type == "queued":
+                if on_queue:
+                    try:
+                        await on_queue(message["ahead"])
+                    except Exception:
+                        pass
+            elif msg_type == "progress":
+                if on_progress:
+                    try:
+                        await on_progress(message["fraction"])
+                    except Exception:
+                        pass
+            elif msg_type == "segment":
+                yield {"start": message["start"], "end": message["end"], "text": message["text"]}
+            elif msg_type == "done":
+                if stats is not None:
+                    stats.update(message.get("stats", {}))
+                return
+            else:
+                raise RuntimeError(message.get("error", "respuesta desconocida"))
+    finally:
+        await local_ipc.close(writer)
+
+
+async def query_status() -> dict | None:
+    """Estado del modelo del servicio compartido, o None si no está en marcha."""
+    return await local_ipc.request(WHISPER_DAEMON_SOCKET, {"cmd": "status"})
+
+
+# --- Ciclo de vida (coordinador) ---
+
+def is_daemon_running() -> bool:
+    """Comprueba si hay un servicio escuchando en el socket."""
+    if not local_ipc.ipc_available() or not WHISPER_DAEMON_SOCKET.exists():
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(1)
+        sock.connect(str(WHISPER_DAEMON_SOCKET))
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def start_daemon() -> bool:
+    """
+    Lanza el servicio como subproceso del coordinador y espera a que acepte conexiones
+    (bloqueante, hasta _READY_TIMEOUT). Retorna True si queda disponible.
+    """
+    global _daemon_process
+    if not local_ipc.ipc_available():
+        return False
+    if is_daemon_running():
+        logger.info("Servicio de transcripcion ya en marcha, reutilizandolo")
+        return True
+
+    log_file = open(LOGS_DIR / "whisper_daemon.log", "ab")
+    _daemon_process = subprocess.Popen(
+        [sys.executable, "-m", "bot.whisper_main", "--parent-pid", str(os.getpid())],
+        cwd=str(BASE_DIR),
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+    log_file.close()
+    started = time.monotonic()
+    while not is_daemon_running():
+        if _daemon_process.poll() is not None or time.monotonic() - started > _READY_TIMEOUT:
+            logger.error(
+                f"El servicio de transcripcion no arranco (ver {LOGS_DIR / 'whisper_daemon.log'})"
+            )
+            stop_daemon()
+            return False
+        time.sleep(0.1)
+    logger.info(
+        f"Servicio de transcripcion listo en {time.monotonic() - started:.2f}s "
+        f"(PID {_daemon_process.pid}, el modelo se carga en segundo plano)"
+    )
+    return True
+
+
+async def watch_daemon() -> None:
+    """Relanza el servicio si se cae (tarea del coordinador), para que nadie cargue su propio modelo."""
+    while True:
+        await asyncio.sleep(_WATCH_INTERVAL)
+        process = _daemon_process
+        if process is None or process.poll() is None:
+            continue
+        logger.error(f"Servicio de transcripcion caido (codigo {process.returncode}), relanzando")
+        try:
+            await asyncio.to_thread(start_daemon)
+        except Exception as e:
+            logger.error(f"No se pudo relanzar el servicio de transcripcion: {e}")
+
+
+def stop_daemon() -> None:
+    """Detiene el servicio si lo lanzó este proceso."""
+    global _daemon_process
+    if _daemon_process and _daemon_process.poll() is None:
+        _daemon_process.terminate()
+        try:
+            _daemon_process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            _daemon_process.kill()
+    _daemon_process = None
@@ -1,31 +1,517 @@
+import asyncio
+import itertools
 import logging
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Coroutine
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, BinaryIO
 
-from bot.config import WHISPER_MODEL, WHISPER_LANGUAGE
+from bot.config import (
+    WHISPER_MODEL,
+    WHISPER_LANGUAGE,
+    WHISPER_MAX_WORKERS,
+    WHISPER_DAEMON,
+    WHISPER_DEVICE,
+    WHISPER_COMPUTE_TYPE,
+    WHISPER_CPU_THREADS,
+    WHISPER_NUM_WORKERS,
+    WHISPER_BEAM_SIZE,
+    WHISPER_VAD_MIN_SILENCE_MS,
+    WHISPER_VAD_THRESHOLD,
+    WHISPER_BATCH_SIZE,
+    WHISPER_BATCH_MIN_DURATION,
+    WHISPER_CHUNK_WORKERS,
+    WHISPER_CHUNK_SECONDS,
+    WHISPER_CHUNK_MIN_DURATION,
+)
+from bot.services import bot_scope
+from bot.services.local_ipc import ipc_available
 
 logger = logging.getLogger(__name__)
 
+_SAMPLE_RATE = 16000
+# Los tramos en paralelo solo aceleran con núcleos libres: más hilos que núcleos solo compiten
+_CHUNK_WORKERS = min(WHISPER_CHUNK_WORKERS, os.cpu_count() or 1)
+
 _model = None
+_pipeline = None
+_model_lock = threading.Lock()
+_model_status = {"state": "idle", "load_time": None, "warmup_time": None, "error": None}
+
+# Pool acotado para que la decodificación nunca bloquee el event loop
+_executor = ThreadPoolExecutor(max_workers=WHISPER_MAX_WORKERS, thread_name_prefix="whisper")
+
+# Cola de trabajos: _waiting en orden de llegada, _running los que decodifican,
+# _remote los que este proceso tiene delegados en el servicio compartido
+_waiting: list["TranscriptionJob"] = []
+_running: list["TranscriptionJob"] = []
+_remote: list["TranscriptionJob"] = []
+# Último momento en que se atendió a cada cliente (reparto equitativo entre procesos)
+_last_served: dict[str, float] = {}
+
+# Delegar en el servicio de transcripción compartido si está disponible.
+# El propio servicio lo desactiva para transcribir en su proceso.
+_use_daemon = WHISPER_DAEMON and ipc_available()
+
+# Audio a transcribir: ruta en disco o buffer en memoria (ej. BytesIO descargado de Telegram)
+AudioSource = str | Path | BinaryIO
+
+# Tipo para callbacks de posición en cola (recibe cuántos trabajos van por delante)
+QueueCallback = Callable[[int], Coroutine[Any, Any, None]] | None
+# Tipo para callbacks de progreso (fracción del audio transcrita, 0-1)
+ProgressCallback = Callable[[float], Coroutine[Any, Any, None]] | None
+
+
+class TranscriptionCancelled(Exception):
+    """La transcripción se canceló (por /stop o porque el handler se canceló)."""
+
+
+class TranscriptionJob:
+    """Trabajo de transcripción en cola, con sus métricas."""
+    def __init__(self, audio: AudioSource, owner: str = "local"):
+        self.audio_label = str(audio) if isinstance(audio, (str, Path)) else "<memoria>"
+        self.owner = owner
+        self.scope = bot_scope.key()  # bot que la pidió (varios bots alojados en un proceso)
+        self.task: asyncio.Task | None = asyncio.current_task()
+        self.cancelled = False
+        self.enqueued_at = time.monotonic()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.audio_duration = 0.0
+        self._wakeup = asyncio.Event()
+
+    @property
+    def queue_wait(self) -> float:
+        if self.started_at is None:
+            return time.monotonic() - self.enqueued_at
+        return self.started_at - self.enqueued_at
+
+    @property
+    def decode_time(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def stats(self) -> dict:
+        return {
+            "audio_duration": self.audio_duration,
+            "queue_wait": self.queue_wait,
+            "decode_time": self.decode_time,
+        }
 
 
 def _get_model():
     global _model
-    if _model is None:
-        from faster_whisper import WhisperModel
-        logger.info(f"Cargando modelo Whisper '{WHISPER_MODEL}'...")
-        _model = WhisperModel(WHISPER_MODEL, device="cpu", compute_type="int8")
-        logger.info("Modelo Whisper cargado")
+    if _model is not None:
+        return _model
+    with _model_lock:
+        if _model is None:
+            from faster_whisper import WhisperModel
+            logger.info(
+                f"Cargando modelo Whisper '{WHISPER_MODEL}' "
+                f"({WHISPER_DEVICE}, {WHISPER_COMPUTE_TYPE}, threads={WHISPER_CPU_THREADS or 'auto'})..."
+            )
+            _model_status["state"] = "loading"
+            start = time.monotonic()
+            try:
+                # num_workers permite decodificar en paralelo desde varios hilos con los mismos pesos
+                _model = WhisperModel(
+                    WHISPER_MODEL,
+                    device=WHISPER_DEVICE,
+                    compute_type=WHISPER_COMPUTE_TYPE,
+                    cpu_threads=WHISPER_CPU_THREADS,
+                    num_workers=WHISPER_NUM_WORKERS or max(WHISPER_MAX_WORKERS, _CHUNK_WORKERS),
+                )
+            except Exception as e:
+                _model_status["state"] = "error"
+                _model_status["error"] = str(e)
+                raise
+            _model_status["load_time"] = time.monotonic() - start
+            _model_status["state"] = "ready"
+            _model_status["error"] = None
+            logger.info(f"Modelo Whisper cargado en {_model_status['load_time']:.1f}s")
     return _model
 
 
-def transcribe(audio_path: str | Path) -> str:
-    """Transcribe un archivo de audio y retorna el texto."""
-    model = _get_model()
-    segments, info = model.transcribe(
-        str(audio_path),
+def _get_pipeline():
+    """Pipeline por lotes sobre el mismo modelo (comparte pesos, no recarga nada)."""
+    global _pipeline
+    if _pipeline is not None:
+        return _pipeline
+    model = _get_model()  # fuera del bloqueo: _get_model también lo toma
+    with _model_lock:
+        if _pipeline is None:
+            from faster_whisper import BatchedInferencePipeline
+            _pipeline = BatchedInferencePipeline(model=model)
+    return _pipeline
+
+
+def _decode_options() -> dict:
+    return {
+        "language": WHISPER_LANGUAGE,
+        "beam_size": WHISPER_BEAM_SIZE,
+        "vad_filter": True,
+        "vad_parameters": {
+            "min_silence_duration_ms": WHISPER_VAD_MIN_SILENCE_MS,
+            "threshold": WHISPER_VAD_THRESHOLD,
+        },
+    }
+
+
+def _warmup(model) -> None:
+    """Decodifica 1s de silencio para inicializar kernels y buffers antes del primer audio real."""
+    import numpy as np
+
+    start = time.monotonic()
+    segments, _ = model.transcribe(
+        np.zeros(_SAMPLE_RATE, dtype=np.float32),
         language=WHISPER_LANGUAGE,
-        vad_filter=True,
+        beam_size=1,
     )
-    text = " ".join(segment.text.strip() for segment in segments)
+    list(segments)
+    _model_status["warmup_time"] = time.monotonic() - start
+    logger.info(f"Warm-up de Whisper completado en {_model_status['warmup_time']:.2f}s")
+
+
+def _preload() -> None:
+    try:
+        _warmup(_get_model())
+    except Exception as e:
+        logger.warning(f"No se pudo precargar Whisper: {e}")
+
+
+def preload_model() -> None:
+    """Carga y calienta el modelo en un hilo de fondo (no bloquea el arranque)."""
+    if _model is not None or _model_status["state"] == "loading":
+        return
+    _model_status["state"] = "loading"
+    threading.Thread(target=_preload, name="whisper-preload", daemon=True).start()
+
+
+def model_status() -> dict:
+    """Estado del modelo: 'idle', 'loading', 'ready' o 'error', con tiempos de carga y warm-up."""
+    return dict(_model_status)
+
+
+def _split_at_silences(audio, max_chunk_seconds: float) -> list[tuple[int, int]]:
+    """
+    Divide el audio en tramos de como mucho max_chunk_seconds cortando en los silencios
+    que detecta el VAD. Retorna (inicio, fin) en muestras, cubriendo todo el audio.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    speech = get_speech_timestamps(audio, VadOptions(
+        min_silence_duration_ms=WHISPER_VAD_MIN_SILENCE_MS,
+        threshold=WHISPER_VAD_THRESHOLD,
+    ))
+    max_samples = int(max_chunk_seconds * _SAMPLE_RATE)
+
+    chunks = []
+    chunk_start = 0
+    for previous, current in zip(speech, speech[1:]):
+        # Cortar en mitad del silencio entre dos tramos de voz si el trozo ya es largo
+        if current["end"] - chunk_start > max_samples:
+            cut = (previous["end"] + current["start"]) // 2
+            if cut > chunk_start:
+                chunks.append((chunk_start, cut))
+                chunk_start = cut
+    chunks.append((chunk_start, len(audio)))
+    return chunks
+
+
+def _transcribe_chunked(
+    audio,
+    job: TranscriptionJob | None,
+    on_segment: Callable[[dict], None] | None,
+    on_progress: Callable[[float], None] | None,
+) -> list[str]:
+    """Transcribe los tramos en paralelo y entrega los segmentos en orden, con tiempos absolutos."""
+    chunks = _split_at_silences(audio, WHISPER_CHUNK_SECONDS)
+    total = len(audio)
+    logger.info(f"Audio largo: {len(chunks)} tramos en {_CHUNK_WORKERS} hilos")
+
+    def _run_chunk(bounds: tuple[int, int]) -> list[dict]:
+        start, end = bounds
+        offset = start / _SAMPLE_RATE
+        segments, _ = _get_model().transcribe(audio[start:end], **_decode_options())
+        result = []
+        for segment in segments:
+            if job and job.cancelled:
+                raise TranscriptionCancelled()
+            result.append({
+                "start": segment.start + offset,
+                "end": segment.end + offset,
+                "text": segment.text.strip(),
+            })
+        return result
+
+    parts = []
+    with ThreadPoolExecutor(max_workers=_CHUNK_WORKERS, thread_name_prefix="whisper-chunk") as pool:
+        futures = [pool.submit(_run_chunk, bounds) for bounds in chunks]
+        done_samples = 0
+        try:
+            # Se esperan en orden: los segmentos salen ordenados aunque los tramos acaben desordenados
+            for bounds, future in zip(chunks, futures):
+                for segment in future.result():
+                    parts.append(segment["text"])
+                    if on_segment:
+                        on_segment(segment)
+                done_samples += bounds[1] - bounds[0]
+                if on_progress:
+                    on_progress(done_samples / total)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return parts
+
+
+def _transcribe_sync(
+    audio: AudioSource,
+    job: TranscriptionJob | None = None,
+    on_segment: Callable[[dict], None] | None = None,
+    on_progress: Callable[[float], None] | None = None,
+) -> str:
+    """
+    Decodifica el audio en el hilo actual. Comprueba la cancelación entre segmentos.
+    on_segment: callback opcional (llamado desde este hilo) con cada segmento según se decodifica.
+    on_progress: callback opcional con la fracción de audio ya transcrita (0-1).
+    """
+    from faster_whisper import decode_audio
+
+    model = _get_model()
+    if isinstance(audio, (str, Path)):
+        audio = str(audio)
+    audio = decode_audio(audio, sampling_rate=_SAMPLE_RATE)
+    duration = len(audio) / _SAMPLE_RATE
+    if job:
+        job.audio_duration = duration
+
+    if _CHUNK_WORKERS > 1 and duration >= WHISPER_CHUNK_MIN_DURATION:
+        parts = _transcribe_chunked(audio, job, on_segment, on_progress)
+        text = " ".join(parts)
+        logger.info(f"Transcrito por tramos ({duration:.1f}s): {text[:100]}...")
+        return text
+
+    if WHISPER_BATCH_SIZE and duration >= WHISPER_BATCH_MIN_DURATION:
+        segments, info = _get_pipeline().transcribe(
+            audio, batch_size=WHISPER_BATCH_SIZE, **_decode_options(),
+        )
+    else:
+        segments, info = model.transcribe(audio, **_decode_options())
+
+    parts = []
+    for segment in segments:
+        if job and job.cancelled:
+            raise TranscriptionCancelled()
+        text = segment.text.strip()
+        parts.append(text)
+        if on_segment:
+            on_segment({"start": segment.start, "end": segment.end, "text": text})
+        if on_progress and duration:
+            on_progress(min(segment.end / duration, 1.0))
+    text = " ".join(parts)
     logger.info(f"Transcrito ({info.language}, {info.duration:.1f}s): {text[:100]}...")
     return text
+
+
+def transcribe(audio: AudioSource) -> str:
+    """Transcribe un archivo de audio (ruta o buffer) y retorna el texto (bloqueante)."""
+    return _transcribe_sync(audio)
+
+
+def uses_daemon() -> bool:
+    """True si este proceso delega las transcripciones en el servicio compartido."""
+    return _use_daemon
+
+
+def queue_length() -> int:
+    """Trabajos esperando o decodificando para este proceso (locales o delegados)."""
+    return len(_waiting) + len(_running) + len(_remote)
+
+
+def _wake_waiting() -> None:
+    for job in _waiting:
+        job._wakeup.set()
+
+
+def _service_order() -> list[TranscriptionJob]:
+    """
+    Orden en que se atenderán los trabajos en espera: round-robin entre clientes,
+    empezando por el que lleva más tiempo sin ser atendido. Dentro de un cliente, FIFO.
+    """
+    by_owner: dict[str, list[TranscriptionJob]] = {}
+    for job in _waiting:
+        by_owner.setdefault(job.owner, []).append(job)
+    owners = sorted(by_owner, key=lambda o: (_last_served.get(o, 0.0), by_owner[o][0].enqueued_at))
+    order = []
+    for round_jobs in itertools.zip_longest(*(by_owner[o] for o in owners)):
+        order.extend(job for job in round_jobs if job is not None)
+    return order
+
+
+async def _wait_turn(job: TranscriptionJob, on_queue: QueueCallback) -> None:
+    """Espera a que haya un hueco libre en el pool respetando el reparto entre clientes."""
+    last_reported = None
+    while True:
+        index = _service_order().index(job)
+        if index == 0 and len(_running) < WHISPER_MAX_WORKERS:
+            _waiting.remove(job)
+            _running.append(job)
+            _last_served[job.owner] = time.monotonic()
+            job.started_at = time.monotonic()
+            _wake_waiting()
+            return
+
+        ahead = index + len(_running)
+        if on_queue and ahead != last_reported:
+            last_reported = ahead
+            try:
+                await on_queue(ahead)
+            except Exception:
+                pass
+
+        job._wakeup.clear()
+        await job._wakeup.wait()
+
+
+def _release(job: TranscriptionJob) -> None:
+    if job in _running:
+        _running.remove(job)
+    job.finished_at = job.finished_at or time.monotonic()
+    _wake_waiting()
+
+
+async def transcribe_stream(
+    audio: AudioSource,
+    on_queue: QueueCallback = None,
+    stats: dict | None = None,
+    owner: str = "local",
+    on_progress: ProgressCallback = None,
+) -> AsyncIterator[dict]:
+    """
+    Transcribe sin bloquear el event loop y va entregando los segmentos según se decodifican.
+    Cada segmento es un dict con 'start', 'end' y 'text'.
+    audio: ruta en disco o buffer en memoria (se decodifica directamente, sin archivo temporal).
+    Usa el servicio compartido si está en marcha; si no, el pool de Whisper de este proceso.
+    on_queue: callback async opcional con el número de trabajos por delante.
+    stats: dict opcional que se rellena al terminar con 'audio_duration', 'queue_wait' y 'decode_time'.
+    owner: cliente al que pertenece el trabajo (para el reparto equitativo de la cola).
+    on_progress: callback async opcional con la fracción del audio ya transcrita.
+    """
+    if _use_daemon:
+        from bot.services import whisper_daemon
+
+        connection = await whisper_daemon.connect_client()
+        if connection:
+            job = TranscriptionJob(audio, owner)
+            _remote.append(job)
+            try:
+                async for segment in whisper_daemon.remote_stream(
+                    connection, audio, on_queue, stats, on_progress,
+                ):
+                    yield segment
+            finally:
+                _remote.remove(job)
+            return
+        logger.error(
+            "Servicio de transcripcion no disponible: se transcribe en este proceso "
+            "(carga un modelo Whisper propio)"
+        )
+
+    async for segment in _local_stream(audio, on_queue, stats, owner, on_progress):
+        yield segment
+
+
+async def _local_stream(
+    audio: AudioSource,
+    on_queue: QueueCallback,
+    stats: dict | None,
+    owner: str,
+    on_progress: ProgressCallback = None,
+) -> AsyncIterator[dict]:
+    """Transcribe en el pool de Whisper de este proceso."""
+    job = TranscriptionJob(audio, owner)
+    _waiting.append(job)
+    _wake_waiting()
+    try:
+        await _wait_turn(job, on_queue)
+    except asyncio.CancelledError:
+        if job in _waiting:
+            _waiting.remove(job)
+            _wake_waiting()
+        raise
+
+    loop = asyncio.get_running_loop()
+    # Eventos del hilo: ("segment", dict) o ("progress", float); None marca el final
+    events: asyncio.Queue = asyncio.Queue()
+
+    def _on_segment(segment: dict) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, ("segment", segment))
+
+    def _on_progress(fraction: float) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, ("progress", fraction))
+
+    future = _executor.submit(
+        _transcribe_sync, audio, job, _on_segment, _on_progress if on_progress else None,
+    )
+    # El hueco se libera cuando el hilo termina de verdad, no cuando se cancela la espera
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(_release, job))
+    # Marca de fin: se encola después de todos los segmentos emitidos por el hilo
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, None))
+
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            kind, value = event
+            if kind == "segment":
+                yield value
+            else:
+                try:
+                    await on_progress(value)
+                except Exception:
+                    pass
+        future.result()  # propaga errores del hilo
+    finally:
+        if not future.done():
+            job.cancelled = True
+        job.finished_at = time.monotonic()
+
+    job_stats = job.stats()
+    if stats is not None:
+        stats.update(job_stats)
+    logger.info(
+        f"Job Whisper: audio={job_stats['audio_duration']:.1f}s, "
+        f"cola={job_stats['queue_wait']:.2f}s, decodificacion={job_stats['decode_time']:.2f}s"
+    )
+
+
+async def transcribe_async(audio: AudioSource, on_queue: QueueCallback = None) -> dict:
+    """
+    Transcribe en el pool de Whisper sin bloquear el event loop.
+    Retorna dict con 'text', 'audio_duration', 'queue_wait' y 'decode_time'.
+    on_queue: callback async opcional con el número de trabajos por delante.
+    Lanza TranscriptionCancelled si se cancela con cancel_transcriptions().
+    """
+    stats: dict = {}
+    parts = [segment["text"] async for segment in transcribe_stream(audio, on_queue, stats)]
+    return {"text": " ".join(parts), **stats}
+
+
+def cancel_transcriptions() -> int:
+    """
+    Cancela las transcripciones en cola o en curso del bot del ámbito actual (las de otros bots
+    alojados en el mismo proceso siguen). Retorna cuántas había.
+    """
+    scope = bot_scope.key()
+    jobs = [job for job in _waiting + _running + _remote if job.scope == scope]
+    for job in jobs:
+        job.cancelled = True
+        if job.task and not job.task.done():
+            job.task.cancel()
+    return len(jobs)
@@ -0,0 +1,238 @@
+"""
+Canal de control coordinador ↔ worker sobre local_ipc: un socket por worker en IPC_DIR.
+
+El worker atiende:
+  - status: estado (libre / ocupado / drenando), duración de las ejecuciones en curso,
+    elementos en cola (Claude esperando turno + transcripciones), memoria (RSS y PSS) y CPU.
+  - stop-run: detiene las ejecuciones de Claude en curso (como /stop).
+  - drain: deja de recibir mensajes, espera a que terminen las ejecuciones y sale (código 0).
+  - park: igual que drain pero sin mensaje de apagado (lo aparca el autoescalado y avisa él).
+  - update: una actualización recibida por el webhook del coordinador, a la update_queue.
+    Se rechaza mientras drena (el coordinador responde 503 y Telegram la reintenta).
+  - reload: igual que drain pero sale con RELOAD_EXIT_CODE y el supervisor lo relanza al
+    instante (con la configuración actual; con el zygote, el código es el que cargó la plantilla).
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from bot.config import IPC_DIR
+from bot.services import local_ipc
+
+logger = logging.getLogger(__name__)
+
+# EX_TEMPFAIL: "reiníciame", no cuenta como caída para el supervisor
+RELOAD_EXIT_CODE = 75
+
+# Arranque del proceso: se reinicia en mark_started (un worker creado por el zygote importó
+# este módulo en la plantilla, mucho antes de existir)
+_started = time.monotonic()
+_state = "running"  # running | draining | reloading
+_exit_code = 0
+_notify_exit = True
+_cpu_sample: tuple[float, float] | None = None  # (monotonic, segundos de CPU)
+# ámbito (bot_scope.key()) → última actividad (monotonic): mensaje recibido o ejecución en curso
+_last_activity: dict[str | None, float] = {}
+# ámbito → arranque de su bot (la inactividad cuenta desde aquí mientras no haya actividad)
+_scope_started: dict[str | None, float] = {}
+
+
+def control_socket(token_id: str) -> Path:
+    return IPC_DIR / f"worker_{token_id}.sock"
+
+
+def exit_code() -> int:
+    """Código con el que debe salir el worker tras parar el polling."""
+    return _exit_code
+
+
+def notify_exit() -> bool:
+    """False si el worker se aparcó o lo apaga el coordinador: el aviso lo da él."""
+    from bot.config import SHUTDOWN_MARKER
+    return _notify_exit and not SHUTDOWN_MARKER.exists()
+
+
+def mark_started(process: bool = False) -> None:
+    """
+    Arranque del bot del ámbito actual (worker_main.run, hosted_workers.start_worker).
+    process=True: también el del proceso, para el uptime y la primera muestra de CPU.
+    """
+    global _started, _cpu_sample
+    from bot.services import bot_scope
+    now = time.monotonic()
+    _scope_started[bot_scope.key()] = now
+    _last_activity.pop(bot_scope.key(), None)
+    if process:
+        times = os.times()
+        _started = now
+        _cpu_sample = (now, times.user + times.system)
+
+
+def forget() -> None:
+    """Olvida la actividad del bot del ámbito actual (worker alojado detenido o aparcado)."""
+    from bot.services import bot_scope
+    _scope_started.pop(bot_scope.key(), None)
+    _last_activity.pop(bot_scope.key(), None)
+
+
+def mark_activity() -> None:
+    """Registra actividad del bot del ámbito actual (cada actualización recibida)."""
+    from bot.services import bot_scope
+    _last_activity[bot_scope.key()] = time.monotonic()
+
+
+def idle_seconds(busy: bool) -> float:
+    """Segundos sin actividad del bot del ámbito actual (0 si tiene trabajo en curso)."""
+    from bot.services import bot_scope
+    now = time.monotonic()
+    if busy:
+        _last_activity[bot_scope.key()] = now
+        return 0.0
+    key = bot_scope.key()
+    return now - _last_activity.get(key, _scope_started.get(key, _started))
+
+
+# --- Lado worker ---
+
+def _rss_bytes() -> int | None:
+    """Memoria residente actual (Linux: /proc; en otros sistemas, el pico si se conoce)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def _pss_bytes() -> int | None:
+    """
+    Memoria proporcional (PSS, solo Linux): las páginas compartidas con otros procesos (p. ej.
+    con el zygote por copy-on-write) cuentan repartidas, a diferencia del RSS.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _cpu_percent() -> float:
+    """CPU del proceso desde la consulta anterior (o desde el arranque)."""
+    global _cpu_sample
+    times = os.times()
+    now, cpu = time.monotonic(), times.user + times.system
+    last_at, last_cpu = _cpu_sample or (_started, 0.0)
+    _cpu_sample = (now, cpu)
+    elapsed = now - last_at
+    return 100.0 * (cpu - last_cpu) / elapsed if elapsed > 0 else 0.0
+
+
+def _status() -> dict:
+    from bot.services import claude_service, whisper_service
+    runs = claude_service.run_status()
+    queue = runs["waiting"] + whisper_service.queue_length()
+    if _state != "running":
+        state = "draining"
+    else:
+        state = "busy" if runs["running"] else "idle"
+    return {
+        "state": state,
+        "runs": [round(s, 1) for s in runs["running"]],
+        "queue": queue,
+        "idle": round(idle_seconds(bool(runs["running"] or queue))),
+        "rss": _rss_bytes(),
+        "pss": _pss_bytes(),
+        "cpu": round(_cpu_percent(), 1),
+        "uptime": round(time.monotonic() - _started),
+        "pid": os.getpid(),
+    }
+
+
+def _begin_drain(app, reload: bool, notify: bool = True) -> None:
+    global _state, _exit_code, _notify_exit
+    _state = "reloading" if reload else "draining"
+    _exit_code = RELOAD_EXIT_CODE if reload else 0
+    _notify_exit = notify
+    app.create_task(_drain(app))
+
+
+async def _drain(app) -> None:
+    """Para el polling, espera a que terminen las ejecuciones y detiene la aplicación."""
+    from bot.services import claude_service, whisper_service
+    logger.info(f"{_state.capitalize()}: sin nuevos mensajes, esperando ejecuciones en curso")
+    if app.updater and app.updater.running:
+        await app.updater.stop()
+    while claude_service.is_running() or whisper_service.queue_length():
+        await asyncio.sleep(1)
+    if app.bot_data.get("webhook") and _exit_code != RELOAD_EXIT_CODE:
+        # El token vuelve al pool: que Telegram deje de reintentar contra esta ruta
+        try:
+            await app.bot.delete_webhook()
+        except Exception as e:
+            logger.warning(f"No se pudo borrar el webhook: {e}")
+    app.stop_running()
+
+
+async def serve_control(token_id: str, app) -> asyncio.AbstractServer | None:
+    """Abre el socket de control del worker. None si no hay sockets Unix (Windows)."""
+    if not local_ipc.ipc_available():
+        return None
+
+    async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await local_ipc.read_message(reader)
+            if not request:
+                return
+            cmd = request.get("cmd")
+            if cmd == "status":
+                await local_ipc.send_message(writer, _status())
+            elif cmd == "update":
+                if _state != "running":
+                    await local_ipc.send_message(writer, {"error": "drenando"})
+                else:
+                    from telegram import Update
+                    await app.update_queue.put(Update.de_json(request["update"], app.bot))
+                    await local_ipc.send_message(writer, {"ok": True})
+            elif cmd == "stop-run":
+                from bot.services import claude_service
+                await local_ipc.send_message(writer, {"ok": True, "stopped": claude_service.stop_claude()})
+            elif cmd in ("drain", "reload", "park"):
+                if _state == "running":
+                    _begin_drain(app, reload=cmd == "reload", notify=cmd != "park")
+                await local_ipc.send_message(writer, {"ok": True, "state": _state})
+            else:
+                await local_ipc.send_message(writer, {"error": f"comando desconocido: {cmd}"})
+        finally:
+            await local_ipc.close(writer)
+
+    return await local_ipc.serve(control_socket(token_id), _handle)
+
+
+# --- Lado coordinador ---
+
+async def query_worker(token_id: str) -> dict | None:
+    """Estado en vivo del worker, o None si no responde."""
+    return await local_ipc.request(control_socket(token_id), {"cmd": "status"})
+
+
+async def send_update(token_id: str, update: dict) -> bool:
+    """Entrega una actualización del webhook al worker. False si no la aceptó."""
+    reply = await local_ipc.request(control_socket(token_id), {"cmd": "update", "update": update})
+    return bool(reply and reply.get("ok"))
+
+
+async def send_command(token_id: str, cmd: str) -> dict | None:
+    """Envía drain / stop-run / reload / park. None si el worker no responde."""
+    return await local_ipc.request(control_socket(token_id), {"cmd": cmd})
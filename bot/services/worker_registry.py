@@ -1,21 +1,46 @@
 """Registro y gestión de worker bots (spawn, kill, monitoreo)."""
 
+import asyncio
 import json
 import logging
 import os
 import subprocess
 import sys
-import urllib.request
-import urllib.parse
+import time
 from datetime import datetime
 
-from bot.config import WORKERS_STATE_FILE, BASE_DIR, AUTHORIZED_USER_ID
-from bot.services import token_pool
+from bot.config import (
+    WORKERS_STATE_FILE,
+    BASE_DIR,
+    AUTHORIZED_USER_ID,
+    LOGS_DIR,
+    WORKER_HEARTBEAT_TIMEOUT,
+    WORKER_READY_TIMEOUT,
+    WORKER_ZYGOTE,
+)
+from bot.services import bot_api, heartbeat, token_pool, webhook_ingress, zygote
 
 logger = logging.getLogger(__name__)
 
 _cache: dict | None = None
 
+# Procesos lanzados por este coordinador (token_id → Popen), para detectar su salida al instante
+_processes: dict[str, subprocess.Popen | zygote.ZygoteProcess] = {}
+
+# token_id → {"mode": "zygote" | "exec", "at": epoch, "log_offset": bytes} hasta que el worker está listo
+_spawn_info: dict[str, dict] = {}
+
+_PHASE_LABELS = {None: "arrancando", "imports": "imports cargados", "getme": "getMe correcto"}
+_SPAWN_LOG_MAX_CHARS = 3000
+
+
+class SpawnFailed(Exception):
+    """El worker no confirmó estar listo. log: su salida desde el lanzamiento."""
+
+    def __init__(self, reason: str, log: str = ""):
+        super().__init__(reason)
+        self.log = log
+
 
 def _load_state() -> dict:
     global _cache
@@ -59,8 +84,8 @@ def find_worker_by_name(name: str) -> dict | None:
 
 
 def register_worker(token_id: str, bot_username: str, project_name: str,
-                    project_path: str, role: str, pid: int) -> None:
-    """Registra un worker activo."""
+                    project_path: str, role: str, pid: int, mode: str = "process") -> None:
+    """Registra un worker activo. mode: "process" (proceso propio) o "inprocess" (en el coordinador)."""
     state = _load_state()
     state["workers"][token_id] = {
         "token_id": token_id,
@@ -70,10 +95,53 @@ def register_worker(token_id: str, bot_username: str, project_name: str,
         "role": role,
         "pid": pid,
         "started_at": datetime.now().isoformat(),
+        "restarts": 0,
+        "mode": mode,
     }
     _save_state(state)
 
 
+def update_worker(token_id: str, **fields) -> None:
+    """Actualiza campos de un worker registrado (pid, restarts, ...)."""
+    state = _load_state()
+    worker = state.get("workers", {}).get(token_id)
+    if worker:
+        worker.update(fields)
+        _save_state(state)
+
+
+def get_process(token_id: str) -> subprocess.Popen | zygote.ZygoteProcess | None:
+    """Handle del proceso si lo lanzó este coordinador."""
+    return _processes.get(token_id)
+
+
+def pending_spawns() -> dict[str, dict]:
+    """Workers lanzados que aún no han confirmado estar listos (modo y hora de lanzamiento)."""
+    return _spawn_info
+
+
+def worker_log_file(token_id: str):
+    return LOGS_DIR / f"worker_{token_id}.log"
+
+
+async def query_live(worker: dict) -> dict | None:
+    """Estado en vivo del worker (canal de control o, si está alojado, su Application)."""
+    from bot.services import worker_control
+    if worker.get("mode") == "inprocess":
+        from bot.services import hosted_workers
+        return hosted_workers.live_status(worker["token_id"])
+    return await worker_control.query_worker(worker["token_id"])
+
+
+async def send_command(worker: dict, cmd: str) -> dict | None:
+    """Orden del canal de control (drain, stop-run, reload, park) sea cual sea el modo."""
+    from bot.services import worker_control
+    if worker.get("mode") == "inprocess":
+        from bot.services import hosted_workers
+        return hosted_workers.send_command(worker["token_id"], cmd)
+    return await worker_control.send_command(worker["token_id"], cmd)
+
+
 def unregister_worker(token_id: str) -> dict | None:
     """Elimina un worker del registro. Retorna su info o None."""
     state = _load_state()
@@ -83,13 +151,42 @@ def unregister_worker(token_id: str) -> dict | None:
     return worker
 
 
-def spawn_worker(token_id: str, bot_token: str, bot_username: str,
-                 project_name: str, project_path: str, role: str) -> int:
-    """Lanza un worker como subproceso. Retorna el PID."""
-    python_exe = sys.executable
+def _route_webhook(token_id: str, bot_token: str) -> None:
+    from bot.services import worker_control
+
+    async def _deliver(update: dict) -> bool:
+        return await worker_control.send_update(token_id, update)
+
+    webhook_ingress.register(token_id, bot_token, _deliver)
+
 
-    cmd = [
-        python_exe, "-m", "bot.worker_main",
+def _webhook_args(token_id: str, bot_token: str) -> list[str]:
+    """Si el coordinador recibe por webhook, el worker también: sus actualizaciones llegan por control."""
+    from bot.services.local_ipc import ipc_available
+    if not webhook_ingress.is_serving() or not ipc_available():
+        return []
+    _route_webhook(token_id, bot_token)
+    url, secret = webhook_ingress.endpoint(bot_token)
+    return ["--webhook-url", url, "--webhook-secret", secret]
+
+
+def route_existing_webhooks() -> None:
+    """Tras reiniciar el coordinador: rutas de los workers en proceso propio que siguen vivos."""
+    tokens = {t["id"]: t["bot_token"] for t in token_pool.list_tokens()}
+    for worker in list_active_workers():
+        token_id = worker["token_id"]
+        if worker.get("mode") != "inprocess" and token_id in tokens:
+            _route_webhook(token_id, tokens[token_id])
+
+
+def spawn_worker(token_id: str, bot_token: str, bot_username: str,
+                 project_name: str, project_path: str, role: str, quiet: bool = False) -> int:
+    """
+    Lanza un worker (por fork desde el zygote si está activo; si no, como subproceso).
+    Retorna el PID. La salida va a data/logs/worker_<token_id>.log.
+    quiet: sin mensaje de inicio (reinicios).
+    """
+    args = [
         "--token", bot_token,
         "--token-id", token_id,
         "--bot-username", bot_username,
@@ -98,34 +195,111 @@ def spawn_worker(token_id: str, bot_token: str, bot_username: str,
         "--role", role,
         "--authorized-user-id", str(AUTHORIZED_USER_ID),
     ]
+    if quiet:
+        args.append("--quiet-start")
+    args += _webhook_args(token_id, bot_token)
 
-    creation_flags = 0
-    if sys.platform == "win32":
-        creation_flags = subprocess.CREATE_NEW_PROCESS_GROUP
-
-    process = subprocess.Popen(
-        cmd,
-        cwd=str(BASE_DIR),
-        creationflags=creation_flags,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
+    heartbeat.clear_heartbeat(token_id)
+    try:
+        log_offset = worker_log_file(token_id).stat().st_size
+    except OSError:
+        log_offset = 0
+    started = time.time()
+    process = zygote.spawn(args, worker_log_file(token_id)) if WORKER_ZYGOTE else None
+    mode = "zygote"
+    if process is None:
+        mode = "exec"
+        creation_flags = 0
+        if sys.platform == "win32":
+            creation_flags = subprocess.CREATE_NEW_PROCESS_GROUP
+
+        log_file = open(worker_log_file(token_id), "ab")
+        try:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "bot.worker_main", *args],
+                cwd=str(BASE_DIR),
+                creationflags=creation_flags,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+            )
+        finally:
+            log_file.close()
+    _processes[token_id] = process
+    _spawn_info[token_id] = {"mode": mode, "at": started, "log_offset": log_offset}
 
     pid = process.pid
-    logger.info(f"Worker spawned: {bot_username} (PID {pid}) → {project_name} / {role}")
+    logger.info(f"Worker spawned ({mode}): {bot_username} (PID {pid}) → {project_name} / {role}")
     return pid
 
 
-def kill_worker(token_id: str) -> dict | None:
-    """Mata un worker, libera su token, lo desregistra. Retorna su info o None."""
+def _spawn_log(token_id: str, offset: int) -> str:
+    """Salida del worker desde su lanzamiento (el final, si es larga)."""
+    try:
+        with open(worker_log_file(token_id), "rb") as f:
+            f.seek(offset)
+            text = f.read().decode("utf-8", errors="replace").strip()
+    except OSError:
+        return ""
+    return text[-_SPAWN_LOG_MAX_CHARS:]
+
+
+async def wait_ready(token_id: str, timeout: float = WORKER_READY_TIMEOUT) -> float:
+    """
+    Espera a que el worker recién lanzado publique la fase "ready" en su heartbeat.
+    Retorna los segundos desde el lanzamiento. Si sale antes o no llega a tiempo, lo mata y
+    lanza SpawnFailed con su salida (el token y el registro los libera quien llama).
+    """
+    process = _processes[token_id]
+    info = _spawn_info[token_id]
+    phase = None
+    while True:
+        beat = heartbeat.read_heartbeat(token_id)
+        if beat and beat.get("pid") == process.pid:
+            phase = beat.get("phase")
+            if phase == "ready":
+                return beat["ts"] - info["at"]
+        code = process.poll()
+        if code is not None:
+            reason = f"salio con codigo {code} (ultima fase: {_PHASE_LABELS.get(phase, phase)})"
+            break
+        if time.time() - info["at"] > timeout:
+            process.kill()
+            reason = f"no estuvo listo en {timeout:.0f}s (ultima fase: {_PHASE_LABELS.get(phase, phase)})"
+            break
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(0.2)  # que termine de escribir el log
+    raise SpawnFailed(reason, _spawn_log(token_id, info["log_offset"]))
+
+
+def kill_worker(token_id: str, notify: bool = True) -> dict | None:
+    """
+    Mata un worker, libera su token, lo desregistra. Retorna su info o None.
+    notify=False: sin el mensaje de apagado de respaldo (lo avisa quien llama).
+    """
     worker = get_worker(token_id)
     if not worker:
         return None
 
     pid = worker.get("pid", 0)
 
-    # Matar el proceso
-    if pid > 0:
+    # Matar el proceso (sin handle: por PID, si es un worker de una ejecución anterior).
+    # Un worker alojado comparte el PID del coordinador: se detiene su Application.
+    process = _processes.pop(token_id, None)
+    _spawn_info.pop(token_id, None)
+    hosted_stop = None
+    if worker.get("mode") == "inprocess":
+        from bot.services import hosted_workers
+        if hosted_workers.is_hosted(token_id):
+            try:
+                hosted_stop = asyncio.get_running_loop().create_task(
+                    hosted_workers.stop_worker(token_id, notify=notify)
+                )
+            except RuntimeError:
+                pass
+    elif process:
+        if process.poll() is None:
+            process.terminate()
+    elif pid > 0:
         try:
             if sys.platform == "win32":
                 os.system(f"taskkill /PID {pid} /F >nul 2>&1")
@@ -134,19 +308,26 @@ def kill_worker(token_id: str) -> dict | None:
         except (ProcessLookupError, OSError):
             pass
 
-    # Liberar token y desregistrar
-    token_pool.release_token(token_id)
-    unregister_worker(token_id)
+    release_worker(token_id)
 
-    # Enviar notificación de apagado como fallback
-    token_entry = token_pool.find_token_by_username(worker.get("bot_username", ""))
-    # Usar el token del worker para enviar el mensaje de apagado
-    _send_shutdown_fallback(worker)
+    # Enviar notificación de apagado como fallback, con el token del worker
+    if notify and not hosted_stop:
+        _send_shutdown_fallback(worker)
 
     logger.info(f"Worker killed: {worker['bot_username']} (PID {pid})")
     return worker
 
 
+def release_worker(token_id: str) -> None:
+    """Libera el token y da de baja al worker (ya detenido): registro, heartbeat y webhook."""
+    _processes.pop(token_id, None)
+    _spawn_info.pop(token_id, None)
+    token_pool.release_token(token_id)
+    unregister_worker(token_id)
+    heartbeat.clear_heartbeat(token_id)
+    webhook_ingress.unregister(token_id)
+
+
 def _send_shutdown_fallback(worker: dict) -> None:
     """Envía mensaje de apagado en nombre del worker (fallback si atexit no se ejecutó)."""
     # Buscar el token original para enviar el mensaje
@@ -159,26 +340,8 @@ def _send_shutdown_fallback(worker: dict) -> None:
     if not bot_token:
         return
 
-    try:
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        label = f"@{worker['bot_username']} [{worker['project_name']} / {worker['role']}]"
-        data = urllib.parse.urlencode({
-            "chat_id": AUTHORIZED_USER_ID,
-            "text": f"🔴 Worker apagado: {label}",
-        }).encode()
-        urllib.request.urlopen(url, data, timeout=5)
-    except Exception:
-        pass
-
-
-def kill_all_workers() -> int:
-    """Mata todos los workers activos. Retorna el número de workers matados."""
-    workers = list_active_workers()
-    count = 0
-    for w in workers:
-        kill_worker(w["token_id"])
-        count += 1
-    return count
+    label = f"@{worker['bot_username']} [{worker['project_name']} / {worker['role']}]"
+    bot_api.send_message_soon(bot_token, AUTHORIZED_USER_ID, f"🔴 Worker apagado: {label}")
 
 
 def _is_pid_alive(pid: int) -> bool:
@@ -191,12 +354,35 @@ def _is_pid_alive(pid: int) -> bool:
         return False
 
 
+def is_worker_alive(worker: dict) -> bool:
+    """
+    Con handle, lo dice Popen. Sin él, el PID debe existir y su heartbeat ser reciente y del
+    mismo PID (un PID reutilizado por otro proceso no escribe heartbeats).
+    """
+    if worker.get("mode") == "inprocess":
+        from bot.services import hosted_workers
+        return hosted_workers.is_hosted(worker["token_id"])
+    process = _processes.get(worker["token_id"])
+    if process:
+        return process.poll() is None
+    pid = worker.get("pid", 0)
+    if not _is_pid_alive(pid):
+        return False
+    beat = heartbeat.read_heartbeat(worker["token_id"])
+    return bool(beat and beat.get("pid") == pid and time.time() - beat["ts"] < WORKER_HEARTBEAT_TIMEOUT)
+
+
 def cleanup_dead_workers() -> list[str]:
-    """Limpia workers muertos del registro y libera sus tokens. Retorna IDs limpiados."""
+    """
+    Limpia del registro los workers muertos que no supervisa este coordinador (los suyos
+    los reinicia el supervisor) y libera sus tokens. Retorna IDs limpiados.
+    """
     state = _load_state()
     dead = []
     for token_id, worker in list(state.get("workers", {}).items()):
-        if not _is_pid_alive(worker.get("pid", 0)):
+        if token_id in _processes:
+            continue
+        if not is_worker_alive(worker):
             dead.append(token_id)
             token_pool.release_token(token_id)
             del state["workers"][token_id]
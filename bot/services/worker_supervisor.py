@@ -0,0 +1,255 @@
+"""
+Supervisor de workers (tarea del coordinador).
+
+Cada segundo revisa los workers registrados: con el handle de Popen detecta la salida al
+instante y, además, mata los que dejan de escribir heartbeat (colgados). Un worker caído se
+relanza con el mismo token, proyecto y rol (conserva su archivo de sesión) tras un backoff
+exponencial. Si cae WORKER_CRASH_LOOP_MAX veces dentro de WORKER_CRASH_LOOP_WINDOW, o el
+relanzamiento falla, se da por perdido: se libera el token y se avisa al usuario con el final
+de su log. Los reinicios que funcionan no generan mensajes. Un worker que sale con
+RELOAD_EXIT_CODE (reload desde el coordinador) se relanza al momento sin contar como caída.
+Los que aparca el autoescalado (estado "parking") no se relanzan: al terminar se da de baja.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from datetime import datetime
+from typing import Awaitable, Callable
+
+from bot.config import (
+    WORKER_CRASH_LOOP_MAX,
+    WORKER_CRASH_LOOP_WINDOW,
+    WORKER_HEARTBEAT_TIMEOUT,
+    WORKER_RESTART_BACKOFF_BASE,
+    WORKER_RESTART_BACKOFF_MAX,
+)
+from bot.services import heartbeat, local_ipc, run_stats, token_pool, worker_control, worker_registry
+from bot.services.worker_control import RELOAD_EXIT_CODE
+
+logger = logging.getLogger(__name__)
+
+_POLL_INTERVAL = 1.0
+_LOG_TAIL_LINES = 15
+
+# token_id → instantes de las caídas recientes (para el backoff y el crash loop)
+_crashes: dict[str, list[float]] = {}
+# token_id → instante en que toca relanzarlo
+_restart_at: dict[str, float] = {}
+
+
+def _label(worker: dict) -> str:
+    return f"@{worker['bot_username']} [{worker['project_name']} / {worker['role']}]"
+
+
+def _log_tail(token_id: str) -> str:
+    try:
+        with open(worker_registry.worker_log_file(token_id), "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 8192))
+            lines = f.read().decode("utf-8", errors="replace").splitlines()
+        return "\n".join(lines[-_LOG_TAIL_LINES:])
+    except OSError:
+        return ""
+
+
+def heartbeat_age(worker: dict) -> float | None:
+    """Segundos desde el último heartbeat del proceso actual del worker, o None si no hay."""
+    beat = heartbeat.read_heartbeat(worker["token_id"])
+    if not beat or beat.get("pid") != worker.get("pid"):
+        return None
+    return time.time() - beat["ts"]
+
+
+def _is_hung(worker: dict) -> bool:
+    """Sin heartbeat en WORKER_HEARTBEAT_TIMEOUT (contando desde el arranque si aún no escribió)."""
+    age = heartbeat_age(worker)
+    if age is None:
+        try:
+            age = time.time() - datetime.fromisoformat(worker["started_at"]).timestamp()
+        except (KeyError, ValueError):
+            return False
+    return age > WORKER_HEARTBEAT_TIMEOUT
+
+
+def _force_kill(worker: dict) -> None:
+    process = worker_registry.get_process(worker["token_id"])
+    if process:
+        process.kill()
+        return
+    try:
+        os.kill(worker.get("pid", 0), getattr(signal, "SIGKILL", signal.SIGTERM))
+    except (ProcessLookupError, OSError):
+        pass
+
+
+async def _give_up(worker: dict, reason: str, notify: Callable[[str], Awaitable]) -> None:
+    token_id = worker["token_id"]
+    _crashes.pop(token_id, None)
+    _restart_at.pop(token_id, None)
+    tail = _log_tail(token_id)
+    worker_registry.kill_worker(token_id, notify=False)
+    logger.error(f"Worker {_label(worker)} abandonado: {reason}")
+
+    text = f"⚠️ Worker caído y no se pudo reiniciar: {_label(worker)}\nMotivo: {reason}"
+    if tail:
+        text += f"\n\nÚltimas líneas del log:\n{tail}"
+    try:
+        await notify(text[-4000:])
+    except Exception as e:
+        logger.warning(f"No se pudo notificar la caída del worker: {e}")
+
+
+async def _on_crash(worker: dict, reason: str, notify: Callable[[str], Awaitable]) -> None:
+    token_id = worker["token_id"]
+    now = time.time()
+    crashes = [t for t in _crashes.get(token_id, []) if now - t < WORKER_CRASH_LOOP_WINDOW]
+    crashes.append(now)
+    _crashes[token_id] = crashes
+
+    if len(crashes) >= WORKER_CRASH_LOOP_MAX:
+        await _give_up(
+            worker,
+            f"{reason} ({len(crashes)} caídas en {WORKER_CRASH_LOOP_WINDOW}s)",
+            notify,
+        )
+        return
+
+    delay = min(WORKER_RESTART_BACKOFF_BASE * 2 ** (len(crashes) - 1), WORKER_RESTART_BACKOFF_MAX)
+    _restart_at[token_id] = now + delay
+    worker_registry.update_worker(token_id, status="restarting")
+    logger.warning(f"Worker {_label(worker)} caído ({reason}), reinicio en {delay:.0f}s")
+
+
+async def _restart(worker: dict, notify: Callable[[str], Awaitable]) -> None:
+    token_id = worker["token_id"]
+    entry = next((t for t in token_pool.list_tokens() if t["id"] == token_id), None)
+    if not entry:
+        await _give_up(worker, "el token ya no está en el pool", notify)
+        return
+    if token_pool.is_revoked(entry):
+        await _give_up(worker, "Telegram rechaza el token (revocado en BotFather)", notify)
+        return
+    try:
+        # Bloqueante (petición al zygote o fork+exec): fuera del event loop
+        pid = await asyncio.to_thread(
+            worker_registry.spawn_worker,
+            token_id=token_id,
+            bot_token=entry["bot_token"],
+            bot_username=worker["bot_username"],
+            project_name=worker["project_name"],
+            project_path=worker["project_path"],
+            role=worker["role"],
+            quiet=True,
+        )
+    except Exception as e:
+        await _give_up(worker, f"no se pudo relanzar: {e}", notify)
+        return
+
+    token_pool.update_pid(token_id, pid)
+    worker_registry.update_worker(
+        token_id,
+        pid=pid,
+        status="running",
+        restarts=worker.get("restarts", 0) + 1,
+        started_at=datetime.now().isoformat(),
+    )
+    logger.info(f"Worker {_label(worker)} reiniciado (PID {pid})")
+
+
+async def _record_ready(worker: dict) -> None:
+    """
+    Cuando el worker publica la fase "ready" (ya recibe mensajes) guarda el tiempo desde el
+    lanzamiento y la memoria del worker, por modo (zygote / subproceso).
+    """
+    token_id = worker["token_id"]
+    info = worker_registry.pending_spawns().get(token_id)
+    beat = heartbeat.read_heartbeat(token_id)
+    if not info or not beat or beat.get("pid") != worker.get("pid") or beat.get("phase") != "ready":
+        return
+    live = await worker_control.query_worker(token_id)
+    if live is None and local_ipc.ipc_available():
+        return  # el canal de control aún no escucha: en el siguiente ciclo
+    worker_registry.pending_spawns().pop(token_id, None)
+    seconds = max(0.0, beat["ts"] - info["at"])
+    run_stats.record_spawn(info["mode"], seconds, (live or {}).get("rss"), (live or {}).get("pss"))
+    worker_registry.update_worker(token_id, spawn_mode=info["mode"], ready_seconds=round(seconds, 2))
+    logger.info(f"Worker {_label(worker)} listo en {seconds:.2f}s ({info['mode']})")
+
+
+async def _check(notify: Callable[[str], Awaitable]) -> None:
+    now = time.time()
+    workers = worker_registry.list_active_workers()
+    # Olvidar reinicios pendientes de workers que ya no están registrados (/kill durante el backoff)
+    registered = {w["token_id"] for w in workers}
+    for token_id in list(_restart_at):
+        if token_id not in registered:
+            del _restart_at[token_id]
+
+    for worker in workers:
+        token_id = worker["token_id"]
+        if worker.get("status") == "starting" and token_id not in worker_registry.pending_spawns():
+            # Su arranque lo esperaba un coordinador anterior que ya no está: se vigila como los demás
+            logger.warning(f"Worker {_label(worker)} quedo 'arrancando' sin nadie esperandolo, se supervisa")
+            worker_registry.update_worker(token_id, status="running")
+            worker["status"] = "running"
+        if worker.get("mode") == "inprocess" or worker.get("status") in ("starting", "stopping"):
+            continue  # vive en este mismo proceso / lo vigila el arranque o el apagado
+
+        if worker.get("status") == "parking":
+            # Aparcado por el autoescalado: al terminar (como sea) se libera el token, sin relanzar
+            process = worker_registry.get_process(token_id)
+            gone = process.poll() is not None if process else not worker_registry._is_pid_alive(worker.get("pid", 0))
+            if gone:
+                _crashes.pop(token_id, None)
+                worker_registry.kill_worker(token_id, notify=False)
+            continue
+
+        if token_id in _restart_at:
+            if now >= _restart_at[token_id]:
+                del _restart_at[token_id]
+                await _restart(worker, notify)
+            continue
+
+        process = worker_registry.get_process(token_id)
+        if process:
+            code = process.poll()
+            if code == 0:
+                # Salida limpia (SIGTERM externo, /stop del proceso): no se relanza
+                logger.info(f"Worker {_label(worker)} terminó limpiamente")
+                _crashes.pop(token_id, None)
+                worker_registry.kill_worker(token_id, notify=False)
+                continue
+            if code == RELOAD_EXIT_CODE:
+                # Recarga pedida por el coordinador: relanzar ya, sin contar como caída
+                _restart_at[token_id] = now
+                worker_registry.update_worker(token_id, status="restarting")
+                continue
+            if code is not None:
+                await _on_crash(worker, f"salió con código {code}", notify)
+                continue
+        elif not worker_registry._is_pid_alive(worker.get("pid", 0)):
+            # Worker de una ejecución anterior del coordinador: solo hay PID
+            await _on_crash(worker, "proceso desaparecido", notify)
+            continue
+
+        if _is_hung(worker):
+            _force_kill(worker)
+            await _on_crash(worker, f"sin heartbeat en {WORKER_HEARTBEAT_TIMEOUT}s", notify)
+            continue
+
+        if token_id in worker_registry.pending_spawns():
+            await _record_ready(worker)
+
+
+async def supervise_workers(notify: Callable[[str], Awaitable]) -> None:
+    """Bucle del supervisor. notify(texto) avisa al usuario cuando un worker se da por perdido."""
+    logger.info("Supervisor de workers iniciado")
+    while True:
+        try:
+            await _check(notify)
+        except Exception as e:
+            logger.error(f"Error en el supervisor de workers: {e}")
+        await asyncio.sleep(_POLL_INTERVAL)
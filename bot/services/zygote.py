@@ -0,0 +1,288 @@
+"""
+Zygote de workers: un proceso plantilla que ya tiene importados telegram, claude_code_sdk,
+los handlers y las skills, y que crea cada worker con fork() en vez de arrancar un intérprete
+nuevo. Los workers comparten con la plantilla las páginas de memoria que no modifican
+(copy-on-write) y se saltan los imports.
+
+Protocolo (mensajes JSON de una línea, como local_ipc, pero con sockets bloqueantes): el coordinador pide {"cmd": "spawn", "args": [...],
+"log": ruta} y recibe {"pid": N}. La conexión queda abierta mientras vive el worker; cuando
+el zygote lo recoge envía {"exit": código}. ZygoteProcess envuelve esa conexión con la
+interfaz de Popen que usan worker_registry y el supervisor (pid, poll, terminate, kill).
+
+Solo Linux/macOS. Si el zygote no está disponible, los workers se lanzan como subproceso.
+"""
+
+import importlib
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import traceback
+from pathlib import Path
+
+from bot.config import BASE_DIR, LOGS_DIR, ZYGOTE_SOCKET
+from bot.services.local_ipc import ipc_available
+
+logger = logging.getLogger(__name__)
+
+# Lo que importa worker_main.run(); todo lo que quede cargado aquí se comparte tras el fork
+_PREIMPORT = (
+    "telegram",
+    "telegram.ext",
+    "bot.services.session_manager",
+    "bot.services.claude_service",
+    "bot.services.whisper_service",
+    "bot.services.whisper_daemon",
+    "bot.services.heartbeat",
+    "bot.services.worker_control",
+    "bot.handlers.text_handler",
+    "bot.handlers.image_handler",
+    "bot.handlers.document_handler",
+    "bot.handlers.video_handler",
+    "bot.handlers.voice_handler",
+    "bot.handlers.callback_handler",
+    "bot.handlers.reaction_handler",
+    "bot.handlers.worker_commands",
+    "bot.worker_main",
+)
+
+_zygote_process: subprocess.Popen | None = None
+
+
+def fork_available() -> bool:
+    return ipc_available() and hasattr(os, "fork")
+
+
+# --- Lado zygote ---
+
+def _preimport() -> None:
+    for name in _PREIMPORT:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"No se pudo precargar {name}: {e}")
+
+
+def _read_line(conn: socket.socket) -> dict | None:
+    buffer = b""
+    while b"\n" not in buffer:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return None
+        buffer += chunk
+    return json.loads(buffer.split(b"\n", 1)[0])
+
+
+def _send(conn: socket.socket, message: dict) -> None:
+    conn.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def _fork_worker(request: dict, inherited: list) -> int:
+    """Crea el worker. En el hijo no retorna: ejecuta worker_main.run y termina con su código."""
+    log_fd = os.open(request["log"], os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    pid = os.fork()
+    if pid:
+        os.close(log_fd)
+        return pid
+
+    code = 1
+    try:
+        for resource in inherited:
+            resource.close()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(log_fd, 1)
+        os.dup2(log_fd, 2)
+        os.close(devnull)
+        os.close(log_fd)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+        from bot import worker_main
+        code = worker_main.run(worker_main.parse_args(request["args"]))
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def _reap(children: dict[int, socket.socket]) -> None:
+    """Recoge los workers terminados y avisa a quien los pidió."""
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        conn = children.pop(pid, None)
+        if conn:
+            try:
+                _send(conn, {"exit": os.waitstatus_to_exitcode(status)})
+            except OSError:
+                pass
+            conn.close()
+
+
+def serve_forever(parent_pid: int | None = None) -> None:
+    """Precarga los módulos y atiende peticiones de spawn hasta que muera el coordinador."""
+    _preimport()
+    ZYGOTE_SOCKET.unlink(missing_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(ZYGOTE_SOCKET))
+    server.listen(16)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    children: dict[int, socket.socket] = {}
+    logger.info(f"Zygote listo en {ZYGOTE_SOCKET}")
+
+    try:
+        # Sin event loop: un fork dentro de asyncio dejaría al hijo con el loop del padre
+        while parent_pid is None or os.getppid() == parent_pid:
+            for _key, _events in selector.select(timeout=0.5):
+                conn, _ = server.accept()
+                conn.settimeout(5)
+                try:
+                    request = _read_line(conn)
+                    if request and request.get("cmd") == "spawn":
+                        pid = _fork_worker(request, [selector, server, conn, *children.values()])
+                        _send(conn, {"pid": pid})
+                        children[pid] = conn
+                        logger.info(f"Worker creado por fork (PID {pid})")
+                        continue
+                    if request and request.get("cmd") == "ping":
+                        _send(conn, {"ok": True})
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Peticion al zygote fallida: {e}")
+                conn.close()
+            _reap(children)
+    finally:
+        ZYGOTE_SOCKET.unlink(missing_ok=True)
+    logger.info("Coordinador terminado, cerrando zygote")
+
+
+# --- Lado coordinador ---
+
+class ZygoteProcess:
+    """Worker creado por el zygote, con la parte de la interfaz de Popen que se usa."""
+
+    def __init__(self, pid: int, conn: socket.socket, buffer: bytes = b""):
+        self.pid = pid
+        self.returncode: int | None = None
+        self._conn: socket.socket | None = conn
+        self._buffer = buffer
+        conn.setblocking(False)
+
+    def poll(self) -> int | None:
+        if self.returncode is not None:
+            return self.returncode
+        if self._conn is not None:
+            try:
+                chunk = self._conn.recv(4096)
+                if chunk:
+                    self._buffer += chunk
+                else:
+                    self._close()
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._close()
+        if b"\n" in self._buffer:
+            line, self._buffer = self._buffer.split(b"\n", 1)
+            try:
+                self.returncode = int(json.loads(line)["exit"])
+            except (ValueError, KeyError):
+                self.returncode = -1
+            self._close()
+            return self.returncode
+        if self._conn is None:
+            return self._poll_pid()
+        return None
+
+    def _poll_pid(self) -> int | None:
+        """El zygote se fue sin informar: solo queda mirar si el PID sigue vivo."""
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            self.returncode = -1
+        except OSError:
+            pass
+        return self.returncode
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def terminate(self) -> None:
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def kill(self) -> None:
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def spawn(args: list[str], log_path: Path, timeout: float = 10.0) -> ZygoteProcess | None:
+    """Pide un worker al zygote. None si no está en marcha o no responde."""
+    if not fork_available() or not ZYGOTE_SOCKET.exists():
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(timeout)
+    try:
+        conn.connect(str(ZYGOTE_SOCKET))
+        _send(conn, {"cmd": "spawn", "args": args, "log": str(log_path)})
+        buffer = b""
+        while b"\n" not in buffer:
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("el zygote cerró la conexión")
+            buffer += chunk
+        line, rest = buffer.split(b"\n", 1)
+        pid = int(json.loads(line)["pid"])
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Zygote no disponible, se usara un subproceso: {e}")
+        conn.close()
+        return None
+    return ZygoteProcess(pid, conn, rest)
+
+
+def start_zygote() -> bool:
+    """Lanza el zygote como subproceso del coordinador. Retorna True si se lanzó."""
+    global _zygote_process
+    if not fork_available():
+        return False
+    log_file = open(LOGS_DIR / "zygote.log", "ab")
+    _zygote_process = subprocess.Popen(
+        [sys.executable, "-m", "bot.zygote_main", "--parent-pid", str(os.getpid())],
+        cwd=str(BASE_DIR),
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+    log_file.close()
+    logger.info(f"Zygote lanzado (PID {_zygote_process.pid})")
+    return True
+
+
+def stop_zygote() -> None:
+    """Detiene el zygote si lo lanzó este proceso (los workers ya creados siguen vivos)."""
+    global _zygote_process
+    if _zygote_process and _zygote_process.poll() is None:
+        _zygote_process.terminate()
+        try:
+            _zygote_process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            _zygote_process.kill()
+    _zygote_process = None
@@ -0,0 +1,284 @@
+"""
+Benchmark de entrada de actualizaciones: long polling frente a webhook, de extremo a extremo y
+sin red, contra una Bot API local de imitación.
+
+La imitación atiende getMe, getUpdates (long polling de verdad: retiene la petición hasta que
+hay actualizaciones), setWebhook, deleteWebhook y el resto de métodos con "ok". Se crean N bots
+con Application reales apuntando a ella y se les inyectan actualizaciones:
+  - polling: la actualización se encola en la imitación y la recoge el getUpdates pendiente;
+  - webhook: se publica por POST en el servidor de webhook_ingress (ruta y cabecera secreta
+    de cada token), como haría Telegram, con una conexión keep-alive por bot.
+
+Reporta la latencia desde la inyección hasta que el handler la procesa (p50/p95) y las
+conexiones abiertas en reposo contra la Bot API y contra el servidor de webhooks.
+
+Uso: python -m bot.webhook_bench [--bots 5] [--updates 50] [--interval 0.02]
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import time
+import urllib.parse
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, TypeHandler
+
+from bot.services import webhook_ingress
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de polling frente a webhook")
+    parser.add_argument("--bots", type=int, default=5, help="Bots simultáneos")
+    parser.add_argument("--updates", type=int, default=50, help="Actualizaciones por bot")
+    parser.add_argument("--interval", type=float, default=0.02, help="Segundos entre actualizaciones de un bot")
+    return parser.parse_args()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+# --- Bot API de imitación ---
+
+class FakeBotApi:
+    def __init__(self):
+        self.queues: dict[str, list[dict]] = {}
+        self.waiters: dict[str, asyncio.Event] = {}
+        self.connections_open = 0
+        self.server: asyncio.AbstractServer | None = None
+        self.port = 0
+
+    def push(self, token: str, update: dict) -> None:
+        self.queues.setdefault(token, []).append(update)
+        self.waiters.setdefault(token, asyncio.Event()).set()
+
+    async def _get_updates(self, token: str, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        queue = self.queues.setdefault(token, [])
+        queue[:] = [u for u in queue if u["update_id"] >= offset]
+        if not queue:
+            event = self.waiters.setdefault(token, asyncio.Event())
+            event.clear()
+            try:
+                await asyncio.wait_for(event.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        return list(queue)
+
+    async def _call(self, token: str, method: str, params: dict):
+        if method == "getMe":
+            bot_id = int(token.split(":", 1)[0])
+            return {"id": bot_id, "is_bot": True, "first_name": "Bench", "username": f"bench{bot_id}_bot"}
+        if method == "getUpdates":
+            return await self._get_updates(token, params)
+        if method == "sendMessage":
+            return {"message_id": 1, "date": int(time.time()), "chat": {"id": 1, "type": "private"}}
+        return True  # setWebhook, deleteWebhook, setMyCommands...
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections_open += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _method, path, _version = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                body = await reader.readexactly(length) if length else b""
+                if "json" in headers.get("content-type", ""):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = {k: v[0] for k, v in urllib.parse.parse_qs(body.decode()).items()}
+
+                _, token, method = path.split("?", 1)[0].rsplit("/", 2)
+                result = await self._call(token.removeprefix("bot"), method, params)
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.connections_open -= 1
+            writer.close()
+
+    async def start(self) -> None:
+        self.port = _free_port()
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+
+    async def stop(self) -> None:
+        for event in self.waiters.values():
+            event.set()  # los getUpdates pendientes responden y sus conexiones se cierran
+        self.server.close()
+        await asyncio.sleep(0.1)
+
+
+# --- Emisor de webhooks (el papel de Telegram) ---
+
+class WebhookPoster:
+    """Una conexión keep-alive por bot contra el servidor de webhooks."""
+
+    def __init__(self, port: int, path: str, secret: str):
+        self.port, self.path, self.secret = port, path, secret
+        self._conn: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+        self._lock = asyncio.Lock()
+
+    async def post(self, update: dict) -> int:
+        body = json.dumps(update).encode()
+        async with self._lock:
+            if self._conn is None:
+                self._conn = await asyncio.open_connection("127.0.0.1", self.port)
+            reader, writer = self._conn
+            writer.write(
+                f"POST {self.path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                f"X-Telegram-Bot-Api-Secret-Token: {self.secret}\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+            return status
+
+    def close(self) -> None:
+        if self._conn:
+            self._conn[1].close()
+
+
+# --- Escenarios ---
+
+def _make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Bench"},
+            "text": f"ping {update_id}",
+        },
+    }
+
+
+async def _run_mode(mode: str, args) -> dict:
+    api = FakeBotApi()
+    await api.start()
+    injected: dict[tuple[str, int], float] = {}
+    latencies: list[float] = []
+    done = asyncio.Event()
+    expected = args.bots * args.updates
+
+    apps = []
+    for i in range(args.bots):
+        token = f"{1000 + i}:bench"
+
+        async def _on_update(update: Update, context, token=token) -> None:
+            sent = injected.pop((token, update.update_id), None)
+            if sent is not None:
+                latencies.append(time.perf_counter() - sent)
+            if len(latencies) >= expected:
+                done.set()
+
+        app = ApplicationBuilder().token(token).base_url(f"http://127.0.0.1:{api.port}/bot").build()
+        app.add_handler(TypeHandler(Update, _on_update))
+        await app.initialize()
+        await app.start()
+        apps.append((token, app))
+
+    posters: dict[str, WebhookPoster] = {}
+    ingress_port = 0
+    if mode == "polling":
+        for _token, app in apps:
+            await app.updater.start_polling(poll_interval=0, timeout=10)
+    else:
+        ingress_port = _free_port()
+        await webhook_ingress.start_server("127.0.0.1", ingress_port)
+        for token, app in apps:
+            webhook_ingress.register(token, token, webhook_ingress.queue_delivery(app))
+            url, secret = webhook_ingress.endpoint(token)
+            path = webhook_ingress.route_path(token)
+            await webhook_ingress.set_webhook(app.bot, url, secret)
+            posters[token] = WebhookPoster(ingress_port, path, secret)
+
+    await asyncio.sleep(1)
+    idle_api = api.connections_open
+
+    async def _inject(token: str) -> None:
+        for n in range(1, args.updates + 1):
+            injected[(token, n)] = time.perf_counter()
+            if mode == "polling":
+                api.push(token, _make_update(n))
+            else:
+                await posters[token].post(_make_update(n))
+            await asyncio.sleep(args.interval)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_inject(token) for token, _app in apps))
+    try:
+        await asyncio.wait_for(done.wait(), 30)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - started
+
+    ingress = webhook_ingress.stats() if mode == "webhook" else {}
+    for poster in posters.values():
+        poster.close()
+    for _token, app in apps:
+        if app.updater.running:
+            await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+    await webhook_ingress.stop_server()
+    await api.stop()
+
+    return {
+        "mode": mode,
+        "received": len(latencies),
+        "expected": expected,
+        "p50": _percentile(latencies, 50) * 1000 if latencies else None,
+        "p95": _percentile(latencies, 95) * 1000 if latencies else None,
+        "idle_api": idle_api,
+        "ingress": ingress.get("connections_total", 0),
+        "seconds": elapsed,
+    }
+
+
+def _print_table(results: list[dict]) -> None:
+    print(f"{'modo':<9} {'recibidas':>10} {'p50 ms':>8} {'p95 ms':>8} {'conex. API reposo':>18} {'conex. ingress':>15}")
+    for r in results:
+        p50 = f"{r['p50']:.1f}" if r["p50"] is not None else "-"
+        p95 = f"{r['p95']:.1f}" if r["p95"] is not None else "-"
+        print(
+            f"{r['mode']:<9} {r['received']:>4}/{r['expected']:<5} {p50:>8} {p95:>8} "
+            f"{r['idle_api']:>18} {r['ingress']:>15}"
+        )
+
+
+def main():
+    args = parse_args()
+    results = []
+    for mode in ("polling", "webhook"):
+        results.append(asyncio.run(_run_mode(mode, args)))
+    _print_table(results)
+
+
+if __name__ == "__main__":
+    main()
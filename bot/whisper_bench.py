@@ -0,0 +1,288 @@
+"""
+Benchmark de transcripción: ejecuta los audios de prueba con varias configuraciones de
+Whisper y reporta factor de tiempo real (RTF), memoria (RSS pico) y tasa de error (WER).
+
+Cada audio `nombre.ogg` (o .mp3, .wav, ...) puede ir acompañado de `nombre.txt` con la
+transcripción de referencia para calcular el WER. Cada configuración se ejecuta en un
+proceso aparte para que la memoria medida sea solo la suya.
+
+Con --chunk-workers se compara además la transcripción por tramos en paralelo con la
+secuencial y se reporta la aceleración obtenida.
+
+Los audios no se incluyen en el repositorio. --prepare los genera a partir de un corpus con
+transcripciones descargado aparte (formato LibriSpeech o Multilingual LibriSpeech): une las
+frases de cada capítulo en un audio largo y escribe su referencia al lado.
+
+Uso: python -m bot.whisper_bench [--fixtures DIR] [--models small,medium]
+     [--compute-types int8,int8_float32] [--threads 0,4] [--beam-sizes 1,5] [--batch-sizes 0,8]
+     [--chunk-workers 0,4]
+     python -m bot.whisper_bench --prepare CORPUS [--fixture-seconds 300] [--fixture-count 3]
+"""
+
+import argparse
+import itertools
+import json
+import re
+import subprocess
+import sys
+import time
+import unicodedata
+import wave
+from pathlib import Path
+
+from bot.config import BASE_DIR, DATA_DIR
+
+AUDIO_EXTENSIONS = {".ogg", ".oga", ".opus", ".mp3", ".wav", ".m4a", ".flac"}
+DEFAULT_FIXTURES_DIR = DATA_DIR / "bench"
+
+
+def _csv(value: str, cast=str) -> list:
+    return [cast(v.strip()) for v in value.split(",") if v.strip()]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de configuraciones de Whisper")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES_DIR,
+                        help="Carpeta con audios de prueba (y .txt de referencia)")
+    parser.add_argument("--models", type=_csv, default=None, help="Tamaños de modelo (coma)")
+    parser.add_argument("--compute-types", type=_csv, default=None, help="Tipos de cómputo (coma)")
+    parser.add_argument("--threads", type=lambda v: _csv(v, int), default=None, help="cpu_threads (coma)")
+    parser.add_argument("--beam-sizes", type=lambda v: _csv(v, int), default=None, help="Beam sizes (coma)")
+    parser.add_argument("--batch-sizes", type=lambda v: _csv(v, int), default=None,
+                        help="Tamaños de lote, 0 = sin lotes (coma)")
+    parser.add_argument("--chunk-workers", type=lambda v: _csv(v, int), default=None,
+                        help="Hilos para tramos en paralelo, 0 = secuencial (coma)")
+    parser.add_argument("--prepare", type=Path, default=None,
+                        help="Generar los audios de prueba desde un corpus LibriSpeech/MLS descomprimido")
+    parser.add_argument("--fixture-seconds", type=int, default=300,
+                        help="Duración mínima de cada audio generado con --prepare")
+    parser.add_argument("--fixture-count", type=int, default=3, help="Audios a generar con --prepare")
+    parser.add_argument("--run-config", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+# --- Métricas ---
+
+def _normalize_words(text: str) -> list[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"\w+", text)
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """WER = distancia de edición en palabras / palabras de la referencia."""
+    ref = _normalize_words(reference)
+    hyp = _normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            ))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB, macOS en bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def list_fixtures(fixtures_dir: Path) -> list[Path]:
+    if not fixtures_dir.exists():
+        return []
+    return sorted(p for p in fixtures_dir.iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS)
+
+
+# --- Preparación de audios de prueba ---
+
+def _read_transcripts(corpus_dir: Path) -> dict[str, str]:
+    """Transcripciones del corpus: LibriSpeech (*.trans.txt) o MLS (transcripts.txt), "id texto"."""
+    transcripts = {}
+    for path in [*corpus_dir.rglob("*.trans.txt"), *corpus_dir.rglob("transcripts.txt")]:
+        for line in path.read_text(encoding="utf-8").splitlines():
+            parts = line.split(maxsplit=1)
+            if len(parts) == 2:
+                transcripts[parts[0]] = parts[1]
+    return transcripts
+
+
+def prepare_fixtures(corpus_dir: Path, fixtures_dir: Path, min_seconds: int, count: int) -> list[Path]:
+    """Une las frases de cada capítulo del corpus hasta min_seconds y guarda .wav + .txt."""
+    import numpy as np
+    from faster_whisper import decode_audio
+
+    transcripts = _read_transcripts(corpus_dir)
+    chapters: dict[Path, list[Path]] = {}
+    for path in sorted(corpus_dir.rglob("*")):
+        if path.suffix.lower() in AUDIO_EXTENSIONS and path.stem in transcripts:
+            chapters.setdefault(path.parent, []).append(path)
+
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    created = []
+    for chapter, utterances in chapters.items():
+        if len(created) >= count:
+            break
+        audio, texts = [], []
+        for path in utterances:
+            audio.append(decode_audio(str(path)))
+            texts.append(transcripts[path.stem])
+            if sum(len(a) for a in audio) >= min_seconds * 16000:
+                break
+        else:
+            continue  # capítulo demasiado corto
+        name = "_".join(chapter.relative_to(corpus_dir).parts) or chapter.name
+        target = fixtures_dir / f"{name}.wav"
+        samples = (np.clip(np.concatenate(audio), -1.0, 1.0) * 32767).astype(np.int16)
+        with wave.open(str(target), "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(16000)
+            out.writeframes(samples.tobytes())
+        target.with_suffix(".txt").write_text(" ".join(texts) + "\n", encoding="utf-8")
+        created.append(target)
+    return created
+
+
+# --- Ejecución de una configuración (proceso hijo) ---
+
+def run_config(bench_config: dict, fixtures_dir: Path) -> dict:
+    """Carga el modelo con la configuración dada y transcribe todos los audios."""
+    import bot.config as config
+    config.WHISPER_MODEL = bench_config["model"]
+    config.WHISPER_COMPUTE_TYPE = bench_config["compute_type"]
+    config.WHISPER_CPU_THREADS = bench_config["threads"]
+    config.WHISPER_BEAM_SIZE = bench_config["beam_size"]
+    config.WHISPER_BATCH_SIZE = bench_config["batch_size"]
+    config.WHISPER_BATCH_MIN_DURATION = 0  # con lotes activados, se usan en todos los audios
+    config.WHISPER_CHUNK_WORKERS = bench_config["chunk_workers"]
+    config.WHISPER_CHUNK_MIN_DURATION = 0  # idem con los tramos en paralelo
+
+    from faster_whisper import decode_audio
+    from bot.services import whisper_service
+    whisper_service._use_daemon = False
+
+    start = time.monotonic()
+    whisper_service._get_model()
+    load_time = time.monotonic() - start
+
+    results = []
+    for audio_path in list_fixtures(fixtures_dir):
+        duration = len(decode_audio(str(audio_path))) / 16000
+        start = time.monotonic()
+        text = whisper_service.transcribe(audio_path)
+        elapsed = time.monotonic() - start
+
+        reference_file = audio_path.with_suffix(".txt")
+        wer = None
+        if reference_file.exists():
+            wer = word_error_rate(reference_file.read_text(encoding="utf-8"), text)
+        results.append({"file": audio_path.name, "duration": duration, "elapsed": elapsed, "wer": wer})
+
+    return {"config": bench_config, "load_time": load_time, "rss_mb": _peak_rss_mb(), "files": results}
+
+
+# --- Orquestación ---
+
+def _rtf(result: dict) -> float:
+    audio = sum(f["duration"] for f in result["files"])
+    elapsed = sum(f["elapsed"] for f in result["files"])
+    return elapsed / audio if audio else 0.0
+
+
+def _format_row(result: dict) -> str:
+    cfg = result["config"]
+    files = result["files"]
+    rtf = _rtf(result)
+    wers = [f["wer"] for f in files if f["wer"] is not None]
+    wer = f"{100 * sum(wers) / len(wers):5.1f}%" if wers else "    -"
+    rss = f"{result['rss_mb']:7.0f}" if result["rss_mb"] is not None else "      -"
+    name = (
+        f"{cfg['model']}/{cfg['compute_type']}/t{cfg['threads'] or 'auto'}"
+        f"/beam{cfg['beam_size']}/batch{cfg['batch_size']}/chunks{cfg['chunk_workers']}"
+    )
+    return f"{name:<48} {result['load_time']:6.1f} {rtf:6.3f} {rss} {wer}"
+
+
+def main():
+    args = parse_args()
+
+    if args.run_config:
+        print(json.dumps(run_config(json.loads(args.run_config), args.fixtures)))
+        return
+
+    if args.prepare:
+        created = prepare_fixtures(args.prepare, args.fixtures, args.fixture_seconds, args.fixture_count)
+        for path in created:
+            print(f"{path} ({path.stat().st_size / 1024 / 1024:.1f} MB)")
+        if not created:
+            print(f"Ningun capitulo de {args.prepare} llega a {args.fixture_seconds}s con transcripcion")
+            sys.exit(1)
+        return
+
+    fixtures = list_fixtures(args.fixtures)
+    if not fixtures:
+        print(f"No hay audios de prueba en {args.fixtures}")
+        print(f"Añade archivos {', '.join(sorted(AUDIO_EXTENSIONS))} (y .txt de referencia para el WER)")
+        print("o generalos desde un corpus con --prepare (ver README).")
+        sys.exit(1)
+
+    import bot.config as config
+    grid = itertools.product(
+        args.models or [config.WHISPER_MODEL],
+        args.compute_types or [config.WHISPER_COMPUTE_TYPE],
+        args.threads or [config.WHISPER_CPU_THREADS],
+        args.beam_sizes or [config.WHISPER_BEAM_SIZE],
+        args.batch_sizes or [0, config.WHISPER_BATCH_SIZE or 8],
+        args.chunk_workers or [0],
+    )
+
+    print(f"{len(fixtures)} audios en {args.fixtures}\n")
+    print(f"{'configuracion':<48} {'carga':>6} {'RTF':>6} {'RSS MB':>7} {'WER':>6}")
+
+    results = []
+    for model, compute_type, threads, beam_size, batch_size, chunk_workers in grid:
+        bench_config = {
+            "model": model,
+            "compute_type": compute_type,
+            "threads": threads,
+            "beam_size": beam_size,
+            "batch_size": batch_size,
+            "chunk_workers": chunk_workers,
+        }
+        proc = subprocess.run(
+            [sys.executable, "-m", "bot.whisper_bench",
+             "--fixtures", str(args.fixtures), "--run-config", json.dumps(bench_config)],
+            cwd=str(BASE_DIR), capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"rc={proc.returncode}"
+            print(f"{json.dumps(bench_config)}: ERROR {error}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(_format_row(result))
+
+    # Aceleración de los tramos en paralelo frente a la misma configuración secuencial
+    for result in results:
+        cfg = result["config"]
+        if cfg["chunk_workers"] <= 1:
+            continue
+        for baseline in results:
+            if baseline["config"] == {**cfg, "chunk_workers": 0} and _rtf(result):
+                print(f"Tramos x{cfg['chunk_workers']}: {_rtf(baseline) / _rtf(result):.2f}x mas rapido "
+                      f"que secuencial ({_format_row(result).split()[0]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Entry point del servicio de transcripción compartido. Lanzado por el coordinador como subproceso.
+
+Uso: python -m bot.whisper_main [--parent-pid PID]
+"""
+
+import argparse
+import asyncio
+import logging
+
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servicio de transcripcion Whisper")
+    parser.add_argument("--parent-pid", type=int, default=None,
+                        help="PID del coordinador; el servicio termina cuando este muere")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Las réplicas son hilos de decodificación sobre un único modelo cargado
+    import bot.config as config
+    config.WHISPER_MAX_WORKERS = config.WHISPER_DAEMON_REPLICAS
+
+    from bot.services import whisper_service, whisper_daemon
+    whisper_service._use_daemon = False
+
+    logger.info(f"Servicio de transcripcion iniciado ({config.WHISPER_DAEMON_REPLICAS} replicas)")
+    asyncio.run(whisper_daemon.serve_forever(args.parent_pid))
+
+
+if __name__ == "__main__":
+    main()
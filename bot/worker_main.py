@@ -2,18 +2,20 @@
 Entry point para worker bots. Lanzado por el coordinador como subproceso.
 Cada worker está dedicado a un proyecto + rol específico.
 
+También lo ejecuta el zygote (bot.services.zygote) tras un fork, llamando a run() con los
+mismos argumentos.
+
 Uso: python -m bot.worker_main --token TOKEN --token-id ID --bot-username NAME
-     --project-name NAME --project-path PATH --role ROLE --authorized-user-id UID
+     --project-name NAME --project-path PATH --role ROLE --authorized-user-id UID [--quiet-start]
+     [--webhook-url URL --webhook-secret SECRET]
 """
 
 import argparse
-import atexit
+import asyncio
 import logging
 import os
 import signal
 import sys
-import urllib.request
-import urllib.parse
 
 # Limpiar CLAUDECODE antes de cualquier import
 os.environ.pop("CLAUDECODE", None)
@@ -25,7 +27,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def parse_args():
+def parse_args(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="Worker bot de Claude Code")
     parser.add_argument("--token", required=True, help="Token del bot de Telegram")
     parser.add_argument("--token-id", required=True, help="ID del token en el pool")
@@ -34,65 +36,62 @@ def parse_args():
     parser.add_argument("--project-path", required=True, help="Ruta del proyecto")
     parser.add_argument("--role", required=True, help="Rol del worker")
     parser.add_argument("--authorized-user-id", type=int, required=True, help="User ID autorizado")
-    return parser.parse_args()
-
+    parser.add_argument("--quiet-start", action="store_true", help="Sin mensaje de inicio (reinicio del supervisor)")
+    parser.add_argument("--webhook-url", default=None, help="Recibir por el webhook del coordinador en esta URL")
+    parser.add_argument("--webhook-secret", default=None, help="Cabecera secreta del webhook")
+    return parser.parse_args(argv)
 
-def main():
-    args = parse_args()
 
+def run(args) -> int:
+    """Configura y ejecuta el worker hasta que se detiene. Retorna el código de salida."""
     # Override config para este worker
     import bot.config as config
     config.TELEGRAM_BOT_TOKEN = args.token
     config.AUTHORIZED_USER_ID = args.authorized_user_id
+    # Módulos ya importados (en el zygote, antes del fork) guardan su propia copia
+    for name in ("bot.security", "bot.handlers.callback_handler"):
+        module = sys.modules.get(name)
+        if module:
+            module.AUTHORIZED_USER_ID = args.authorized_user_id
+
+    # Ámbito del worker para todo el proceso: sesión por proyecto+rol y rol en el system prompt
+    from bot.services import bot_scope, session_manager
+    scope = bot_scope.make_scope(
+        args.token_id, args.bot_username, args.project_name, args.project_path, args.role,
+    )
+    bot_scope.enter(scope)
 
-    # Session manager: archivo basado en proyecto+rol (persiste entre respawns)
-    from bot.services import session_manager
-    import re
-    safe_name = re.sub(r'[^\w\-]', '_', f"{args.project_name}_{args.role}").lower()
-    worker_state_file = config.SESSIONS_DIR / f"worker_{safe_name}.json"
-    session_manager.STATE_FILE = worker_state_file
-    session_manager._cache = None  # Forzar recarga
+    # La inactividad, el uptime y la CPU cuentan desde aquí, no desde el import (zygote)
+    from bot.services import worker_control
+    worker_control.mark_started(process=True)
 
     # Setear proyecto activo (el worker es single-project)
     session_manager.set_active_project(args.project_name)
 
-    # Inyectar rol en el system prompt de Claude
-    from bot.services import claude_service
-    role_prompt = (
-        f"\n\n# Tu Rol\n"
-        f"Eres un *{args.role}* trabajando en el proyecto *{args.project_name}*.\n"
-        f"Directorio del proyecto: `{args.project_path}`\n"
-        f"Enfocate exclusivamente en tu rol. No cambies de proyecto.\n"
-    )
-    claude_service._full_append_prompt = role_prompt + claude_service._full_append_prompt
-
-    # Imports de handlers (usan config ya overrideado)
-    from telegram.ext import (
-        ApplicationBuilder,
-        CommandHandler,
-        MessageHandler,
-        MessageReactionHandler,
-        CallbackQueryHandler,
-        filters,
-    )
-    from bot.handlers.text_handler import handle_text
-    from bot.handlers.image_handler import handle_image
-    from bot.handlers.voice_handler import handle_voice
-    from bot.handlers.callback_handler import handle_callback
-    from bot.handlers.reaction_handler import handle_reaction
-    from bot.handlers.worker_commands import (
-        start_command,
-        help_command,
-        status_command,
-        clear_command,
-        stop_command,
-    )
+    from telegram.ext import ApplicationBuilder
 
     # Label para notificaciones
-    bot_label = f"@{args.bot_username} [{args.project_name} / {args.role}]"
+    bot_label = scope["label"]
 
     # Startup notification
     async def _on_startup(app):
+        # Heartbeat para el supervisor del coordinador (antes de cargar nada lento).
+        # initialize() ya hizo getMe: el token es válido
+        from bot.services import heartbeat
+        heartbeat.set_phase(args.token_id, "getme")
+        app.bot_data["heartbeat_task"] = asyncio.create_task(heartbeat.heartbeat_loop(args.token_id))
+        app.bot_data["ready_task"] = asyncio.create_task(_announce_ready(app))
+
+        # Canal de control: estado en vivo para /bots y órdenes del coordinador
+        from bot.services import worker_control
+        app.bot_data["control_server"] = await worker_control.serve_control(args.token_id, app)
+
+        # Si el coordinador tiene el servicio compartido, el worker no carga modelo propio
+        from bot.services import whisper_service, whisper_daemon
+        if config.WHISPER_WORKER_PRELOAD and not whisper_daemon.is_daemon_running():
+            whisper_service.preload_model()
+        if args.quiet_start:
+            return
         try:
             await app.bot.send_message(
                 chat_id=args.authorized_user_id,
@@ -101,25 +100,19 @@ def main():
         except Exception as e:
             logger.warning(f"No se pudo enviar mensaje de inicio: {e}")
 
-    # Shutdown notification (síncrono, sin asyncio)
+    # Shutdown notification (síncrono, sin asyncio). Solo en apagados ordenados: si el worker
+    # se cae, el supervisor lo relanza sin molestar al usuario.
     _shutdown_sent = False
 
     def _send_shutdown():
         nonlocal _shutdown_sent
-        if _shutdown_sent:
+        from bot.services import worker_control
+        if _shutdown_sent or not worker_control.notify_exit():
             return
         _shutdown_sent = True
-        try:
-            url = f"https://api.telegram.org/bot{args.token}/sendMessage"
-            data = urllib.parse.urlencode({
-                "chat_id": args.authorized_user_id,
-                "text": f"🔴 Worker apagado: {bot_label}",
-            }).encode()
-            urllib.request.urlopen(url, data, timeout=5)
-        except Exception:
-            pass
-
-    atexit.register(_send_shutdown)
+        from bot.services import bot_api
+        bot_api.send_message_sync(args.token, args.authorized_user_id, f"🔴 Worker apagado: {bot_label}")
+
     signal.signal(signal.SIGTERM, lambda s, f: (_send_shutdown(), sys.exit(0)))
     signal.signal(signal.SIGINT, lambda s, f: (_send_shutdown(), sys.exit(0)))
 
@@ -131,10 +124,88 @@ def main():
         .build()
     )
 
+    add_worker_handlers(app)
+    from bot.services import heartbeat
+    heartbeat.set_phase(args.token_id, "imports")
+
+    async def _announce_ready(app):
+        # post_init corre antes de arrancar el polling (o el webhook): esperar a que esté activo
+        while not (app.running and (app.updater.running or app.bot_data.get("webhook"))):
+            await asyncio.sleep(0.05)
+        heartbeat.set_phase(args.token_id, "ready")
+
+    logger.info(f"Worker iniciado: {bot_label} (PID {os.getpid()})")
+    # Un relanzamiento (reinicio del supervisor, reload) conserva los mensajes que llegaron
+    # mientras tanto; solo un worker nuevo descarta los pendientes
+    drop_pending = not args.quiet_start
+    if args.webhook_url:
+        # El coordinador recibe por webhook y reenvía por el canal de control
+        from bot.services import webhook_ingress
+
+        async def _setup_webhook() -> bool:
+            return await webhook_ingress.set_webhook(
+                app.bot, args.webhook_url, args.webhook_secret, drop_pending=drop_pending,
+            )
+
+        webhook_ingress.run_application(app, _setup_webhook, drop_pending=drop_pending)
+    else:
+        from telegram import Update
+        app.run_polling(
+            drop_pending_updates=drop_pending,
+            allowed_updates=Update.ALL_TYPES,
+        )
+
+    from bot.services import worker_control
+    worker_control.control_socket(args.token_id).unlink(missing_ok=True)
+    if worker_control.exit_code() == worker_control.RELOAD_EXIT_CODE:
+        logger.info("Recarga solicitada por el coordinador")
+    elif worker_control.notify_exit():
+        _send_shutdown()
+    else:
+        logger.info("Aparcado por el coordinador")
+    return worker_control.exit_code()
+
+
+async def _mark_activity(update, context) -> None:
+    from bot.services import worker_control
+    worker_control.mark_activity()
+
+
+def add_worker_handlers(app) -> None:
+    """Handlers de un worker (también los usan los workers alojados en el coordinador)."""
+    from telegram import Update
+    from telegram.ext import (
+        CommandHandler,
+        MessageHandler,
+        MessageReactionHandler,
+        CallbackQueryHandler,
+        TypeHandler,
+        filters,
+    )
+    from bot.handlers.text_handler import handle_text
+    from bot.handlers.image_handler import handle_image
+    from bot.handlers.document_handler import handle_document
+    from bot.handlers.video_handler import handle_video
+    from bot.handlers.voice_handler import handle_voice
+    from bot.handlers.callback_handler import handle_callback
+    from bot.handlers.reaction_handler import handle_reaction
+    from bot.handlers.worker_commands import (
+        start_command,
+        help_command,
+        status_command,
+        stats_command,
+        clear_command,
+        stop_command,
+    )
+
+    # Actividad para el autoescalado (grupo -1: ve todas las actualizaciones y sigue)
+    app.add_handler(TypeHandler(Update, _mark_activity), group=-1)
+
     # Worker commands (subset del coordinador)
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("help", help_command))
     app.add_handler(CommandHandler("status", status_command))
+    app.add_handler(CommandHandler("stats", stats_command))
     app.add_handler(CommandHandler("clear", clear_command))
     app.add_handler(CommandHandler("newchat", clear_command))
     app.add_handler(CommandHandler("stop", stop_command))
@@ -147,15 +218,15 @@ def main():
 
     # Mensajes
     app.add_handler(MessageHandler(filters.PHOTO, handle_image))
-    app.add_handler(MessageHandler(filters.VOICE | filters.AUDIO, handle_voice))
+    # block=False: la transcripción no frena /stop ni el resto de mensajes
+    app.add_handler(MessageHandler(filters.VOICE | filters.AUDIO, handle_voice, block=False))
+    app.add_handler(MessageHandler(filters.Document.ALL, handle_document, block=False))
+    app.add_handler(MessageHandler(filters.VIDEO | filters.VIDEO_NOTE, handle_video, block=False))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
 
-    logger.info(f"Worker iniciado: {bot_label} (PID {os.getpid()})")
-    from telegram import Update
-    app.run_polling(
-        drop_pending_updates=True,
-        allowed_updates=Update.ALL_TYPES,
-    )
+
+def main():
+    sys.exit(run(parse_args()))
 
 
 if __name__ == "__main__":
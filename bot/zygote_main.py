@@ -0,0 +1,37 @@
+"""
+Entry point del zygote de workers (plantilla precargada que crea workers por fork).
+Lanzado por el coordinador como subproceso.
+
+Uso: python -m bot.zygote_main [--parent-pid PID]
+"""
+
+import argparse
+import logging
+import os
+
+# Igual que worker_main: los workers heredan el entorno de la plantilla
+os.environ.pop("CLAUDECODE", None)
+
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Zygote de workers")
+    parser.add_argument("--parent-pid", type=int, default=None,
+                        help="PID del coordinador; el zygote termina cuando este muere")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    from bot.services import zygote
+    zygote.serve_forever(args.parent_pid)
+
+
+if __name__ == "__main__":
+    main()